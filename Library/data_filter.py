@@ -1,70 +1,82 @@
+import numpy as np
 import pandas as pd
-from functools import reduce
 
-def filter_data(dataframes):
-    # Filter for OfficialName
-    official_name_df = dataframes['denomination'][
-        (dataframes['denomination']['TypeOfDenomination'] == 1) & 
-        (dataframes['denomination']['Language'] == 2)
-    ][['Denomination', 'EntityNumber']].copy()
-    official_name_df.rename(columns={'Denomination': 'OfficialName'}, inplace=True)
+OUTPUT_COLUMNS = ['EntityNumber', 'OfficialName', 'Abbreviation', 'ZipCode', 'Municipality', 'Street', 'HouseNumber', 'URL', 'NaceCode']
 
-    # Filter for Abbreviation
-    abbreviation_df = dataframes['denomination'][
-        (dataframes['denomination']['TypeOfDenomination'] == 2) & 
-        (dataframes['denomination']['Language'] == 2)
-    ][['Denomination', 'EntityNumber']].copy()  
-    abbreviation_df.rename(columns={'Denomination': 'Abbreviation'}, inplace=True)
+def first_row_per_key(codes, n_keys):
+    """ Returns, for every key code, the position of its first row in `codes`, or -1 when the key does not occur. """
+    positions = np.full(n_keys, -1, dtype=np.int64)
+    unique_codes, first_index = np.unique(codes, return_index=True)
+    positions[unique_codes] = first_index
+    return positions
 
-    # Filter for ZipCode
-    zipcode_df = dataframes['address'][
-        (dataframes['address']['TypeOfAddress'] == "REGO")
-    ][['Zipcode', 'EntityNumber']].copy()  
-    zipcode_df.rename(columns={'Zipcode': 'ZipCode'}, inplace=True)
+def take(column, positions):
+    """ Takes the values at `positions` from a column; position -1 gives a missing value. """
+    return column.array.take(positions, allow_fill=True)
 
-    # Filter for Municipality
-    Municipality_df = dataframes['address'][
-        (dataframes['address']['TypeOfAddress'] == "REGO")
-    ][['MunicipalityNL', 'EntityNumber']].copy()  
-    Municipality_df.rename(columns={'MunicipalityNL': 'Municipality'}, inplace=True)
+def filter_data(dataframes, require_url=True):
+    """
+    Combines the KBO tables into one row per entity with its name, registered address, website and main activity.
 
-    # Filter for Street
-    Street_df = dataframes['address'][
-        (dataframes['address']['TypeOfAddress'] == "REGO")
-    ][['StreetNL', 'EntityNumber']].copy()  
-    Street_df.rename(columns={'StreetNL': 'Street'}, inplace=True)
+    Every source table is scanned once. The EntityNumbers of all selected rows are factorized together into
+    integer codes, each selection is reduced to its first row per code (like the former chain of left merges
+    followed by drop_duplicates did), and all columns are gathered in a single join on the sorted codes.
 
-    # Filter for HouseNumber
-    HouseNumber_df = dataframes['address'][
-        (dataframes['address']['TypeOfAddress'] == "REGO")
-    ][['HouseNumber', 'EntityNumber']].copy()  
-    HouseNumber_df.rename(columns={'HouseNumber': 'HouseNumber'}, inplace=True)
+    Parameters:
+    - dataframes: Mapping of table name to DataFrame (see data_loader).
+    - require_url: Only keep entities with a known website. The prediction pipeline keeps all entities.
+    """
+    denomination = dataframes['denomination']
+    dutch_names = denomination[
+        (denomination['Language'] == 2) &
+        (denomination['TypeOfDenomination'].isin([1, 2]))
+    ]
+    is_official = (dutch_names['TypeOfDenomination'] == 1).to_numpy()
 
-    # Filter for URL
-    URL_df = dataframes['contact'][
-        (dataframes['contact']['EntityContact'].isin(['ENT', 'EST'])) & 
-        (dataframes['contact']['ContactType'] == 'WEB') &
-        (dataframes['contact']['Value'].notna())
-    ][['Value', 'EntityNumber']].copy()
-    URL_df.rename(columns={'Value': 'URL'}, inplace=True)
+    address = dataframes['address']
+    address_df = address[address['TypeOfAddress'] == "REGO"]
 
-    # Filter for NaceCode
-    Activity_df = dataframes['activity'][
-         (dataframes['activity']['Classification'] == 'MAIN')
-    ][['NaceCode', 'EntityNumber']].copy()
-    Activity_df.rename(columns={'NaceCode': 'NaceCode'}, inplace=True)
+    contact = dataframes['contact']
+    URL_df = contact[
+        (contact['EntityContact'].isin(['ENT', 'EST'])) &
+        (contact['ContactType'] == 'WEB') &
+        (contact['Value'].notna())
+    ]
 
-    # Merge all filtered DataFrames
-    df_list = [official_name_df, abbreviation_df, zipcode_df, Municipality_df, Street_df, HouseNumber_df, URL_df, Activity_df]
-    combined_df = reduce(lambda left, right: pd.merge(left, right, on='EntityNumber', how='left'), df_list)
+    activity = dataframes['activity']
+    Activity_df = activity[activity['Classification'] == 'MAIN']
 
-    # Drop duplicates based on EntityNumber
-    combined_df.drop_duplicates(subset='EntityNumber', keep='first', inplace=True)
+    # One factorization of the EntityNumbers of every selected row
+    sources = [dutch_names, address_df, URL_df, Activity_df]
+    codes, entity_numbers = pd.factorize(pd.concat([df['EntityNumber'] for df in sources], ignore_index=True))
+    n_keys = len(entity_numbers)
+    source_codes = np.split(codes, np.cumsum([len(df) for df in sources])[:-1])
+    name_codes, address_codes, URL_codes, activity_codes = source_codes
 
-    # Remove entries without a URL
-    combined_df = combined_df[combined_df['URL'].notna()]
+    # Position of the first row of every entity in each selection
+    official_positions = first_row_per_key(name_codes[is_official], n_keys)
+    abbreviation_positions = first_row_per_key(name_codes[~is_official], n_keys)
+    address_positions = first_row_per_key(address_codes, n_keys)
+    URL_positions = first_row_per_key(URL_codes, n_keys)
+    activity_positions = first_row_per_key(activity_codes, n_keys)
 
-    # Select desired columns
-    combined_df = combined_df[['EntityNumber', 'OfficialName', 'Abbreviation', 'ZipCode', 'Municipality', 'Street', 'HouseNumber', 'URL', 'NaceCode']]
+    # Entities are driven by their official name, in the order they appear in the denomination table
+    official_rows = np.sort(official_positions[official_positions >= 0])
+    entities = name_codes[is_official][official_rows]
+    if require_url:
+        entities = entities[URL_positions[entities] >= 0]
 
-    return combined_df
+    official_names = dutch_names[is_official]
+    abbreviations = dutch_names[~is_official]
+    combined_df = pd.DataFrame({
+        'EntityNumber': entity_numbers.take(entities).array,
+        'OfficialName': take(official_names['Denomination'], official_positions[entities]),
+        'Abbreviation': take(abbreviations['Denomination'], abbreviation_positions[entities]),
+        'ZipCode': take(address_df['Zipcode'], address_positions[entities]),
+        'Municipality': take(address_df['MunicipalityNL'], address_positions[entities]),
+        'Street': take(address_df['StreetNL'], address_positions[entities]),
+        'HouseNumber': take(address_df['HouseNumber'], address_positions[entities]),
+        'URL': take(URL_df['Value'], URL_positions[entities]),
+        'NaceCode': take(Activity_df['NaceCode'], activity_positions[entities]),
+    })
+    return combined_df[OUTPUT_COLUMNS]
@@ -1,5 +1,27 @@
 import pandas as pd
 import os
+from collections.abc import Mapping
+
+# Tables, columns and row filters that filter_data needs from the KBO register.
+# Filters use the pyarrow format, so they are pushed down to the Parquet reader.
+FILTER_DATA_SPEC = {
+    'denomination': {
+        'columns': ['EntityNumber', 'Language', 'TypeOfDenomination', 'Denomination'],
+        'filters': [('Language', '==', 2), ('TypeOfDenomination', 'in', [1, 2])],
+    },
+    'address': {
+        'columns': ['EntityNumber', 'TypeOfAddress', 'Zipcode', 'MunicipalityNL', 'StreetNL', 'HouseNumber'],
+        'filters': [('TypeOfAddress', '==', 'REGO')],
+    },
+    'contact': {
+        'columns': ['EntityNumber', 'EntityContact', 'ContactType', 'Value'],
+        'filters': [('ContactType', '==', 'WEB'), ('EntityContact', 'in', ['ENT', 'EST'])],
+    },
+    'activity': {
+        'columns': ['EntityNumber', 'Classification', 'NaceCode'],
+        'filters': [('Classification', '==', 'MAIN')],
+    },
+}
 
 def load_data(parquet_directory):
     dataframes = {}
@@ -10,6 +32,61 @@ def load_data(parquet_directory):
             df = pd.read_parquet(filepath)
             key = os.path.splitext(parquet_file)[0]
             dataframes[key] = df
+        # Partitioned tables (see data_update) are stored as a directory of Parquet files
+        table_directories = [f for f in os.listdir(parquet_directory) if os.path.isdir(os.path.join(parquet_directory, f))]
+        for table_directory in table_directories:
+            dirpath = os.path.join(parquet_directory, table_directory)
+            if any(f.endswith('.parquet') for f in os.listdir(dirpath)):
+                dataframes[table_directory] = pd.read_parquet(dirpath)
         return dataframes
     else:
         raise FileNotFoundError(f"Directory does not exist: {parquet_directory}")
+
+class LazyTables(Mapping):
+    """
+    Read-only mapping of table name to DataFrame that reads a table on first access.
+
+    Only the columns and rows requested in the spec are read: the columns are projected and the
+    filters are handed to the Parquet reader, which skips row groups based on their statistics.
+    """
+    def __init__(self, parquet_directory, spec):
+        self.parquet_directory = parquet_directory
+        self.spec = spec
+        self.tables = {}
+
+    def table_path(self, table_name):
+        # A table is either a single Parquet file or a directory of partitions (see data_update)
+        directory_path = os.path.join(self.parquet_directory, table_name)
+        if os.path.isdir(directory_path):
+            return directory_path
+        return directory_path + '.parquet'
+
+    def __getitem__(self, table_name):
+        if table_name not in self.spec:
+            raise KeyError(table_name)
+        if table_name not in self.tables:
+            table_spec = self.spec[table_name]
+            self.tables[table_name] = pd.read_parquet(
+                self.table_path(table_name),
+                columns=table_spec.get('columns'),
+                filters=table_spec.get('filters') or None,
+            )
+        return self.tables[table_name]
+
+    def __iter__(self):
+        return iter(self.spec)
+
+    def __len__(self):
+        return len(self.spec)
+
+def load_data_lazy(parquet_directory, spec=FILTER_DATA_SPEC):
+    """
+    Returns a LazyTables mapping over `parquet_directory` for the tables in `spec`.
+
+    Parameters:
+    - parquet_directory: Directory with the KBO tables as Parquet files or partitioned directories.
+    - spec: Dict of table name to {'columns': [...], 'filters': [(column, op, value), ...]}.
+    """
+    if not os.path.exists(parquet_directory):
+        raise FileNotFoundError(f"Directory does not exist: {parquet_directory}")
+    return LazyTables(parquet_directory, spec)
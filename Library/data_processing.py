@@ -1,8 +1,51 @@
 import zipfile
 import pandas as pd
 import os
+from concurrent.futures import ThreadPoolExecutor
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
 
-from regex import F
+# Code columns have a handful of distinct values, so they are dictionary-encoded
+CODE = pa.dictionary(pa.int32(), pa.string())
+
+# Explicit column types per KBO table; columns not listed here are inferred by the CSV reader
+KBO_SCHEMAS = {
+    'activity': {
+        'EntityNumber': pa.string(), 'ActivityGroup': pa.string(), 'NaceVersion': pa.int16(),
+        'NaceCode': pa.string(), 'Classification': CODE
+    },
+    'address': {
+        'EntityNumber': pa.string(), 'TypeOfAddress': CODE, 'CountryNL': CODE, 'CountryFR': CODE,
+        'Zipcode': pa.string(), 'MunicipalityNL': pa.string(), 'MunicipalityFR': pa.string(),
+        'StreetNL': pa.string(), 'StreetFR': pa.string(), 'HouseNumber': pa.string(),
+        'Box': pa.string(), 'ExtraAddressInfo': pa.string(), 'DateStrikingOff': pa.string()
+    },
+    'branch': {
+        'Id': pa.string(), 'StartDate': pa.string(), 'EnterpriseNumber': pa.string()
+    },
+    'code': {
+        'Category': CODE, 'Code': pa.string(), 'Language': CODE, 'Description': pa.string()
+    },
+    'contact': {
+        'EntityNumber': pa.string(), 'EntityContact': CODE, 'ContactType': CODE, 'Value': pa.string()
+    },
+    'denomination': {
+        'EntityNumber': pa.string(), 'Language': pa.int8(), 'TypeOfDenomination': pa.int8(),
+        'Denomination': pa.string()
+    },
+    'enterprise': {
+        'EnterpriseNumber': pa.string(), 'Status': CODE, 'JuridicalSituation': CODE,
+        'TypeOfEnterprise': CODE, 'JuridicalForm': CODE, 'JuridicalFormCAC': CODE,
+        'StartDate': pa.string()
+    },
+    'establishment': {
+        'EstablishmentNumber': pa.string(), 'StartDate': pa.string(), 'EnterpriseNumber': pa.string()
+    },
+    'meta': {
+        'Variable': pa.string(), 'Value': pa.string()
+    },
+}
 
 def extract_and_convert_to_parquet(zip_filename, extraction_directory):
     with zipfile.ZipFile(zip_filename, 'r') as zip_ref:
@@ -17,3 +60,69 @@ def extract_and_convert_to_parquet(zip_filename, extraction_directory):
                 if 'Zipcode' in df.columns:
                     df['Zipcode'] = df['Zipcode'].astype(str)
                 df.to_parquet(parquet_file_path)
+
+def convert_zip_member_to_parquet(zip_filename, member, output_directory, block_size=16 << 20):
+    """
+    Streams one CSV member of a ZIP archive into a Parquet file, one row group per record batch.
+
+    Parameters:
+    - zip_filename: Path to the KBO ZIP archive.
+    - member: Name of the CSV member inside the archive.
+    - output_directory: Directory the Parquet file is written to.
+    - block_size: Number of CSV bytes decoded per record batch; bounds the memory used per member.
+
+    Returns:
+    - The path of the written Parquet file.
+    """
+    table_name = os.path.splitext(os.path.basename(member))[0]
+    parquet_file_path = os.path.join(output_directory, f'{table_name}.parquet')
+    tmp_file_path = parquet_file_path + '.tmp'
+
+    read_options = pacsv.ReadOptions(block_size=block_size)
+    # Empty fields become nulls, matching what pd.read_csv produced before
+    convert_options = pacsv.ConvertOptions(
+        column_types=KBO_SCHEMAS.get(table_name, {}), strings_can_be_null=True
+    )
+
+    writer = None
+    try:
+        with zipfile.ZipFile(zip_filename, 'r') as zip_ref, zip_ref.open(member) as csv_file:
+            reader = pacsv.open_csv(csv_file, read_options=read_options, convert_options=convert_options)
+            for batch in reader:
+                if writer is None:
+                    writer = pq.ParquetWriter(tmp_file_path, reader.schema)
+                writer.write_batch(batch)
+            if writer is None:
+                # Header-only member: still write an empty file with the right columns
+                writer = pq.ParquetWriter(tmp_file_path, reader.schema)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    # Only replace the previous Parquet file once the new one is complete
+    os.replace(tmp_file_path, parquet_file_path)
+    return parquet_file_path
+
+def stream_zip_to_parquet(zip_filename, output_directory, block_size=16 << 20, max_workers=4):
+    """
+    Converts every CSV member of a KBO ZIP archive to Parquet without extracting it to disk.
+
+    Members are read straight out of the archive in record batches of about `block_size` bytes
+    and converted in parallel, so peak memory is roughly `max_workers * block_size` instead of the
+    size of the largest table.
+
+    Returns:
+    - A list with the paths of the written Parquet files.
+    """
+    if not os.path.exists(output_directory):
+        os.makedirs(output_directory)
+
+    with zipfile.ZipFile(zip_filename, 'r') as zip_ref:
+        members = [name for name in zip_ref.namelist() if name.endswith('.csv')]
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(convert_zip_member_to_parquet, zip_filename, member, output_directory, block_size)
+            for member in members
+        ]
+        return [future.result() for future in futures]
@@ -1,7 +1,7 @@
 import pandas as pd
 def save_data(df_final_URL, parquet_file_path='./combined_filtered_dataset.parquet', csv_file_path='./PredictionDataset/Cleaned_df.csv'):
-    # Save the combined DataFrame as a Parquet file
-    df_final_URL.to_parquet(parquet_file_path)
+    # Save the combined DataFrame as a Parquet file; moderate row groups let it be read back in chunks
+    df_final_URL.to_parquet(parquet_file_path, row_group_size=100000)
     print(f"Combined and filtered DataFrame saved as Parquet file at: {parquet_file_path}")
 
     # Save the combined DataFrame as a CSV file
@@ -0,0 +1,138 @@
+import os
+import zipfile
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+from Library.data_processing import KBO_SCHEMAS, convert_zip_member_to_parquet
+
+# Key column of every table in the KBO update files; tables not listed here are delivered in full
+KEY_COLUMNS = {
+    'activity': 'EntityNumber',
+    'address': 'EntityNumber',
+    'contact': 'EntityNumber',
+    'denomination': 'EntityNumber',
+    'enterprise': 'EnterpriseNumber',
+    'establishment': 'EstablishmentNumber',
+    'branch': 'Id',
+}
+
+def entity_partition(keys, num_partitions):
+    """ Maps entity numbers to a partition number using a hash that is stable between runs. """
+    hashes = pd.util.hash_pandas_object(pd.Series(keys, dtype=object), index=False).to_numpy()
+    return (hashes % num_partitions).astype('int64')
+
+def partition_path(dataset_directory, table_name, partition):
+    return os.path.join(dataset_directory, table_name, f'part-{partition:03d}.parquet')
+
+def write_table_atomic(table, parquet_file_path):
+    """ Writes a table next to its destination first, so readers never see a half-written partition. """
+    tmp_file_path = parquet_file_path + '.tmp'
+    pq.write_table(table, tmp_file_path)
+    os.replace(tmp_file_path, parquet_file_path)
+
+def split_table_name(member):
+    """ Splits 'address_insert.csv' into ('address', 'insert'); full tables return (name, None). """
+    name = os.path.splitext(os.path.basename(member))[0]
+    for action in ('insert', 'delete'):
+        if name.endswith(f'_{action}'):
+            return name[:-len(action) - 1], action
+    return name, None
+
+def read_zip_member(zip_ref, member, table_name):
+    with zip_ref.open(member) as csv_file:
+        convert_options = pacsv.ConvertOptions(
+            column_types=KBO_SCHEMAS.get(table_name, {}), strings_can_be_null=True
+        )
+        return pacsv.read_csv(csv_file, convert_options=convert_options)
+
+def build_partitioned_dataset(parquet_directory, dataset_directory, num_partitions=64):
+    """
+    Seeds a keyed dataset from the Parquet files of a KBO Full archive.
+
+    Keyed tables are split into `num_partitions` files by a hash of their key column, other
+    tables (code, meta) are copied as a single file.
+    """
+    for parquet_file in os.listdir(parquet_directory):
+        if not parquet_file.endswith('.parquet'):
+            continue
+        table_name = os.path.splitext(parquet_file)[0]
+        table = pq.read_table(os.path.join(parquet_directory, parquet_file))
+        table_directory = os.path.join(dataset_directory, table_name)
+        os.makedirs(table_directory, exist_ok=True)
+
+        key_column = KEY_COLUMNS.get(table_name)
+        if key_column is None:
+            write_table_atomic(table, os.path.join(table_directory, parquet_file))
+            continue
+
+        partitions = entity_partition(table.column(key_column).to_pylist(), num_partitions)
+        for partition in range(num_partitions):
+            mask = pa.array(partitions == partition)
+            write_table_atomic(table.filter(mask), partition_path(dataset_directory, table_name, partition))
+        print(f"Partitioned {table_name} into {num_partitions} files")
+
+def apply_update_zip(zip_filename, dataset_directory, num_partitions=64):
+    """
+    Applies a KBO Update archive (<table>_delete.csv / <table>_insert.csv) to a keyed dataset.
+
+    For every table, all rows of the deleted and the inserted keys are removed and the inserted rows
+    are added, so applying an archive again (e.g. after a crash) does not duplicate rows. Only the
+    partitions that contain a changed key are rewritten.
+
+    Returns:
+    - A set with every entity number that was deleted or inserted in any table. It is also
+      saved as 'changed_entities.parquet' in the dataset directory.
+    """
+    changed_entities = set()
+    with zipfile.ZipFile(zip_filename, 'r') as zip_ref:
+        members = [name for name in zip_ref.namelist() if name.endswith('.csv')]
+        updates = {}
+        for member in members:
+            table_name, action = split_table_name(member)
+            if action is None:
+                # Code and meta tables are always delivered in full
+                table_directory = os.path.join(dataset_directory, table_name)
+                os.makedirs(table_directory, exist_ok=True)
+                convert_zip_member_to_parquet(zip_filename, member, table_directory)
+            elif table_name in KEY_COLUMNS:
+                updates.setdefault(table_name, {})[action] = read_zip_member(zip_ref, member, table_name)
+
+    for table_name, actions in updates.items():
+        key_column = KEY_COLUMNS[table_name]
+        deletes = actions.get('delete')
+        inserts = actions.get('insert')
+        deleted_keys = set(deletes.column(key_column).to_pylist()) if deletes is not None else set()
+        inserted_keys = inserts.column(key_column).to_pylist() if inserts is not None else []
+        changed_entities.update(deleted_keys)
+        changed_entities.update(inserted_keys)
+
+        insert_partitions = entity_partition(inserted_keys, num_partitions)
+        touched = set(entity_partition(list(deleted_keys), num_partitions)) | set(insert_partitions)
+        # The rows of an inserted key are replaced, so a second application leaves the same rows
+        removed_keys = deleted_keys | set(inserted_keys)
+        for partition in sorted(touched):
+            path = partition_path(dataset_directory, table_name, partition)
+            if os.path.exists(path):
+                table = pq.read_table(path)
+                if removed_keys:
+                    keep = pc.invert(pc.is_in(table.column(key_column), value_set=pa.array(list(removed_keys))))
+                    table = table.filter(keep)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                table = None
+            if inserts is not None:
+                new_rows = inserts.filter(pa.array(insert_partitions == partition))
+                if table is None:
+                    table = new_rows
+                elif new_rows.num_rows:
+                    table = pa.concat_tables([table, new_rows.cast(table.schema)])
+            if table is not None:
+                write_table_atomic(table, path)
+        print(f"Applied {table_name} update: {len(deleted_keys)} deleted keys, "
+              f"{len(inserted_keys)} inserted rows, {len(touched)} partitions rewritten")
+
+    changed_df = pd.DataFrame({'EntityNumber': sorted(changed_entities)})
+    changed_df.to_parquet(os.path.join(dataset_directory, 'changed_entities.parquet'), index=False)
+    return changed_entities
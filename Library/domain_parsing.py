@@ -0,0 +1,177 @@
+import os
+from collections import OrderedDict
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import tldextract
+from Library.data_preprocessing_ML import clean_extract_domain
+
+# Snapshot of https://publicsuffix.org/list/public_suffix_list.dat shipped with the code, so parsing
+# never depends on the network and gives the same result on every machine until it is updated
+PUBLIC_SUFFIX_LIST_PATH = os.path.join(os.path.dirname(__file__), 'public_suffix_list.dat')
+
+DOMAIN_FORMS = ['core_domain', 'clean_domain', 'domain_without_tld', 'tld']
+# Forms of a missing URL, as returned by get_core_domain, clean_extract_domain and get_domain_without_tld
+MISSING_FORMS = (None, None, '', None)
+
+def suffix_list_version(path=PUBLIC_SUFFIX_LIST_PATH):
+    """ Reads the '// VERSION: ...' line from the header of a public suffix list file. """
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.startswith('// VERSION:'):
+                return line.split(':', 1)[1].strip()
+            if line.startswith('// ===BEGIN'):
+                break
+    return None
+
+class DomainParser:
+    """
+    Parses URLs into their core domain, clean domain, domain without TLD and TLD.
+
+    Every distinct URL is parsed once with tldextract and the bundled public suffix list; the forms
+    are kept in an LRU cache of at most `max_entries` URLs. With a `cache_path`, the cache is loaded
+    when it was written for the same suffix list version and can be written back with save().
+    """
+    def __init__(self, max_entries=1000000, cache_path=None, suffix_list_path=PUBLIC_SUFFIX_LIST_PATH):
+        self.max_entries = max_entries
+        self.cache_path = cache_path
+        self.version = suffix_list_version(suffix_list_path)
+        self.extractor = tldextract.TLDExtract(
+            cache_dir=None, suffix_list_urls=('file://' + os.path.abspath(suffix_list_path),), fallback_to_snapshot=False
+        )
+        self.cache = OrderedDict()
+        self.stats = {'hits': 0, 'misses': 0, 'evicted': 0}
+        if cache_path and os.path.exists(cache_path):
+            self.load(cache_path)
+
+    def parse_url(self, url):
+        """ Returns (core_domain, clean_domain, domain_without_tld, tld) for one URL string. """
+        try:
+            extracted = self.extractor(url)
+        except Exception as e:
+            print(f"Error extracting domain from URL '{url}': {str(e)}")
+            extracted = None
+        if extracted is not None and extracted.domain and extracted.suffix:
+            core_domain = "{}.{}".format(extracted.domain, extracted.suffix).lower()
+            # The registrable part of the core domain, as get_domain_without_tld(core_domain) returns it
+            domain_without_tld = extracted.domain.lower()
+        else:
+            core_domain, domain_without_tld = None, ''
+        tld = extracted.suffix.lower() if extracted is not None and extracted.suffix else None
+        return core_domain, clean_extract_domain(url), domain_without_tld, tld
+
+    def parse(self, url):
+        """ Cached parse_url. """
+        forms = self.cache.get(url)
+        if forms is not None:
+            self.cache.move_to_end(url)
+            self.stats['hits'] += 1
+            return forms
+        self.stats['misses'] += 1
+        forms = self.parse_url(url)
+        self.cache[url] = forms
+        if len(self.cache) > self.max_entries:
+            self.cache.popitem(last=False)
+            self.stats['evicted'] += 1
+        return forms
+
+    def parse_column(self, urls):
+        """
+        Parses a Series of URLs; every distinct value is looked up once.
+
+        Returns:
+        - A DataFrame with the DOMAIN_FORMS columns, aligned with `urls`.
+        """
+        codes, uniques = pd.factorize(urls)
+        # Missing values get code -1, which picks the trailing MISSING_FORMS
+        parsed = [self.parse(url) for url in uniques] + [MISSING_FORMS]
+        columns = list(zip(*parsed))
+        return pd.DataFrame(
+            {form: pd.Series(columns[i], dtype=object).to_numpy()[codes] for i, form in enumerate(DOMAIN_FORMS)},
+            index=urls.index
+        )
+
+    def hit_rate(self):
+        lookups = self.stats['hits'] + self.stats['misses']
+        return self.stats['hits'] / lookups if lookups else 0.0
+
+    def save(self, path=None):
+        """ Writes the cache, least recently used first, to Parquet together with the suffix list version. """
+        path = path or self.cache_path
+        urls = list(self.cache)
+        columns = list(zip(*self.cache.values())) if urls else [[]] * len(DOMAIN_FORMS)
+        table = pa.table({'url': pa.array(urls, type=pa.string()),
+                          **{form: pa.array(columns[i], type=pa.string()) for i, form in enumerate(DOMAIN_FORMS)}})
+        table = table.replace_schema_metadata({'suffix_list_version': str(self.version)})
+        pq.write_table(table, path + '.tmp')
+        os.replace(path + '.tmp', path)
+
+    def load(self, path):
+        table = pq.read_table(path)
+        version = (table.schema.metadata or {}).get(b'suffix_list_version', b'').decode()
+        if version != str(self.version):
+            print(f"Ignoring domain cache {path}: written for suffix list {version}, using {self.version}")
+            return
+        columns = [table.column(name).to_pylist() for name in ['url'] + DOMAIN_FORMS]
+        for url, *forms in zip(*columns):
+            self.cache[url] = tuple(forms)
+        while len(self.cache) > self.max_entries:
+            self.cache.popitem(last=False)
+
+def read_icann_suffixes(path=PUBLIC_SUFFIX_LIST_PATH):
+    """
+    Reads the public suffixes of the ICANN section of a public suffix list, e.g. 'be', 'com', 'co.uk'.
+
+    Internationalized suffixes are added in both their Unicode and punycode ('xn--') form. Wildcard
+    and exception rules are skipped; the parent suffix of a wildcard is listed on its own.
+    """
+    suffixes = set()
+    in_icann = False
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line == '// ===BEGIN ICANN DOMAINS===':
+                in_icann = True
+            elif line == '// ===END ICANN DOMAINS===':
+                break
+            elif in_icann and line and not line.startswith(('//', '*', '!')):
+                suffixes.add(line)
+                try:
+                    suffixes.add(line.encode('idna').decode('ascii'))
+                except UnicodeError:
+                    pass
+    return suffixes
+
+class TldStripper:
+    """
+    Removes the public suffix from host names with a fixed table of suffixes.
+
+    The host is split into labels from the right and every longer suffix is looked up in a set, so
+    the work per host only depends on its number of labels. The longest known suffix is removed,
+    but never the whole host: 'bakkerij.be' -> 'bakkerij', 'bakkerij.co.uk' -> 'bakkerij', 'be' -> 'be'.
+    """
+    def __init__(self, suffixes, version=None):
+        self.suffixes = frozenset(suffix.lower() for suffix in suffixes)
+        self.version = version
+
+    def strip(self, host):
+        if not isinstance(host, str):
+            return ''
+        labels = host.split('.')
+        suffix = ''
+        keep = len(labels)
+        for i in range(len(labels) - 1, 0, -1):
+            suffix = labels[i].lower() + ('.' + suffix if suffix else '')
+            if suffix in self.suffixes:
+                keep = i
+        return '.'.join(labels[:keep])
+
+    def strip_column(self, hosts):
+        """ Strips a Series of hosts; every distinct host is stripped once. """
+        codes, uniques = pd.factorize(hosts)
+        stripped = pd.Series([self.strip(host) for host in uniques] + [''], dtype=object).to_numpy()
+        return pd.Series(stripped[codes], index=hosts.index)
+
+def load_tld_stripper(path=PUBLIC_SUFFIX_LIST_PATH):
+    """ Loads a TldStripper with the ICANN suffixes of the bundled public suffix list, versioned by the list's version. """
+    return TldStripper(read_icann_suffixes(path), version=suffix_list_version(path))
@@ -0,0 +1,102 @@
+import hashlib
+import json
+import os
+import numpy as np
+import pandas as pd
+
+def url_key(model_version, url):
+    """ 64-bit content address of a URL embedded by a model version (collisions are negligible below billions of URLs). """
+    digest = hashlib.blake2b(f'{model_version}\x00{url}'.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little', signed=True)
+
+class EmbeddingStore:
+    """
+    Persistent URL embeddings: the vectors are rows of a raw array file that is read as a memory map,
+    and an index maps the key of (model version, URL) to its row. Embeddings of other model versions
+    can live in the same store; they simply have other keys.
+
+    The vectors file is only appended to and the index is replaced atomically after the rows are
+    written, so an interrupted run loses at most the rows it had not indexed yet. One process should
+    write to a store at a time.
+    """
+    def __init__(self, directory, model_version, embedding_dim=768, dtype='float16'):
+        self.directory = directory
+        self.model_version = model_version
+        self.vectors_path = os.path.join(directory, 'vectors.bin')
+        self.index_path = os.path.join(directory, 'index.parquet')
+        self.meta_path = os.path.join(directory, 'store.json')
+        self.stats = {'hits': 0, 'misses': 0}
+        os.makedirs(directory, exist_ok=True)
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path) as f:
+                meta = json.load(f)
+            if meta['embedding_dim'] != embedding_dim or meta['dtype'] != dtype:
+                raise ValueError(f"{directory} holds {meta['dtype']} vectors of dimension {meta['embedding_dim']}, "
+                                 f"not {dtype} of dimension {embedding_dim}")
+        else:
+            with open(self.meta_path, 'w') as f:
+                json.dump({'embedding_dim': embedding_dim, 'dtype': dtype}, f)
+        self.embedding_dim = embedding_dim
+        self.dtype = np.dtype(dtype)
+        self.row_bytes = self.embedding_dim * self.dtype.itemsize
+
+        keys = pd.read_parquet(self.index_path)['key'].to_numpy() if os.path.exists(self.index_path) else np.empty(0, dtype=np.int64)
+        self.keys = pd.Index(keys)
+        # Drop rows written after the last index update, so new rows line up with their index entries
+        with open(self.vectors_path, 'ab') as f:
+            f.truncate(len(self.keys) * self.row_bytes)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def make_keys(self, urls):
+        return np.array([url_key(self.model_version, url) for url in urls], dtype=np.int64)
+
+    def lookup(self, urls):
+        """ Returns the row of every URL, or -1 for URLs that are not stored for this model version. """
+        return self.keys.get_indexer(self.make_keys(urls))
+
+    def add(self, urls, embeddings):
+        """ Appends the embeddings of URLs that are not stored yet. """
+        keys = self.make_keys(urls)
+        new = (self.keys.get_indexer(keys) == -1) & ~pd.Index(keys).duplicated()
+        if not new.any():
+            return
+        with open(self.vectors_path, 'ab') as f:
+            f.write(np.ascontiguousarray(embeddings[new], dtype=self.dtype).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        self.keys = self.keys.append(pd.Index(keys[new]))
+        pd.DataFrame({'key': self.keys.to_numpy()}).to_parquet(self.index_path + '.tmp', index=False)
+        os.replace(self.index_path + '.tmp', self.index_path)
+
+    def vectors(self):
+        """ The stored vectors as a read-only memory map of shape (rows, embedding_dim). """
+        return np.memmap(self.vectors_path, dtype=self.dtype, mode='r', shape=(len(self.keys), self.embedding_dim))
+
+    def gather(self, rows):
+        """ Reads the given rows as float32; only the pages of those rows are loaded from disk. """
+        if len(self.keys) == 0:
+            return np.empty((len(rows), self.embedding_dim), dtype=np.float32)
+        return self.vectors()[rows].astype(np.float32)
+
+    def embed(self, urls, embedder):
+        """
+        Returns one embedding per URL, in input order, computing with `embedder` (a UrlEmbedder) only
+        the distinct URLs that are not stored yet. Missing URLs are stored as the string 'NaN', like
+        UrlEmbedder.embed does.
+        """
+        codes, uniques = pd.factorize(pd.Series(urls, dtype=object).fillna('NaN'))
+        uniques = list(uniques)
+        rows = self.lookup(uniques)
+        missing = np.flatnonzero(rows == -1)
+        self.stats['hits'] += len(uniques) - len(missing)
+        self.stats['misses'] += len(missing)
+        if len(missing):
+            self.add([uniques[i] for i in missing], embedder.embed([uniques[i] for i in missing]))
+            rows = self.lookup(uniques)
+        return self.gather(rows[codes])
+
+    def hit_rate(self):
+        lookups = self.stats['hits'] + self.stats['misses']
+        return self.stats['hits'] / lookups if lookups else 0.0
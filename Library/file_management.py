@@ -1,18 +1,28 @@
 import os
 import re
 
-def find_latest_zip_file(directory):
-    zip_files = [f for f in os.listdir(directory) if f.endswith('.zip')]
-    sorted_files = sorted(zip_files, key=lambda x: [int(y) if y.isdigit() else y for y in re.split('(_|\D)', x)])
+def sort_zip_files(zip_files):
+    return sorted(zip_files, key=lambda x: [int(y) if y.isdigit() else y for y in re.split('(_|\D)', x)])
+
+def find_latest_zip_file(directory, suffix='.zip'):
+    zip_files = [f for f in os.listdir(directory) if f.endswith(suffix)]
+    sorted_files = sort_zip_files(zip_files)
     return sorted_files[-1] if sorted_files else None
 
-def update_last_processed_file(filename, directory):
-    with open(os.path.join(directory, 'last_processed.txt'), 'w') as f:
+def find_pending_update_files(directory, last_processed):
+    """ Returns the '*_Update.zip' files that are newer than the last processed one, oldest first. """
+    update_files = sort_zip_files([f for f in os.listdir(directory) if f.endswith('_Update.zip')])
+    if last_processed in update_files:
+        return update_files[update_files.index(last_processed) + 1:]
+    return update_files
+
+def update_last_processed_file(filename, directory, state_file='last_processed.txt'):
+    with open(os.path.join(directory, state_file), 'w') as f:
         f.write(filename)
 
-def get_last_processed_file(directory):
+def get_last_processed_file(directory, state_file='last_processed.txt'):
     try:
-        with open(os.path.join(directory, 'last_processed.txt'), 'r') as f:
+        with open(os.path.join(directory, state_file), 'r') as f:
             return f.read().strip()
     except FileNotFoundError:
         return None
@@ -0,0 +1,276 @@
+import asyncio
+import re
+import time
+from html.parser import HTMLParser
+from urllib.parse import urlsplit
+from urllib.robotparser import RobotFileParser
+import numpy as np
+import pandas as pd
+from Library.http_transport import HttpError, HttpTransport
+
+# Belgian enterprise numbers as they appear on websites: 0123.456.749, 0123 456 749, BE0123456749,
+# BTW BE 0123.456.749, or the older nine digits 123.456.749
+ENTERPRISE_NUMBER_PATTERN = re.compile(r'(?<![\w.])(?:BE\s?)?([01]?\d{3})[.\s]?(\d{3})[.\s]?(\d{3})(?![\w])', re.IGNORECASE)
+
+PAGE_COLUMNS = ['homepage', 'final_url', 'status', 'error', 'title', 'description', 'keywords', 'site_name',
+                'enterprise_numbers', 'bytes', 'truncated']
+
+def normalize_enterprise_number(number):
+    """ The ten digits of an enterprise number ('0123.456.749', 'BE 123456749' -> '0123456749'), or None if the check digits are wrong. """
+    digits = re.sub(r'\D', '', str(number))
+    if len(digits) == 9:
+        digits = '0' + digits
+    if len(digits) != 10 or digits[0] not in '01':
+        return None
+    # The last two digits are 97 minus the first eight modulo 97
+    if 97 - int(digits[:8]) % 97 != int(digits[8:]):
+        return None
+    return digits
+
+def find_enterprise_numbers(text):
+    """ The valid enterprise numbers in a text, normalized and in order of appearance, without duplicates. """
+    numbers = []
+    for match in ENTERPRISE_NUMBER_PATTERN.finditer(text):
+        number = normalize_enterprise_number(''.join(match.groups()))
+        if number and number not in numbers:
+            numbers.append(number)
+    return numbers
+
+class PageSignalParser(HTMLParser):
+    """ Collects the title, the meta tags and the visible text of an HTML page. """
+    META_NAMES = {'description': 'description', 'keywords': 'keywords', 'og:site_name': 'site_name',
+                  'og:description': 'description', 'application-name': 'site_name'}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.title = []
+        self.meta = {}
+        self.text = []
+        self.in_title = False
+        self.skip = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'title':
+            self.in_title = True
+        elif tag in ('script', 'style', 'noscript'):
+            self.skip += 1
+        elif tag == 'meta':
+            attrs = dict(attrs)
+            name = (attrs.get('name') or attrs.get('property') or '').lower()
+            field = self.META_NAMES.get(name)
+            # <meta name="description"> wins over og:description
+            if field and attrs.get('content') and field not in self.meta:
+                self.meta[field] = attrs['content'].strip()
+
+    def handle_endtag(self, tag):
+        if tag == 'title':
+            self.in_title = False
+        elif tag in ('script', 'style', 'noscript') and self.skip:
+            self.skip -= 1
+
+    def handle_data(self, data):
+        if self.in_title:
+            self.title.append(data)
+        elif not self.skip:
+            self.text.append(data)
+
+def extract_page_signals(html):
+    """
+    Extracts the verification signals of a homepage.
+
+    Returns:
+    - A dict with title, description, keywords and site_name (None when missing) and enterprise_numbers,
+      the valid enterprise numbers in the text and meta tags joined with ';'.
+    """
+    parser = PageSignalParser()
+    try:
+        parser.feed(html)
+        parser.close()
+    except Exception:
+        # Whatever was parsed before the broken markup is still used
+        pass
+    text = ' '.join(parser.text + list(parser.meta.values()))
+    title = ' '.join(''.join(parser.title).split()) or None
+    return {
+        'title': title,
+        'description': parser.meta.get('description'),
+        'keywords': parser.meta.get('keywords'),
+        'site_name': parser.meta.get('site_name'),
+        'enterprise_numbers': ';'.join(find_enterprise_numbers(text)),
+    }
+
+def homepage_url(url):
+    """ The homepage of a candidate URL (scheme and host), or None for an empty or unusable URL. """
+    if not isinstance(url, str) or not url.strip():
+        return None
+    url = url.strip()
+    if '://' not in url:
+        url = 'http://' + url
+    try:
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https') or not parts.hostname:
+            return None
+        netloc = parts.hostname.lower() + (f':{parts.port}' if parts.port else '')
+    except ValueError:
+        # Malformed search results, e.g. a non-numeric port or a stray '['
+        return None
+    return f'{parts.scheme}://{netloc}/'
+
+def decode_body(response):
+    content_type = response.headers.get('Content-Type', '')
+    match = re.search(r'charset=["\']?([\w-]+)', content_type, re.IGNORECASE)
+    encoding = match.group(1) if match else 'utf-8'
+    try:
+        return response.body.decode(encoding, errors='replace')
+    except LookupError:
+        return response.body.decode('utf-8', errors='replace')
+
+class HomepageCrawler:
+    """
+    Fetches candidate homepages concurrently and extracts their verification signals (extract_page_signals).
+
+    Up to `concurrency` requests are in flight, over all hosts together. Every host gets one request at a
+    time, at least `host_delay` seconds apart (or the Crawl-delay of its robots.txt, up to `max_crawl_delay`).
+    robots.txt is fetched once per host and kept; a missing robots.txt (4xx) allows everything, an unreachable
+    one (5xx, network errors) nothing. Only the first `max_bytes` of a page are read, and the transport's
+    timeouts, retries and circuit breakers apply to every request.
+
+    The host state is kept between crawl() calls, so crawling in batches does not fetch robots.txt again.
+    """
+    def __init__(self, transport=None, concurrency=200, host_delay=1.0, max_crawl_delay=10.0, max_bytes=500000,
+                 robots_max_bytes=100000, user_agent='URLfinder', respect_robots=True):
+        self.transport = transport or HttpTransport(limit=concurrency, max_retries=1)
+        self.concurrency = concurrency
+        self.host_delay = host_delay
+        self.max_crawl_delay = max_crawl_delay
+        self.max_bytes = max_bytes
+        self.robots_max_bytes = robots_max_bytes
+        self.user_agent = user_agent
+        self.respect_robots = respect_robots
+        self.robots = {}
+        self.robots_requests = {}
+        self.host_locks = {}
+        self.next_request = {}
+        self.stats = {'pages': 0, 'fetched': 0, 'errors': 0, 'disallowed': 0, 'truncated': 0, 'robots_fetched': 0,
+                      'robots_missing': 0, 'robots_unreachable': 0}
+
+    async def polite_get(self, host, url, max_bytes, slots):
+        """ GET through the transport in the request slot of `host`, after its delay has passed. """
+        if host not in self.host_locks:
+            self.host_locks[host] = asyncio.Lock()
+        async with self.host_locks[host]:
+            wait = self.next_request.get(host, 0) - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            try:
+                # The slot is taken after the delay, so hosts that are waiting do not hold up the others
+                async with slots:
+                    return await self.transport.get(url, max_bytes=max_bytes, headers={'User-Agent': self.user_agent})
+            finally:
+                self.next_request[host] = time.monotonic() + self.crawl_delay(host)
+
+    def crawl_delay(self, host):
+        robots = self.robots.get(host)
+        delay = robots.crawl_delay(self.user_agent) if isinstance(robots, RobotFileParser) else None
+        return min(max(self.host_delay, float(delay or 0)), self.max_crawl_delay)
+
+    async def fetch_robots(self, homepage, host, slots):
+        try:
+            response = await self.polite_get(host, homepage + 'robots.txt', self.robots_max_bytes, slots)
+        except HttpError as e:
+            # RFC 9309: a robots.txt that does not exist allows everything, an unreachable one nothing
+            self.robots[host] = e.status < 500
+            self.stats['robots_missing' if e.status < 500 else 'robots_unreachable'] += 1
+        except Exception:
+            self.robots[host] = False
+            self.stats['robots_unreachable'] += 1
+        else:
+            robots = RobotFileParser()
+            robots.parse(decode_body(response).splitlines())
+            self.robots[host] = robots
+            self.stats['robots_fetched'] += 1
+
+    async def allowed(self, homepage, host, slots):
+        if not self.respect_robots:
+            return True
+        if host not in self.robots:
+            # Pages of the same host (http and https) wait for the one request for its robots.txt
+            if host not in self.robots_requests:
+                self.robots_requests[host] = asyncio.ensure_future(self.fetch_robots(homepage, host, slots))
+            await asyncio.shield(self.robots_requests[host])
+        robots = self.robots[host]
+        if isinstance(robots, bool):
+            return robots
+        return robots.can_fetch(self.user_agent, homepage)
+
+    async def fetch(self, homepage, slots):
+        page = dict.fromkeys(PAGE_COLUMNS)
+        page.update(homepage=homepage, bytes=0, truncated=False)
+        host = urlsplit(homepage).netloc
+        self.stats['pages'] += 1
+        try:
+            if not await self.allowed(homepage, host, slots):
+                self.stats['disallowed'] += 1
+                page['error'] = 'disallowed by robots.txt'
+                return page
+            response = await self.polite_get(host, homepage, self.max_bytes, slots)
+        except HttpError as e:
+            self.stats['errors'] += 1
+            page.update(status=e.status, error=str(e))
+            return page
+        except Exception as e:
+            self.stats['errors'] += 1
+            page['error'] = repr(e)
+            return page
+        self.stats['fetched'] += 1
+        self.stats['truncated'] += int(response.truncated)
+        page.update(final_url=response.url, status=response.status, bytes=len(response.body), truncated=response.truncated)
+        page.update(extract_page_signals(decode_body(response)))
+        return page
+
+    async def crawl(self, urls):
+        """
+        Fetches the homepages of `urls` (each distinct homepage once).
+
+        Returns:
+        - A DataFrame with one row per distinct homepage (PAGE_COLUMNS); `error` says why a page has no signals.
+        """
+        homepages = list(dict.fromkeys(h for h in map(homepage_url, urls) if h))
+        slots = asyncio.Semaphore(self.concurrency)
+        await self.transport.open()
+        try:
+            pages = await asyncio.gather(*(self.fetch(homepage, slots) for homepage in homepages))
+        finally:
+            await self.transport.close()
+            # Locks and requests belong to the event loop of this call
+            self.host_locks = {}
+            self.robots_requests = {}
+        return pd.DataFrame(pages, columns=PAGE_COLUMNS)
+
+    def crawl_all(self, urls):
+        """ Synchronous wrapper around crawl for scripts and notebooks. """
+        return asyncio.run(self.crawl(urls))
+
+def add_homepage_features(merged_dataset, pages, url_columns=None):
+    """
+    Adds the signals of the crawled homepages (HomepageCrawler.crawl) to every candidate URL column:
+    URL{i}_page_fetched, URL{i}_page_title, URL{i}_page_description, URL{i}_page_enterprise_numbers (how
+    many valid numbers the page lists) and URL{i}_enterprise_number_match (1 if one of them is the entity's
+    EntityNumber). The flags and counts are 0 for candidates whose page was not fetched.
+    """
+    url_columns = url_columns or [f'URL{i}' for i in range(1, 6)]
+    pages = pages.drop_duplicates('homepage', keep='last').set_index('homepage')
+    fetched = pages['status'].notna() & pages['error'].isna()
+    numbers = pages['enterprise_numbers'].fillna('')
+    entity_numbers = merged_dataset['EntityNumber'].astype(str).str.replace(r'\D', '', regex=True).str.zfill(10).to_numpy()
+    for col in url_columns:
+        homepages = merged_dataset[col].map(homepage_url)
+        merged_dataset[f'{col}_page_fetched'] = homepages.map(fetched).eq(True).astype(np.int8)
+        merged_dataset[f'{col}_page_title'] = homepages.map(pages['title'])
+        merged_dataset[f'{col}_page_description'] = homepages.map(pages['description'])
+        page_numbers = homepages.map(numbers).fillna('').to_numpy()
+        merged_dataset[f'{col}_page_enterprise_numbers'] = np.array(
+            [len(n.split(';')) if n else 0 for n in page_numbers], dtype=np.int16)
+        merged_dataset[f'{col}_enterprise_number_match'] = np.array(
+            [bool(n) and entity in n.split(';') for entity, n in zip(entity_numbers, page_numbers)], dtype=np.int8)
+    return merged_dataset
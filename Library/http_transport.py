@@ -0,0 +1,241 @@
+import asyncio
+import json
+import random
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+import aiohttp
+
+# Statuses that mean "try again later" rather than "this request is wrong"
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+
+class HttpError(Exception):
+    """ An HTTP error status; `retry_after` holds the seconds of a Retry-After header, if there was one. """
+    def __init__(self, status, url, retry_after=None, body=b''):
+        super().__init__(f'HTTP {status} for {url}')
+        self.status = status
+        self.url = url
+        self.retry_after = retry_after
+        self.body = body
+        # request() can mark other errors as retryable, e.g. a rate limit an API answers with a 403
+        self.retryable = status in RETRY_STATUSES
+
+class CircuitOpen(Exception):
+    """ Raised without sending anything while the circuit breaker of a host is open; `retry_in` is the rest of its cooldown. """
+    def __init__(self, host, retry_in):
+        super().__init__(f'circuit open for {host}, retry in {retry_in:.1f} s')
+        self.host = host
+        self.retry_in = retry_in
+
+def parse_retry_after(value):
+    """ Seconds to wait according to a Retry-After header (delta seconds or an HTTP date), or None. """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+class CircuitBreaker:
+    """
+    Circuit breaker of one host. After `threshold` failures in a row it opens and requests fail right
+    away for `cooldown` seconds. Then one request is let through: if it succeeds the circuit closes,
+    otherwise it stays open for another cooldown.
+    """
+    def __init__(self, threshold=5, cooldown=30.0):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened = None
+        self.probing = False
+
+    @property
+    def state(self):
+        if self.opened is None:
+            return 'closed'
+        return 'half-open' if time.monotonic() - self.opened >= self.cooldown else 'open'
+
+    def before_request(self, host):
+        if self.opened is None:
+            return
+        remaining = self.cooldown - (time.monotonic() - self.opened)
+        if remaining > 0:
+            raise CircuitOpen(host, remaining)
+        if self.probing:
+            # Another request is finding out whether the host is back
+            raise CircuitOpen(host, self.cooldown)
+        self.probing = True
+
+    def record_success(self):
+        self.failures = 0
+        self.opened = None
+        self.probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self.probing or self.failures >= self.threshold:
+            self.opened = time.monotonic()
+        self.probing = False
+
+    def release(self):
+        """ Ends a probe that neither succeeded nor failed (it was cancelled or rejected for other reasons). """
+        self.probing = False
+
+class HttpResponse:
+    def __init__(self, status, url, headers, body, truncated=False):
+        self.status = status
+        self.url = url
+        self.headers = headers
+        self.body = body
+        self.truncated = truncated
+
+    def text(self, encoding=None):
+        return self.body.decode(encoding or 'utf-8', errors='replace')
+
+    def json(self):
+        return json.loads(self.body)
+
+class HttpTransport:
+    """
+    Shared HTTP client for the outbound search and crawl calls.
+
+    All users share one aiohttp session with a pooled, keep-alive connector: at most `limit` connections,
+    and `limit_per_host` per host unless that is 0. Failed calls are retried up to `max_retries` times,
+    after the Retry-After of the response or else an exponential backoff with full jitter. Every host has
+    a CircuitBreaker, so a host that keeps failing is left alone for a while instead of being hammered.
+
+    Connection errors, timeouts and the statuses in RETRY_STATUSES are retried; other 4xx responses
+    (such as a used-up API quota) raise HttpError at once. A Retry-After longer than `max_retry_after`
+    is not waited for in place; the HttpError is raised so the caller can retry the call later.
+
+    The session lives while at least one user has it open (open()/close()), as it belongs to the event
+    loop it was created in; the circuit breakers and `stats` carry over between sessions.
+    """
+    def __init__(self, timeout=10, connect_timeout=5, limit=100, limit_per_host=0, max_retries=3, backoff_base=0.5,
+                 backoff_max=8.0, max_retry_after=10.0, breaker_threshold=5, breaker_cooldown=30.0, user_agent=None, resolver=None):
+        self.timeout = aiohttp.ClientTimeout(total=timeout, connect=connect_timeout)
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_retry_after = max_retry_after
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown = breaker_cooldown
+        self.headers = {'User-Agent': user_agent} if user_agent else None
+        # An aiohttp resolver, e.g. to point test host names at a local server
+        self.resolver = resolver
+        self.breakers = {}
+        self.session = None
+        self.users = 0
+        self.stats = {'calls': 0, 'attempts': 0, 'retries': 0, 'retry_after_waits': 0, 'failures': 0,
+                      'circuit_rejections': 0, 'sessions': 0}
+
+    async def open(self):
+        if self.session is None:
+            connector = aiohttp.TCPConnector(limit=self.limit, limit_per_host=self.limit_per_host,
+                                             keepalive_timeout=30, ttl_dns_cache=300, resolver=self.resolver)
+            self.session = aiohttp.ClientSession(connector=connector, timeout=self.timeout, headers=self.headers)
+            self.stats['sessions'] += 1
+        self.users += 1
+        return self.session
+
+    async def close(self):
+        self.users -= 1
+        if self.users == 0:
+            await self.session.close()
+            self.session = None
+
+    def breaker(self, host):
+        if host not in self.breakers:
+            self.breakers[host] = CircuitBreaker(self.breaker_threshold, self.breaker_cooldown)
+        return self.breakers[host]
+
+    def backoff(self, attempt):
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    async def call(self, host, attempt_call, retry_on=()):
+        """
+        Runs `attempt_call` (a coroutine function without arguments) with the retries and the circuit breaker
+        of `host`. Besides connection errors, timeouts and retryable HTTP statuses, the exception types in
+        `retry_on` are retried, e.g. the rate-limit errors of a client library that does its own HTTP.
+        """
+        breaker = self.breaker(host)
+        self.stats['calls'] += 1
+        attempt = 0
+        while True:
+            try:
+                breaker.before_request(host)
+            except CircuitOpen:
+                self.stats['circuit_rejections'] += 1
+                raise
+            self.stats['attempts'] += 1
+            try:
+                result = await attempt_call()
+            except HttpError as e:
+                if not e.retryable:
+                    # The host answered, it just refused this request
+                    breaker.release()
+                    raise
+                error = e
+            except (aiohttp.ClientError, asyncio.TimeoutError, OSError) + tuple(retry_on) as e:
+                error = e
+            except BaseException:
+                breaker.release()
+                raise
+            else:
+                breaker.record_success()
+                return result
+
+            breaker.record_failure()
+            retry_after = getattr(error, 'retry_after', None)
+            if attempt >= self.max_retries or (retry_after is not None and retry_after > self.max_retry_after):
+                self.stats['failures'] += 1
+                raise error
+            if retry_after is not None:
+                self.stats['retry_after_waits'] += 1
+                delay = retry_after
+            else:
+                delay = self.backoff(attempt)
+            attempt += 1
+            self.stats['retries'] += 1
+            await asyncio.sleep(delay)
+
+    async def request(self, method, url, max_bytes=None, retry_if=None, **kwargs):
+        """
+        Sends a request through the shared session (see call()) and returns an HttpResponse; error statuses raise HttpError.
+        With `max_bytes` at most that much of the body is read, and the response is marked as truncated.
+        `retry_if` (a function of the HttpError) marks more errors as retryable than RETRY_STATUSES.
+        """
+        if self.session is None:
+            raise RuntimeError('HttpTransport.request() needs an open transport (await transport.open())')
+
+        async def attempt_call():
+            async with self.session.request(method, url, **kwargs) as response:
+                if response.status >= 400:
+                    body = await response.content.read(4096)
+                    error = HttpError(response.status, url, parse_retry_after(response.headers.get('Retry-After')), body)
+                    if retry_if is not None and retry_if(error):
+                        error.retryable = True
+                    raise error
+                body = bytearray()
+                truncated = False
+                async for chunk in response.content.iter_chunked(65536):
+                    body += chunk
+                    if max_bytes is not None and len(body) >= max_bytes:
+                        truncated = len(body) > max_bytes or not response.content.at_eof()
+                        del body[max_bytes:]
+                        break
+                return HttpResponse(response.status, str(response.url), response.headers, bytes(body), truncated)
+
+        return await self.call(urlsplit(url).hostname or '', attempt_call)
+
+    async def get(self, url, **kwargs):
+        return await self.request('GET', url, **kwargs)
+
+    def breaker_states(self):
+        return {host: breaker.state for host, breaker in self.breakers.items()}
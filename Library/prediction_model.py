@@ -0,0 +1,109 @@
+import os
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import StandardScaler
+
+BUNDLE_FORMAT_VERSION = 1
+# Label classes in the order create_predicted_url_df reads the predictions: no correct URL, then URL1..URL5
+LABEL_CLASSES = [-1, 1, 2, 3, 4, 5]
+
+def model_output_count(model):
+    """ Number of labels a trained multilabel model predicts, or None when the model does not tell. """
+    if hasattr(model, 'n_outputs_'):
+        return int(model.n_outputs_)
+    # MultiOutputClassifier and ClassifierChain keep one estimator per label
+    if isinstance(getattr(model, 'estimators_', None), list):
+        return len(model.estimators_)
+    return None
+
+def fit_model_bundle(model, X, y_encoded, label_classes, fit_model=True, test_size=0.2, random_state=42):
+    """
+    Fits the preprocessing (and optionally the model) like Pipeline_ML does: a stratified split, a
+    StandardScaler fitted on the training part and the model trained on the scaled training part.
+
+    With fit_model=False, `model` is already trained and only the scaler is fitted, on the same split
+    the model was trained on.
+
+    Returns:
+    - The bundle: a dict with the model, the fitted scaler, the feature column order and the label classes.
+    """
+    X_train, _, y_train, _ = train_test_split(X, y_encoded, test_size=test_size, random_state=random_state, stratify=y_encoded)
+    scaler = StandardScaler()
+    X_train_scaled = scaler.fit_transform(X_train)
+    if fit_model:
+        model.fit(X_train_scaled, y_train)
+    return {
+        'format_version': BUNDLE_FORMAT_VERSION,
+        'model': model,
+        'scaler': scaler,
+        'feature_columns': list(X.columns),
+        'label_classes': [int(label) for label in label_classes],
+    }
+
+def save_model_bundle(bundle, path):
+    joblib.dump(bundle, path)
+    print(f"Model bundle saved to {path}")
+
+def load_model_bundle(path):
+    if not os.path.exists(path):
+        # Fitting a scaler at prediction time would scale with the data being predicted, not the training data
+        raise FileNotFoundError(f"No model bundle at {path}; create it when training the model "
+                                f"(fit_model_bundle and save_model_bundle, see Pipeline_ML.ipynb)")
+    bundle = joblib.load(path)
+    if bundle.get('format_version') != BUNDLE_FORMAT_VERSION:
+        raise ValueError(f"{path} has bundle format {bundle.get('format_version')}, expected {BUNDLE_FORMAT_VERSION}")
+    return bundle
+
+def predict_in_batches(bundle, data, batch_size=10000):
+    """
+    Predicts every row of `data` with the bundle's scaler and model, `batch_size` rows at a time.
+
+    Only the bundle's feature columns are read, in the bundle's order; no labels are needed.
+
+    Returns:
+    - An array with one row per input row and one 0/1 column per class in LABEL_CLASSES.
+    """
+    feature_columns = bundle['feature_columns']
+    missing = [col for col in feature_columns if col not in data.columns]
+    if missing:
+        raise KeyError(f"Missing feature columns: {missing}")
+    # Classes the model never saw in training are never predicted
+    positions = [LABEL_CLASSES.index(label) for label in bundle['label_classes']]
+    n_outputs = model_output_count(bundle['model'])
+    if n_outputs is not None and n_outputs != len(positions):
+        raise ValueError(f"The model predicts {n_outputs} labels, but the bundle has label classes {bundle['label_classes']}")
+    predictions = np.zeros((len(data), len(LABEL_CLASSES)), dtype=np.int64)
+    for start in range(0, len(data), batch_size):
+        stop = min(start + batch_size, len(data))
+        X_scaled = bundle['scaler'].transform(data.iloc[start:stop][feature_columns])
+        predictions[start:stop, positions] = bundle['model'].predict(X_scaled)
+    return predictions
+
+def create_predicted_url_df(processed_data, predictions):
+    data = []
+    
+    for idx, (prediction, entry) in enumerate(zip(predictions, processed_data.itertuples(index=False))):
+        predicted_urls = []
+        
+        if prediction[0] == 1:
+            predicted_urls.append('No scraped URL has been found correct')
+        if prediction[1] == 1:
+            predicted_urls.append(entry.URL1)
+        if prediction[2] == 1:
+            predicted_urls.append(entry.URL2)
+        if prediction[3] == 1:
+            predicted_urls.append(entry.URL3)
+        if prediction[4] == 1:
+            predicted_urls.append(entry.URL4)
+        if prediction[5] == 1:
+            predicted_urls.append(entry.URL5)
+
+        if not predicted_urls:
+            predicted_urls.append('No valid prediction')
+
+        data.append({'Entity Number': entry.EntityNumber, 'Predicted URL': '; '.join(predicted_urls)})
+
+    results_df = pd.DataFrame(data)
+    return results_df
@@ -0,0 +1,170 @@
+import argparse
+import asyncio
+import collections
+import time
+import numpy as np
+import pandas as pd
+from aiohttp import web
+from Library.domain_parsing import DomainParser, load_tld_stripper
+from Library.prediction_model import create_predicted_url_df, load_model_bundle, predict_in_batches
+from Library.url_preprocessing_prediction_pipeline import build_url_features
+
+# Fields of an entity record; missing fields are treated like empty cells in dataset_incl_query.csv
+RECORD_COLUMNS = ['EntityNumber', 'OfficialName', 'Abbreviation', 'URL', 'URL1', 'URL2', 'URL3', 'URL4', 'URL5']
+
+class PredictionService:
+    """
+    Keeps the model bundle, domain parser and TLD table in memory and predicts entity records.
+
+    Requests are queued and a single worker merges the records of the requests that arrive within
+    `max_wait` seconds (up to `max_batch_size` records) into one batch for the feature computation
+    and the model. When a merged batch fails, its requests are predicted one at a time, so only the
+    request with the bad record gets the error. The latencies of the last `latency_window` requests are
+    kept for percentiles.
+    """
+    def __init__(self, bundle, domain_cache_path=None, max_batch_size=256, max_wait=0.005, latency_window=10000):
+        self.bundle = bundle
+        self.domain_parser = DomainParser(cache_path=domain_cache_path)
+        self.tld_stripper = load_tld_stripper()
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.latencies = collections.deque(maxlen=latency_window)
+        self.stats = {'requests': 0, 'entities': 0, 'batches': 0, 'errors': 0, 'batch_retries': 0}
+        self.queue = None
+
+    def predict_records(self, records):
+        """ Computes the features of a list of entity records and returns one prediction dict per record. """
+        # Object columns keep the string methods working when a field is missing from every record
+        frame = pd.DataFrame.from_records(records, columns=RECORD_COLUMNS).astype(object).replace('', np.nan)
+        processed = build_url_features(frame, domain_parser=self.domain_parser, tld_stripper=self.tld_stripper, verbose=False,
+                                       labels=False)
+        predictions = predict_in_batches(self.bundle, processed)
+        return create_predicted_url_df(processed, predictions).to_dict('records')
+
+    async def predict(self, records):
+        """ Queues the records for the next micro-batch and waits for their predictions. """
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((records, future))
+        return await future
+
+    async def batch_worker(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            size = len(batch[0][0])
+            deadline = loop.time() + self.max_wait
+            while size < self.max_batch_size:
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), max(deadline - loop.time(), 0))
+                except asyncio.TimeoutError:
+                    break
+                batch.append(item)
+                size += len(item[0])
+
+            records = [record for item_records, _ in batch for record in item_records]
+            try:
+                # Feature computation and prediction are CPU-bound; the event loop keeps accepting requests
+                results = await asyncio.to_thread(self.predict_records, records)
+            except Exception as e:
+                if len(batch) == 1:
+                    self.fail(batch[0][1], e)
+                else:
+                    # One bad request fails the merged batch; predicted one at a time, only that request fails
+                    self.stats['batch_retries'] += 1
+                    await self.predict_one_by_one(batch)
+                continue
+            self.stats['batches'] += 1
+            start = 0
+            for item_records, future in batch:
+                if not future.done():
+                    future.set_result(results[start:start + len(item_records)])
+                start += len(item_records)
+
+    async def predict_one_by_one(self, batch):
+        for item_records, future in batch:
+            try:
+                results = await asyncio.to_thread(self.predict_records, item_records)
+            except Exception as e:
+                self.fail(future, e)
+                continue
+            self.stats['batches'] += 1
+            if not future.done():
+                future.set_result(results)
+
+    def fail(self, future, error):
+        self.stats['errors'] += 1
+        if not future.done():
+            future.set_exception(error)
+
+    def latency_percentiles(self):
+        if not self.latencies:
+            return {}
+        values = np.percentile(np.fromiter(self.latencies, dtype=np.float64), [50, 90, 99]) * 1000
+        return {'p50_ms': round(values[0], 2), 'p90_ms': round(values[1], 2), 'p99_ms': round(values[2], 2)}
+
+    async def handle_predict(self, request):
+        start = time.perf_counter()
+        try:
+            body = await request.json()
+        except ValueError:
+            raise web.HTTPBadRequest(text='Body must be JSON')
+        # Either one entity record or {"entities": [record, ...]}
+        records = body.get('entities', [body]) if isinstance(body, dict) else None
+        if not records or not all(isinstance(record, dict) and record.get('EntityNumber') and record.get('OfficialName') for record in records):
+            raise web.HTTPBadRequest(text='Every entity needs an EntityNumber and an OfficialName')
+
+        predictions = await self.predict(records)
+        self.latencies.append(time.perf_counter() - start)
+        self.stats['requests'] += 1
+        self.stats['entities'] += len(records)
+        return web.json_response({'predictions': predictions})
+
+    async def handle_stats(self, request):
+        stats = dict(self.stats)
+        stats['mean_batch_size'] = round(stats['entities'] / stats['batches'], 2) if stats['batches'] else 0.0
+        stats['latency'] = self.latency_percentiles()
+        stats['domain_cache_hit_rate'] = round(self.domain_parser.hit_rate(), 3)
+        return web.json_response(stats)
+
+    async def handle_health(self, request):
+        return web.json_response({'status': 'ok'})
+
+    def make_app(self):
+        app = web.Application()
+        app.router.add_post('/predict', self.handle_predict)
+        app.router.add_get('/stats', self.handle_stats)
+        app.router.add_get('/health', self.handle_health)
+        app.on_startup.append(self.on_startup)
+        app.on_cleanup.append(self.on_cleanup)
+        return app
+
+    async def on_startup(self, app):
+        self.queue = asyncio.Queue()
+        self.worker = asyncio.create_task(self.batch_worker())
+
+    async def on_cleanup(self, app):
+        self.worker.cancel()
+        if self.domain_parser.cache_path:
+            self.domain_parser.save()
+
+def run_service(bundle_path='url_model_bundle.joblib', host='127.0.0.1', port=8080, unix_socket=None,
+                domain_cache_path='domain_cache.parquet', max_batch_size=256, max_wait=0.005):
+    """ Loads the model bundle once and serves POST /predict, GET /stats and GET /health on a TCP port or a Unix socket. """
+    service = PredictionService(load_model_bundle(bundle_path), domain_cache_path=domain_cache_path,
+                                max_batch_size=max_batch_size, max_wait=max_wait)
+    if unix_socket:
+        web.run_app(service.make_app(), path=unix_socket)
+    else:
+        web.run_app(service.make_app(), host=host, port=port)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local URL prediction service')
+    parser.add_argument('--bundle', default='url_model_bundle.joblib')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--unix-socket', default=None)
+    parser.add_argument('--domain-cache', default='domain_cache.parquet')
+    parser.add_argument('--max-batch-size', type=int, default=256)
+    parser.add_argument('--max-wait-ms', type=float, default=5.0)
+    args = parser.parse_args()
+    run_service(args.bundle, args.host, args.port, args.unix_socket, args.domain_cache, args.max_batch_size, args.max_wait_ms / 1000)
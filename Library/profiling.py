@@ -0,0 +1,211 @@
+import json
+import os
+import resource
+import threading
+import time
+
+# Upper bounds (seconds) of the search latency histogram buckets
+LATENCY_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0]
+
+def read_peak_rss():
+    """ Peak resident set size of this process in bytes since the last reset_peak_rss. """
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    # Without procfs only the peak of the whole run is known (ru_maxrss is in kB on Linux)
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def reset_peak_rss():
+    """ Resets the peak RSS to the current RSS (Linux); elsewhere the peak keeps covering the whole run. """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+class NullTimer:
+    """ What a disabled Profiler hands out for spans and stage clocks: every call does nothing. """
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set_rows(self, rows):
+        pass
+
+    def mark(self, name, rows=None):
+        pass
+
+NULL_TIMER = NullTimer()
+
+class Span:
+    def __init__(self, profiler, name, rows):
+        self.profiler = profiler
+        self.name = name
+        self.rows = rows
+        self.peak_rss = 0
+
+    def set_rows(self, rows):
+        self.rows = rows
+
+    def __enter__(self):
+        self.profiler.start_peak_rss()
+        self.profiler.stack().append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.start
+        self.profiler.stack().pop()
+        self.profiler.add(self.name, seconds, self.rows, self.profiler.end_peak_rss(self.peak_rss), error=exc[0] is not None)
+        return False
+
+class StageClock:
+    """ Times consecutive stages of one function: mark() closes the stage that began at the previous mark (or at creation). """
+    def __init__(self, profiler):
+        self.profiler = profiler
+        self.peak_rss = 0
+        self.profiler.start_peak_rss()
+        self.start = time.perf_counter()
+
+    def mark(self, name, rows=None):
+        now = time.perf_counter()
+        self.profiler.add(name, now - self.start, rows, self.profiler.end_peak_rss(self.peak_rss))
+        self.peak_rss = 0
+        self.profiler.start_peak_rss()
+        self.start = time.perf_counter()
+
+class Profiler:
+    """
+    Collects timings of a run: spans around stages (seconds, rows, peak RSS), durations measured by the
+    code itself (e.g. per similarity metric) and per-provider search latency histograms with error counts.
+
+    A disabled profiler (NO_PROFILER, the default of the instrumented functions) records nothing; its
+    span() returns a shared no-op object, so the instrumentation costs a method call per stage.
+
+    The peak RSS of a span is measured by resetting the kernel's high-water mark when it starts (Linux).
+    Only the main thread resets it; spans in other threads, such as the prefetched search stage of the
+    streaming run, report the peak since the last reset.
+    """
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.spans = {}
+        self.histograms = {}
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.started = time.time()
+
+    def stack(self):
+        """ The spans open in the current thread, innermost last. """
+        if not hasattr(self.local, 'stack'):
+            self.local.stack = []
+        return self.local.stack
+
+    def start_peak_rss(self):
+        if threading.current_thread() is not threading.main_thread():
+            return
+        stack = self.stack()
+        if stack:
+            # The enclosing span keeps the peak reached so far; the high-water mark is reset for the new span
+            stack[-1].peak_rss = max(stack[-1].peak_rss, read_peak_rss())
+        reset_peak_rss()
+
+    def end_peak_rss(self, peak_rss):
+        """ Returns the peak RSS of the span that ends now and passes it on to the enclosing span. """
+        peak_rss = max(peak_rss, read_peak_rss())
+        stack = self.stack()
+        if stack:
+            stack[-1].peak_rss = max(stack[-1].peak_rss, peak_rss)
+        return peak_rss
+
+    def span(self, name, rows=None):
+        """ Context manager that times a stage; rows can be given here or with set_rows() inside. """
+        return Span(self, name, rows) if self.enabled else NULL_TIMER
+
+    def stage_clock(self):
+        """ A StageClock for timing the consecutive stages of a function without nesting them in with blocks. """
+        return StageClock(self) if self.enabled else NULL_TIMER
+
+    def add(self, name, seconds, rows=None, peak_rss=None, error=False):
+        """ Adds a measured duration to the totals of `name`. """
+        if not self.enabled:
+            return
+        with self.lock:
+            entry = self.spans.setdefault(name, {'count': 0, 'seconds': 0.0, 'max_seconds': 0.0, 'rows': 0, 'errors': 0, 'peak_rss_bytes': None})
+            entry['count'] += 1
+            entry['seconds'] += seconds
+            entry['max_seconds'] = max(entry['max_seconds'], seconds)
+            entry['rows'] += rows or 0
+            entry['errors'] += int(error)
+            if peak_rss is not None:
+                entry['peak_rss_bytes'] = max(entry['peak_rss_bytes'] or 0, peak_rss)
+
+    def observe(self, provider, seconds, error=False):
+        """ Records the latency of one search call of a provider. """
+        if not self.enabled:
+            return
+        bucket = next((i for i, bound in enumerate(LATENCY_BUCKETS) if seconds <= bound), len(LATENCY_BUCKETS))
+        with self.lock:
+            histogram = self.histograms.setdefault(provider, {'buckets': [0] * (len(LATENCY_BUCKETS) + 1), 'count': 0, 'sum': 0.0, 'errors': 0})
+            histogram['buckets'][bucket] += 1
+            histogram['count'] += 1
+            histogram['sum'] += seconds
+            histogram['errors'] += int(error)
+
+    def report(self):
+        spans = {}
+        for name, entry in self.spans.items():
+            spans[name] = dict(entry, seconds=round(entry['seconds'], 6), max_seconds=round(entry['max_seconds'], 6))
+            if entry['rows'] and entry['seconds'] > 0:
+                spans[name]['rows_per_second'] = round(entry['rows'] / entry['seconds'], 1)
+        searches = {}
+        for provider, histogram in self.histograms.items():
+            searches[provider] = {
+                'count': histogram['count'], 'errors': histogram['errors'], 'seconds': round(histogram['sum'], 6),
+                'buckets': {str(bound): count for bound, count in zip(LATENCY_BUCKETS + ['+Inf'], histogram['buckets'])},
+            }
+        return {'started': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started)),
+                'seconds': round(time.time() - self.started, 3), 'spans': spans, 'searches': searches}
+
+    def write_json(self, path):
+        with open(path + '.tmp', 'w') as f:
+            json.dump(self.report(), f, indent=2)
+        os.replace(path + '.tmp', path)
+
+    def write_prometheus(self, path, prefix='urlfinder'):
+        """ Writes the report in the Prometheus text format, e.g. for the node_exporter textfile collector. """
+        # The samples of one metric have to be consecutive
+        lines = []
+        stage_metrics = [('seconds_total', 'counter', 'seconds'), ('calls_total', 'counter', 'count'), ('rows_total', 'counter', 'rows'),
+                         ('errors_total', 'counter', 'errors'), ('peak_rss_bytes', 'gauge', 'peak_rss_bytes')]
+        for metric, metric_type, field in stage_metrics:
+            lines.append(f'# TYPE {prefix}_stage_{metric} {metric_type}')
+            for name, entry in sorted(self.spans.items()):
+                if entry[field] is not None:
+                    value = f'{entry[field]:.6f}' if isinstance(entry[field], float) else entry[field]
+                    lines.append(f'{prefix}_stage_{metric}{{stage="{escape_label(name)}"}} {value}')
+        lines.append(f'# TYPE {prefix}_search_latency_seconds histogram')
+        for provider, histogram in sorted(self.histograms.items()):
+            label = escape_label(provider)
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS + ['+Inf'], histogram['buckets']):
+                cumulative += count
+                lines.append(f'{prefix}_search_latency_seconds_bucket{{provider="{label}",le="{bound}"}} {cumulative}')
+            lines.append(f'{prefix}_search_latency_seconds_sum{{provider="{label}"}} {histogram["sum"]:.6f}')
+            lines.append(f'{prefix}_search_latency_seconds_count{{provider="{label}"}} {histogram["count"]}')
+        lines.append(f'# TYPE {prefix}_search_errors_total counter')
+        for provider, histogram in sorted(self.histograms.items()):
+            lines.append(f'{prefix}_search_errors_total{{provider="{escape_label(provider)}"}} {histogram["errors"]}')
+        with open(path + '.tmp', 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.replace(path + '.tmp', path)
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+NO_PROFILER = Profiler(enabled=False)
@@ -0,0 +1,69 @@
+import os
+import sqlite3
+import pandas as pd
+
+URL_COLUMNS = ['URL1', 'URL2', 'URL3', 'URL4', 'URL5']
+
+class ScrapeJournal:
+    """
+    Append-only journal of search results, stored in SQLite in WAL mode.
+
+    Every batch of results is one transaction, so a crash loses at most the batch in flight and
+    never corrupts earlier results. The EntityNumbers already done are kept in a set, so checking
+    whether an entity still needs a search is O(1). compact() writes the final CSV/Parquet file.
+    """
+    def __init__(self, journal_path, import_csv_path=None):
+        self.journal_path = journal_path
+        self.connection = sqlite3.connect(journal_path)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=FULL')
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS results ('
+            'seq INTEGER PRIMARY KEY AUTOINCREMENT, EntityNumber TEXT UNIQUE NOT NULL, '
+            + ', '.join(f'{col} TEXT' for col in URL_COLUMNS) + ')'
+        )
+        self.connection.commit()
+        self.completed = {row[0] for row in self.connection.execute('SELECT EntityNumber FROM results')}
+        # Carry over the results of runs that still wrote the CSV file directly
+        if not self.completed and import_csv_path and os.path.exists(import_csv_path):
+            previous = pd.read_csv(import_csv_path, dtype=str, keep_default_na=False)
+            self.append(previous.to_dict('records'))
+            print(f"Imported {len(previous)} results from {import_csv_path}")
+
+    def __contains__(self, entity_number):
+        return entity_number in self.completed
+
+    def __len__(self):
+        return len(self.completed)
+
+    def append(self, records):
+        """ Adds a batch of result dicts (EntityNumber, URL1..URL5) in one transaction. """
+        rows = [
+            (str(record['EntityNumber']),) + tuple(record.get(col) or '' for col in URL_COLUMNS)
+            for record in records
+        ]
+        with self.connection:
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO results (EntityNumber, ' + ', '.join(URL_COLUMNS) + ') '
+                'VALUES (?, ?, ?, ?, ?, ?)', rows
+            )
+        self.completed.update(row[0] for row in rows)
+
+    def to_dataframe(self):
+        return pd.read_sql_query(
+            'SELECT EntityNumber, ' + ', '.join(URL_COLUMNS) + ' FROM results ORDER BY seq', self.connection
+        )
+
+    def compact(self, csv_path=None, parquet_path=None):
+        """ Writes all journaled results, in the order they were found, to CSV and/or Parquet. """
+        result_df = self.to_dataframe()
+        if csv_path:
+            result_df.to_csv(csv_path + '.tmp', index=False)
+            os.replace(csv_path + '.tmp', csv_path)
+        if parquet_path:
+            result_df.to_parquet(parquet_path + '.tmp', index=False)
+            os.replace(parquet_path + '.tmp', parquet_path)
+        return result_df
+
+    def close(self):
+        self.connection.close()
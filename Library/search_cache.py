@@ -0,0 +1,167 @@
+import asyncio
+import json
+import re
+import sqlite3
+import time
+import unicodedata
+
+def normalize_query(query):
+    """ Folds case, punctuation and whitespace, so 'Bakkerij Peeters, BV 9000  Gent' and 'bakkerij peeters bv 9000 gent' share a key. """
+    query = unicodedata.normalize('NFKC', str(query)).casefold()
+    query = re.sub(r'[^\w\s]', ' ', query)
+    return ' '.join(query.split())
+
+class SearchCache:
+    """
+    On-disk cache of search results, keyed by provider and normalized query.
+
+    Entries expire after `ttl` seconds. When more than `max_entries` are stored, the least recently
+    used ones are evicted. Hits, misses, expirations and evictions are counted in `stats`.
+    """
+    def __init__(self, path='search_cache.sqlite', ttl=90 * 24 * 3600, max_entries=5000000):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.stats = {'hits': 0, 'misses': 0, 'expired': 0, 'evicted': 0, 'coalesced': 0}
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS search_cache ('
+            'key TEXT PRIMARY KEY, results TEXT NOT NULL, max_results INTEGER NOT NULL, '
+            'created REAL NOT NULL, last_used REAL NOT NULL)'
+        )
+        self.connection.execute('CREATE INDEX IF NOT EXISTS search_cache_last_used ON search_cache (last_used)')
+        self.connection.commit()
+        self.entries = self.connection.execute('SELECT COUNT(*) FROM search_cache').fetchone()[0]
+
+    @staticmethod
+    def make_key(provider_name, query):
+        return f'{provider_name}\x00{normalize_query(query)}'
+
+    def get(self, provider_name, query, max_results):
+        """ Returns the cached result URLs, or None when there is no fresh entry with enough results. """
+        key = self.make_key(provider_name, query)
+        row = self.connection.execute(
+            'SELECT results, max_results, created FROM search_cache WHERE key = ?', (key,)
+        ).fetchone()
+        now = time.time()
+        if row is not None and now - row[2] > self.ttl:
+            self.stats['expired'] += 1
+            with self.connection:
+                self.connection.execute('DELETE FROM search_cache WHERE key = ?', (key,))
+            self.entries -= 1
+            row = None
+        # A shorter result list is only complete if the provider returned fewer results than were asked
+        if row is None or (row[1] < max_results and len(json.loads(row[0])) >= row[1]):
+            self.stats['misses'] += 1
+            return None
+        with self.connection:
+            self.connection.execute('UPDATE search_cache SET last_used = ? WHERE key = ?', (now, key))
+        self.stats['hits'] += 1
+        return json.loads(row[0])[:max_results]
+
+    def put(self, provider_name, query, max_results, results):
+        now = time.time()
+        key = self.make_key(provider_name, query)
+        with self.connection:
+            replaced = self.connection.execute('SELECT 1 FROM search_cache WHERE key = ?', (key,)).fetchone()
+            self.connection.execute(
+                'INSERT OR REPLACE INTO search_cache (key, results, max_results, created, last_used) VALUES (?, ?, ?, ?, ?)',
+                (key, json.dumps(results), max_results, now, now)
+            )
+        if not replaced:
+            self.entries += 1
+        if self.entries > self.max_entries:
+            self.evict(self.entries - self.max_entries)
+
+    def evict(self, count):
+        """ Removes the `count` least recently used entries. """
+        with self.connection:
+            self.connection.execute(
+                'DELETE FROM search_cache WHERE key IN '
+                '(SELECT key FROM search_cache ORDER BY last_used LIMIT ?)', (count,)
+            )
+        self.entries -= count
+        self.stats['evicted'] += count
+
+    def hit_rate(self):
+        lookups = self.stats['hits'] + self.stats['misses'] + self.stats['coalesced']
+        return (self.stats['hits'] + self.stats['coalesced']) / lookups if lookups else 0.0
+
+    def close(self):
+        self.connection.close()
+
+class CachedProvider:
+    """
+    Wraps a search provider (see search_providers) with a SearchCache.
+
+    Identical queries that are in flight at the same time are sent to the provider only once;
+    the other callers wait for that result. run_searches answers queries with lookup() before it
+    takes a rate-limit token, so cache hits and duplicates do not wait for the rate limit.
+    """
+    def __init__(self, provider, cache):
+        self.provider = provider
+        self.cache = cache
+        self.name = provider.name
+        self.in_flight = {}
+        # Queries that lookup() missed and registered; their caller sends them with search()
+        self.reserved = set()
+
+    async def open_client(self):
+        return await self.provider.open_client()
+
+    async def close_client(self, client):
+        await self.provider.close_client(client)
+
+    def lookup(self, query, max_results):
+        """
+        Answers a query from the cache or from an identical query in flight, without sending anything.
+
+        Returns:
+        - An awaitable with the result URLs, or None when the query has to be sent. The query is then
+          registered as in flight, so duplicates wait for it, and the caller sends it with search().
+        """
+        key = (self.cache.make_key(self.name, query), max_results)
+        if key in self.in_flight:
+            self.cache.stats['coalesced'] += 1
+            return asyncio.shield(self.in_flight[key])
+        cached = self.cache.get(self.name, query, max_results)
+        future = asyncio.get_running_loop().create_future()
+        if cached is not None:
+            future.set_result(cached)
+            return future
+        self.in_flight[key] = future
+        self.reserved.add(key)
+        return None
+
+    async def search(self, client, query, max_results):
+        key = (self.cache.make_key(self.name, query), max_results)
+        if key in self.reserved:
+            self.reserved.discard(key)
+            future = self.in_flight[key]
+        else:
+            if key in self.in_flight:
+                self.cache.stats['coalesced'] += 1
+                return await asyncio.shield(self.in_flight[key])
+            cached = self.cache.get(self.name, query, max_results)
+            if cached is not None:
+                return cached
+            future = asyncio.get_running_loop().create_future()
+            self.in_flight[key] = future
+        try:
+            results = await self.provider.search(client, query, max_results)
+        except asyncio.CancelledError:
+            # The leading request timed out; the waiting duplicates fail like a timeout as well
+            future.set_exception(asyncio.TimeoutError(f"coalesced query '{query}' was cancelled"))
+            future.exception()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Nobody else may be waiting; retrieve the exception so asyncio does not warn about it
+            future.exception()
+            raise
+        finally:
+            del self.in_flight[key]
+        self.cache.put(self.name, query, max_results, results)
+        future.set_result(results)
+        return results
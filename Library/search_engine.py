@@ -0,0 +1,305 @@
+import asyncio
+import math
+import random
+import time
+
+class TokenBucket:
+    """
+    Token-bucket rate limiter: on average `rate` acquisitions per second, with bursts of up to `capacity`.
+
+    A bucket can be used from several event loops one after another (e.g. a search_all per batch); its
+    lock is created for the loop that is running, while the tokens carry over.
+    """
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = None
+        self.lock_loop = None
+
+    def loop_lock(self):
+        loop = asyncio.get_running_loop()
+        # An asyncio.Lock belongs to the loop it was first used in
+        if self.lock_loop is not loop:
+            self.lock = asyncio.Lock()
+            self.lock_loop = loop
+        return self.lock
+
+    async def acquire(self):
+        async with self.loop_lock():
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+class QuotaExceeded(Exception):
+    """ Raised when a provider has used up the queries it may send. """
+    # Retrying does not help until the quota is renewed
+    retryable = False
+
+class ProviderQuota:
+    """
+    Limits of one provider in a MultiProvider: on average `rate` queries per second with bursts of up to
+    `burst`, and at most `max_queries` queries in total (e.g. the daily quota of an API; None is unlimited).
+    """
+    def __init__(self, rate=1.0, burst=1, max_queries=None):
+        self.bucket = TokenBucket(rate, burst)
+        self.max_queries = max_queries
+        self.used = 0
+
+    async def acquire(self):
+        if self.max_queries is not None and self.used >= self.max_queries:
+            raise QuotaExceeded(f'quota of {self.max_queries} queries used up')
+        # Reserved before waiting, so queries waiting for a token cannot overshoot max_queries together
+        self.used += 1
+        try:
+            await self.bucket.acquire()
+        except asyncio.CancelledError:
+            self.used -= 1
+            raise
+
+def url_identity(url):
+    """ Key under which result URLs count as the same candidate: scheme, case of the host, 'www.' and a trailing slash are ignored. """
+    url = url.strip()
+    for prefix in ('https://', 'http://'):
+        if url.lower().startswith(prefix):
+            url = url[len(prefix):]
+            break
+    host, _, path = url.partition('/')
+    host = host.lower()
+    if host.startswith('www.'):
+        host = host[len('www.'):]
+    return host, path.rstrip('/')
+
+def merge_ranked_results(result_lists, max_results):
+    """
+    Merges the result lists of several providers into one ranking, like calculate_combined_rank_score in
+    Web_Scraper.ipynb: a URL scores the product of its ranks, and a list that does not have it counts as
+    one rank past the longest list. Duplicates (see url_identity) are merged and kept in the form of their
+    best rank; ties keep the order in which the URLs were first seen.
+    """
+    result_lists = [results for results in result_lists if results]
+    if not result_lists:
+        return []
+    missing_rank = max(len(results) for results in result_lists) + 1
+    ranks = {}
+    best = {}
+    for list_index, results in enumerate(result_lists):
+        for rank, url in enumerate(results, 1):
+            key = url_identity(url)
+            if key not in ranks:
+                ranks[key] = [missing_rank] * len(result_lists)
+                best[key] = (rank, url)
+            ranks[key][list_index] = min(ranks[key][list_index], rank)
+            if rank < best[key][0]:
+                best[key] = (rank, url)
+    ranking = sorted(ranks, key=lambda key: math.prod(ranks[key]))
+    return [best[key][1] for key in ranking[:max_results]]
+
+class MultiProvider:
+    """
+    Search provider that sends every query to several providers and merges their results (merge_ranked_results).
+
+    Without `hedge_delay` all providers are queried at the same time. With a hedge delay they are tried in
+    order: the next provider only gets the query when the earlier ones have not answered within
+    `hedge_delay` seconds, or have failed, and the first answer is used.
+
+    `quotas` maps provider names to a ProviderQuota. A provider that fails or is out of quota is left out of
+    the merge; the query only fails when no provider answers. `stats` counts per provider the queries,
+    errors, quota refusals, hedged requests and requests cancelled because another provider answered first.
+    """
+    def __init__(self, providers, quotas=None, hedge_delay=None, profiler=None):
+        self.providers = list(providers)
+        self.quotas = quotas or {}
+        self.hedge_delay = hedge_delay
+        self.profiler = profiler
+        names = ','.join(provider.name for provider in self.providers)
+        # Hedged results depend on which provider answers first, so they are cached apart from merged ones
+        self.name = f'Hedged({names})' if hedge_delay is not None else f'Multi({names})'
+        self.stats = {provider.name: {'queries': 0, 'errors': 0, 'quota_exceeded': 0, 'hedged': 0, 'cancelled': 0}
+                      for provider in self.providers}
+
+    async def open_client(self):
+        return {provider.name: await provider.open_client() for provider in self.providers}
+
+    async def close_client(self, client):
+        for provider in self.providers:
+            await provider.close_client(client[provider.name])
+
+    async def search_provider(self, provider, client, query, max_results):
+        stats = self.stats[provider.name]
+        quota = self.quotas.get(provider.name)
+        if quota is not None:
+            try:
+                await quota.acquire()
+            except QuotaExceeded:
+                stats['quota_exceeded'] += 1
+                raise
+        stats['queries'] += 1
+        start = time.perf_counter()
+        try:
+            results = await provider.search(client, query, max_results)
+        except asyncio.CancelledError:
+            stats['cancelled'] += 1
+            raise
+        except QuotaExceeded:
+            # The provider itself reported its quota as used up
+            stats['quota_exceeded'] += 1
+            raise
+        except Exception:
+            stats['errors'] += 1
+            if self.profiler is not None:
+                self.profiler.observe(provider.name, time.perf_counter() - start, error=True)
+            raise
+        if self.profiler is not None:
+            self.profiler.observe(provider.name, time.perf_counter() - start)
+        return results
+
+    async def search(self, client, query, max_results):
+        if self.hedge_delay is not None:
+            return await self.hedged_search(client, query, max_results)
+        outcomes = await asyncio.gather(
+            *(self.search_provider(provider, client[provider.name], query, max_results) for provider in self.providers),
+            return_exceptions=True
+        )
+        result_lists = [outcome for outcome in outcomes if not isinstance(outcome, BaseException)]
+        if not result_lists:
+            raise outcomes[0]
+        return merge_ranked_results(result_lists, max_results)
+
+    async def hedged_search(self, client, query, max_results):
+        remaining = list(self.providers)
+        pending = set()
+        errors = []
+        try:
+            while remaining or pending:
+                if remaining:
+                    provider = remaining.pop(0)
+                    if pending:
+                        self.stats[provider.name]['hedged'] += 1
+                    pending.add(asyncio.create_task(self.search_provider(provider, client[provider.name], query, max_results)))
+                done, pending = await asyncio.wait(pending, timeout=self.hedge_delay if remaining else None,
+                                                   return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return merge_ranked_results([task.result()], max_results)
+                    errors.append(task.exception())
+        finally:
+            for task in pending:
+                task.cancel()
+        raise errors[0]
+
+def retry_delay_for(error, retry_delay, attempt):
+    """
+    Seconds before a failed query goes back into the queue: an exponential backoff, or longer if the
+    error asks for it (the Retry-After of the provider, the cooldown of an open circuit breaker).
+    """
+    delay = retry_delay * 2 ** attempt
+    for requested in (getattr(error, 'retry_in', None), getattr(error, 'retry_after', None)):
+        if requested is not None:
+            delay = max(delay, requested)
+    return delay * random.uniform(1.0, 1.25)
+
+async def run_searches(queries, provider, max_results=5, concurrency=8, rate=1.0, burst=1, timeout=30.0, retries=0,
+                       retry_delay=5.0, profiler=None):
+    """
+    Runs search queries against one provider with `concurrency` requests in flight.
+
+    Parameters:
+    - queries: List of query strings.
+    - provider: Search provider (see search_providers) with open_client, search and close_client.
+    - max_results: Number of results requested per query.
+    - concurrency: Number of workers, each with its own reusable client.
+    - rate, burst: Token-bucket limit in queries per second, shared by all workers. With a CachedProvider only
+      the queries that are sent take a token; cache hits and duplicates of queries in flight do not.
+    - timeout: Seconds before a single query is abandoned.
+    - retries: How often a failed query goes back into the queue. It is retried after `retry_delay` seconds
+      (doubling per retry), or later if the Retry-After of the provider or an open circuit breaker asks for it;
+      meanwhile the other queries go on. Errors marked as not retryable (a used-up quota, a refused request) are not retried.
+    - profiler: Optional profiling.Profiler that records the latency and outcome of every search call.
+
+    Returns:
+    - A list with, per query and in input order, the list of result URLs or None when the query failed.
+    - A dict with the number of queries, errors, retries, elapsed seconds and achieved queries per second.
+    """
+    results = [None] * len(queries)
+    errors = []
+    retried = [0]
+    bucket = TokenBucket(rate, burst)
+    pending = asyncio.Queue()
+    for index, query in enumerate(queries):
+        pending.put_nowait((index, query, 0))
+    # Queries that are neither answered nor given up yet; when none are left, the workers are told to stop
+    outstanding = [len(queries)]
+    n_workers = min(concurrency, len(queries)) or 1
+    loop = asyncio.get_running_loop()
+    retry_handles = []
+
+    def finish_query():
+        outstanding[0] -= 1
+        if outstanding[0] == 0:
+            for _ in range(n_workers):
+                pending.put_nowait(None)
+
+    async def worker():
+        client = await provider.open_client()
+        try:
+            while True:
+                item = await pending.get()
+                if item is None:
+                    return
+                index, query, attempt = item
+                # A cached provider answers hits and duplicates of queries in flight without a token
+                answer = provider.lookup(query, max_results) if hasattr(provider, 'lookup') else None
+                if answer is None:
+                    await bucket.acquire()
+                    answer = provider.search(client, query, max_results)
+                call_start = time.perf_counter()
+                try:
+                    results[index] = await asyncio.wait_for(answer, timeout)
+                except Exception as e:
+                    if profiler is not None:
+                        profiler.observe(provider.name, time.perf_counter() - call_start, error=True)
+                    if attempt < retries and getattr(e, 'retryable', True):
+                        retried[0] += 1
+                        delay = retry_delay_for(e, retry_delay, attempt)
+                        retry_handles.append(loop.call_later(delay, pending.put_nowait, (index, query, attempt + 1)))
+                        continue
+                    errors.append((index, repr(e)))
+                    print(f"{provider.name} search failed for '{query}': {e!r}")
+                    finish_query()
+                else:
+                    if profiler is not None:
+                        profiler.observe(provider.name, time.perf_counter() - call_start)
+                    finish_query()
+        finally:
+            await provider.close_client(client)
+
+    if not queries:
+        pending.put_nowait(None)
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*(worker() for _ in range(n_workers)))
+    finally:
+        for handle in retry_handles:
+            handle.cancel()
+    elapsed = time.perf_counter() - start
+
+    stats = {
+        'provider': provider.name,
+        'queries': len(queries),
+        'errors': len(errors),
+        'retries': retried[0],
+        'seconds': round(elapsed, 3),
+        'queries_per_second': round(len(queries) / elapsed, 2) if elapsed > 0 else 0.0,
+    }
+    return results, stats
+
+def search_all(queries, provider, **kwargs):
+    """ Synchronous wrapper around run_searches for scripts and notebooks. """
+    return asyncio.run(run_searches(queries, provider, **kwargs))
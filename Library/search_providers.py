@@ -0,0 +1,170 @@
+import asyncio
+import json
+from duckduckgo_search import DDGS
+from duckduckgo_search.exceptions import DuckDuckGoSearchException
+from Library.http_transport import HttpError, HttpTransport
+from Library.search_engine import QuotaExceeded
+
+# A search provider has a `name` and three coroutines: open_client() returns a client for one worker,
+# search(client, query, max_results) returns a list of result URLs, close_client(client) releases it.
+# Providers send their requests through an HttpTransport (retries, backoff, circuit breaker per host),
+# which several providers and the crawler can share.
+
+class DDGProvider:
+    """
+    DuckDuckGo text search. DDGS is synchronous, so every worker keeps its own client
+    (and with it its HTTP connection) and runs the call in a thread. DDGS does its own HTTP;
+    the transport only adds its retries and circuit breaker, with rate limits retried like HTTP 429.
+    A thread cannot be stopped: after a timeout or cancellation the call keeps running with its client,
+    so the worker gets a new client for its next query.
+    """
+    name = 'DDG'
+    host = 'duckduckgo.com'
+
+    def __init__(self, timeout=10, transport=None):
+        self.timeout = timeout
+        self.transport = transport or HttpTransport(timeout=timeout)
+
+    async def open_client(self):
+        # A slot rather than the DDGS itself, so search() can replace it
+        return {'ddgs': DDGS(timeout=self.timeout)}
+
+    async def close_client(self, client):
+        pass
+
+    async def search(self, client, query, max_results):
+        ddgs = client['ddgs']
+        try:
+            results = await self.transport.call(
+                self.host, lambda: asyncio.to_thread(ddgs.text, keywords=query, max_results=max_results),
+                retry_on=(DuckDuckGoSearchException,)
+            )
+        except asyncio.CancelledError:
+            # The abandoned thread still uses `ddgs`; DDGS is not thread-safe
+            client['ddgs'] = DDGS(timeout=self.timeout)
+            raise
+        return [result.get('href') for result in results or [] if result.get('href')]
+
+class StubProvider:
+    """
+    Client for the local stub search server (benchmarks/stub_search_server.py), which answers
+    GET /search?q=...&n=... with {"results": [{"href": ...}, ...]}.
+    All workers share the session of the transport, so connections are pooled and kept alive.
+    """
+    name = 'Stub'
+
+    def __init__(self, base_url='http://127.0.0.1:8765', timeout=10, name=None, transport=None):
+        self.base_url = base_url.rstrip('/')
+        self.transport = transport or HttpTransport(timeout=timeout)
+        # Several stub servers can stand in for different providers
+        self.name = name or self.name
+
+    async def open_client(self):
+        return await self.transport.open()
+
+    async def close_client(self, client):
+        await self.transport.close()
+
+    async def search(self, client, query, max_results):
+        response = await self.transport.get(f'{self.base_url}/search', params={'q': query, 'n': max_results})
+        data = response.json()
+        return [result['href'] for result in data.get('results', []) if result.get('href')]
+
+class GoogleCSEProvider:
+    """
+    Google Programmable Search (Custom Search JSON API), as used in Web_Scraper.ipynb.
+    The API returns at most 10 results per request, so larger result lists are fetched page by page,
+    up to `max_pages` requests per query. With a `keep` predicate (e.g. not on the blocklist) paging
+    stops as soon as `wanted` results pass it, as every page is a paid API request.
+    `quota` (a ProviderQuota) is acquired for every API request, so it limits requests rather than queries.
+    All workers share the session of the transport. Rate-limit answers (429, or a 403 for the per-user
+    rate limit) are retried by the transport; a used-up daily quota (403) raises QuotaExceeded instead.
+    """
+    name = 'Google'
+    url = 'https://www.googleapis.com/customsearch/v1'
+    quota_reasons = {'dailyLimitExceeded', 'quotaExceeded'}
+    rate_limit_reasons = {'userRateLimitExceeded', 'rateLimitExceeded'}
+
+    def __init__(self, api_key, cse_id, country='countryBE', language='lang_nl', timeout=10, transport=None,
+                 keep=None, wanted=5, max_pages=3, quota=None):
+        self.api_key = api_key
+        self.cse_id = cse_id
+        self.country = country
+        self.language = language
+        self.transport = transport or HttpTransport(timeout=timeout)
+        self.keep = keep
+        self.wanted = wanted
+        self.max_pages = max_pages
+        self.quota = quota
+        self.stats = {'queries': 0, 'requests': 0}
+
+    @classmethod
+    def from_config(cls, config_path='config_search.json', **kwargs):
+        """ Reads GOOGLE_API_KEY and GOOGLE_CSE_ID from the config file of the web scraper notebook. """
+        with open(config_path) as config_file:
+            config = json.load(config_file)
+        return cls(config['GOOGLE_API_KEY'], config['GOOGLE_CSE_ID'], **kwargs)
+
+    async def open_client(self):
+        return await self.transport.open()
+
+    async def close_client(self, client):
+        await self.transport.close()
+
+    @staticmethod
+    def error_reasons(error):
+        """ The reasons in the JSON body of an API error, or None when the body cannot be read. """
+        try:
+            return {e.get('reason') for e in json.loads(error.body)['error'].get('errors', [])}
+        except (ValueError, KeyError, TypeError, AttributeError):
+            return None
+
+    def is_quota_error(self, error):
+        if error.status != 403:
+            return False
+        reasons = self.error_reasons(error)
+        # Without a readable error body a 403 of this API is taken to be the quota
+        return reasons is None or bool(reasons & self.quota_reasons)
+
+    def is_rate_limit_error(self, error):
+        if error.status != 403:
+            return False
+        reasons = self.error_reasons(error)
+        return reasons is not None and bool(reasons & self.rate_limit_reasons)
+
+    async def search(self, client, query, max_results):
+        urls = []
+        kept = 0
+        start = 1
+        self.stats['queries'] += 1
+        # The API serves the first 100 results
+        for page in range(self.max_pages):
+            if len(urls) >= max_results or start > 91 or (self.keep is not None and kept >= self.wanted):
+                break
+            if self.quota is not None:
+                try:
+                    await self.quota.acquire()
+                except QuotaExceeded:
+                    # The pages fetched so far are still an answer
+                    if urls:
+                        break
+                    raise
+            params = {'q': query, 'key': self.api_key, 'cx': self.cse_id, 'start': start,
+                      'num': min(10, max_results - len(urls)), 'cr': self.country, 'lr': self.language}
+            self.stats['requests'] += 1
+            try:
+                response = await self.transport.get(self.url, params=params, retry_if=self.is_rate_limit_error)
+            except HttpError as e:
+                if self.is_quota_error(e):
+                    raise QuotaExceeded(f'Google CSE quota used up: {e}') from e
+                raise
+            data = response.json()
+            items = data.get('items', [])
+            links = [item['link'] for item in items if item.get('link')]
+            urls += links
+            if self.keep is not None:
+                kept += sum(1 for url in links if self.keep(url))
+            if len(items) < params['num']:
+                break
+            start += len(items)
+        return urls[:max_results]
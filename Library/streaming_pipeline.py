@@ -0,0 +1,114 @@
+import json
+import os
+import queue
+import shutil
+import threading
+import pyarrow.parquet as pq
+
+def iter_parquet_chunks(path, chunk_size, columns=None):
+    """ Yields (chunk number, DataFrame) for consecutive chunks of `chunk_size` rows of a Parquet file. """
+    parquet_file = pq.ParquetFile(path)
+    for chunk_number, batch in enumerate(parquet_file.iter_batches(batch_size=chunk_size, columns=columns)):
+        yield chunk_number, batch.to_pandas()
+
+def prefetch(iterable, max_pending=1):
+    """
+    Runs `iterable` in a background thread and yields its items, at most `max_pending` items ahead
+    of the consumer. The producer blocks while the queue is full, so a slow consumer holds back the
+    stages upstream instead of letting finished items pile up in memory.
+
+    The iterable is consumed and closed in the background thread, so it may hold thread-bound
+    resources such as SQLite connections. Exceptions are raised in the consumer.
+    """
+    items = queue.Queue(maxsize=max_pending)
+    stop = threading.Event()
+
+    def put(kind, value):
+        while not stop.is_set():
+            try:
+                items.put((kind, value), timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        iterator = iter(iterable)
+        try:
+            for item in iterator:
+                if not put('item', item):
+                    return
+        except BaseException as e:
+            put('error', e)
+            return
+        finally:
+            if hasattr(iterator, 'close'):
+                iterator.close()
+        put('done', None)
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            kind, value = items.get()
+            if kind == 'done':
+                return
+            if kind == 'error':
+                raise value
+            yield value
+    finally:
+        stop.set()
+        thread.join()
+
+class ChunkedParquetOutput:
+    """
+    Output of a chunked run: every finished chunk is written to its own Parquet file in
+    `{output_path}.parts`, so an interrupted run resumes at the first chunk that was not written.
+
+    A manifest records what the chunks were made from (`run_key`, e.g. the input file and chunk
+    size); parts of a run with a different key are discarded. finish() concatenates the parts into
+    `output_path` one at a time and removes them.
+    """
+    def __init__(self, output_path, run_key):
+        self.output_path = output_path
+        self.parts_directory = output_path + '.parts'
+        self.run_key = run_key
+        manifest_path = os.path.join(self.parts_directory, '_manifest.json')
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as f:
+                if json.load(f) != run_key:
+                    print(f"Discarding chunks in {self.parts_directory}: they belong to another run")
+                    shutil.rmtree(self.parts_directory)
+        os.makedirs(self.parts_directory, exist_ok=True)
+        with open(manifest_path, 'w') as f:
+            json.dump(run_key, f)
+        self.completed = {
+            int(name[len('part-'):-len('.parquet')]) for name in os.listdir(self.parts_directory)
+            if name.startswith('part-') and name.endswith('.parquet')
+        }
+
+    def part_path(self, chunk_number):
+        return os.path.join(self.parts_directory, f'part-{chunk_number:06d}.parquet')
+
+    def write(self, chunk_number, df):
+        path = self.part_path(chunk_number)
+        df.to_parquet(path + '.tmp', index=False)
+        os.replace(path + '.tmp', path)
+        self.completed.add(chunk_number)
+
+    def finish(self):
+        """ Writes all parts, in chunk order, to output_path and removes the parts directory. """
+        writer = None
+        try:
+            for chunk_number in sorted(self.completed):
+                table = pq.read_table(self.part_path(chunk_number))
+                if writer is None:
+                    writer = pq.ParquetWriter(self.output_path + '.tmp', table.schema, compression='snappy')
+                writer.write_table(table.cast(writer.schema))
+        finally:
+            if writer is not None:
+                writer.close()
+        if writer is None:
+            return
+        os.replace(self.output_path + '.tmp', self.output_path)
+        shutil.rmtree(self.parts_directory)
@@ -0,0 +1,109 @@
+import json
+import os
+import numpy as np
+from urllib.parse import urlsplit
+import pandas as pd
+
+DEFAULT_BLOCKLIST_PATH = os.path.join(os.path.dirname(__file__), 'skip_domains.json')
+
+def normalize_host(host):
+    host = host.lower().strip().rstrip('.')
+    return host[4:] if host.startswith('www.') else host
+
+def split_url(url):
+    """ Returns the normalized host and the path of a URL, which may lack a scheme. """
+    if '//' not in url:
+        url = '//' + url
+    try:
+        parts = urlsplit(url.strip())
+        return normalize_host(parts.hostname or ''), parts.path or '/'
+    except ValueError:
+        return '', '/'
+
+class DomainBlocklist:
+    """
+    Matches URLs against a blocklist of hosts and host/path prefixes.
+
+    The host of a URL is parsed once and its labels are looked up from right to left in a
+    trie of the blocked hosts, so 'nl.linkedin.com' matches the entry 'linkedin.com' but
+    'bigdata.be' does not match 'data.be'. Entries with a path, like
+    'vlaanderen.be/organisaties', only block URLs on that host whose path starts with it.
+    """
+    BLOCKED = '$'
+
+    def __init__(self, entries, version=None):
+        self.entries = list(entries)
+        self.version = version
+        self.trie = {}
+        self.path_prefixes = {}
+        for entry in self.entries:
+            host, _, path = entry.partition('/')
+            host = normalize_host(host)
+            if path:
+                self.path_prefixes.setdefault(host, []).append('/' + path.rstrip('/'))
+            else:
+                node = self.trie
+                for label in reversed(host.split('.')):
+                    node = node.setdefault(label, {})
+                node[self.BLOCKED] = True
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __len__(self):
+        return len(self.entries)
+
+    def is_blocked_host(self, host):
+        node = self.trie
+        for label in reversed(host.split('.')):
+            node = node.get(label)
+            if node is None:
+                return False
+            if self.BLOCKED in node:
+                return True
+        return False
+
+    def is_blocked(self, url):
+        """ True when the URL is on a blocked host (or one of its subdomains) or under a blocked path. """
+        if not url or pd.isna(url):
+            return False
+        host, path = split_url(url)
+        if self.is_blocked_host(host):
+            return True
+        if self.path_prefixes:
+            for prefix in self.path_prefixes.get(host, ()):
+                if path == prefix or path.startswith(prefix + '/'):
+                    return True
+        return False
+
+    def filter_urls(self, urls, max_results=None):
+        """ Keeps the URLs that are not blocked, in order, up to `max_results`. """
+        kept = [url for url in urls if url and not self.is_blocked(url)]
+        return kept[:max_results] if max_results is not None else kept
+
+    def blocked_mask(self, urls):
+        """ Vectorized is_blocked for a Series of URLs; every distinct URL is parsed once. """
+        codes, uniques = pd.factorize(urls)
+        # Missing values get code -1, which picks the trailing False
+        blocked = np.array([self.is_blocked(url) for url in uniques] + [False], dtype=bool)
+        return pd.Series(blocked[codes], index=urls.index)
+
+    def filter_results_table(self, df, url_columns=('URL1', 'URL2', 'URL3', 'URL4', 'URL5')):
+        """
+        Removes blocked URLs from a search results table (e.g. search_results_DDG.csv) and shifts
+        the remaining URLs of every row to the left, so URL1 stays the best remaining result.
+        """
+        url_columns = list(url_columns)
+        values = df[url_columns].astype(object).where(df[url_columns].notna(), '').to_numpy()
+        blocked = self.blocked_mask(pd.Series(values.ravel())).to_numpy().reshape(values.shape)
+        kept = [[url for url, is_blocked in zip(row, row_blocked) if url and not is_blocked]
+                for row, row_blocked in zip(values, blocked)]
+        result = df.copy()
+        result[url_columns] = [row + [''] * (len(url_columns) - len(row)) for row in kept]
+        return result
+
+def load_blocklist(path=DEFAULT_BLOCKLIST_PATH):
+    """ Loads a DomainBlocklist from a versioned JSON file with an 'entries' list. """
+    with open(path, encoding='utf-8') as f:
+        config = json.load(f)
+    return DomainBlocklist(config['entries'], version=config.get('version'))
@@ -0,0 +1,119 @@
+import hashlib
+import os
+import numpy as np
+import pandas as pd
+import torch
+from transformers import AutoConfig, AutoModelForMaskedLM, BertTokenizer
+
+# URLBERT: https://github.com/Davidup1/URLBERT, files as in URLBERT-master/bert_model/README.md
+URLBERT_PATH = 'URLBERT-master'
+URLBERT_CONFIG_KWARGS = {'hidden_dropout_prob': 0.2, 'vocab_size': 5000}
+
+def load_urlbert(urlbert_path=URLBERT_PATH, threads=None, quantize=False):
+    """
+    Loads the URLBERT tokenizer and encoder for CPU inference.
+
+    Parameters:
+    - urlbert_path: Folder with bert_tokenizer/vocab.txt, bert_config/ and bert_model/urlBERT.pt.
+    - threads: Number of intra-op threads torch uses; None keeps the torch default (one per core).
+    - quantize: Whether to replace the Linear layers by int8 dynamically quantized ones.
+
+    Returns:
+    - The tokenizer and the BERT encoder without the masked language model head, in eval mode.
+    """
+    if threads:
+        torch.set_num_threads(threads)
+    tokenizer = BertTokenizer(vocab_file=os.path.join(urlbert_path, 'bert_tokenizer', 'vocab.txt'))
+    config = AutoConfig.from_pretrained(os.path.join(urlbert_path, 'bert_config'), **URLBERT_CONFIG_KWARGS)
+    bert_model = AutoModelForMaskedLM.from_config(config=config)
+    bert_model.resize_token_embeddings(URLBERT_CONFIG_KWARGS['vocab_size'])
+    bert_model.load_state_dict(torch.load(os.path.join(urlbert_path, 'bert_model', 'urlBERT.pt'), map_location='cpu'))
+    # The CLS vector is the encoder's last hidden state; the MLM head is never needed for it
+    encoder = bert_model.bert
+    encoder.eval()
+    if quantize:
+        encoder = torch.ao.quantization.quantize_dynamic(encoder, {torch.nn.Linear}, dtype=torch.qint8)
+    return tokenizer, encoder
+
+def urlbert_version(urlbert_path=URLBERT_PATH, quantize=False):
+    """ Identifies the embeddings load_urlbert produces: a hash of the weights file, and whether they are quantized. """
+    digest = hashlib.sha256()
+    with open(os.path.join(urlbert_path, 'bert_model', 'urlBERT.pt'), 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return f"urlbert-{digest.hexdigest()[:16]}" + ('-int8' if quantize else '')
+
+def length_buckets(lengths, max_batch_size, max_tokens):
+    """
+    Groups positions into batches of similar token length: positions are sorted by length and a batch
+    is closed when it has `max_batch_size` items or padding to its longest item would exceed `max_tokens`.
+    """
+    batches, batch = [], []
+    for position in np.argsort(lengths, kind='stable'):
+        if batch and (len(batch) == max_batch_size or (len(batch) + 1) * lengths[position] > max_tokens):
+            batches.append(batch)
+            batch = []
+        batch.append(position)
+    if batch:
+        batches.append(batch)
+    return batches
+
+class UrlEmbedder:
+    """
+    Computes URLBERT CLS embeddings of URLs on the CPU.
+
+    Every distinct URL is tokenized and encoded once. The URLs are sorted by token length and batched,
+    so a batch is padded to about the length of its own URLs instead of the longest URL overall.
+    `stats` counts the URLs asked for, the distinct URLs encoded and the padding share of the batches.
+    """
+    def __init__(self, tokenizer, encoder, max_batch_size=64, max_tokens=8192, max_length=512):
+        self.tokenizer = tokenizer
+        self.encoder = encoder
+        self.max_batch_size = max_batch_size
+        self.max_tokens = max_tokens
+        self.max_length = max_length
+        self.embedding_dim = encoder.config.hidden_size
+        self.stats = {'urls': 0, 'encoded': 0, 'tokens': 0, 'padded_tokens': 0}
+
+    def encode(self, texts):
+        """ Returns the CLS embeddings of a list of distinct strings, as a float32 array in the same order. """
+        input_ids = self.tokenizer(texts, truncation=True, max_length=self.max_length)['input_ids']
+        lengths = np.array([len(ids) for ids in input_ids])
+        embeddings = np.empty((len(texts), self.embedding_dim), dtype=np.float32)
+        with torch.inference_mode():
+            for batch in length_buckets(lengths, self.max_batch_size, self.max_tokens):
+                inputs = self.tokenizer.pad({'input_ids': [input_ids[i] for i in batch]}, return_tensors='pt')
+                outputs = self.encoder(input_ids=inputs['input_ids'], attention_mask=inputs['attention_mask'])
+                embeddings[batch] = outputs.last_hidden_state[:, 0, :].float().numpy()
+                self.stats['tokens'] += int(lengths[batch].sum())
+                self.stats['padded_tokens'] += int(inputs['input_ids'].numel())
+        self.stats['encoded'] += len(texts)
+        return embeddings
+
+    def embed(self, urls):
+        """
+        Returns one embedding per URL, in input order. Missing URLs are embedded as the string 'NaN',
+        the value they have in the processed dataset.
+        """
+        codes, uniques = pd.factorize(pd.Series(urls, dtype=object).fillna('NaN'))
+        self.stats['urls'] += len(codes)
+        return self.encode(list(uniques))[codes]
+
+    def padding_share(self):
+        return 1 - self.stats['tokens'] / self.stats['padded_tokens'] if self.stats['padded_tokens'] else 0.0
+
+def embed_url_columns(merged_dataset, embedder, url_columns=None, store=None):
+    """
+    Embeds the search result URLs of every entity. With a `store` (an EmbeddingStore) only the URLs
+    it does not hold yet are encoded and the rows are read from its memory map.
+
+    Returns:
+    - An array of shape (entities, len(url_columns) * embedding_dim); row i holds the embeddings of
+      URL1..URL5 of entity i, side by side.
+    """
+    url_columns = url_columns or [f'URL{i}' for i in range(1, 6)]
+    # All columns in one call, so a URL that shows up in several columns is encoded once
+    urls = np.concatenate([merged_dataset[col].to_numpy(dtype=object) for col in url_columns])
+    embeddings = store.embed(urls, embedder) if store is not None else embedder.embed(urls)
+    embeddings = embeddings.reshape(len(url_columns), len(merged_dataset), -1)
+    return embeddings.transpose(1, 0, 2).reshape(len(merged_dataset), -1)
@@ -1,15 +1,20 @@
-import re
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import time
+import numpy as np
 import pandas as pd
-from data_preprocessing_ML import (
-    clean_extract_domain, load_data, 
-    preprocess_domains, compare_domains, create_abbreviation, get_domain_without_tld, 
-    check_words_in_url, check_abbreviation_in_url, extract_tlds
+import pyarrow as pa
+from Library.data_preprocessing_ML import (
+    load_data, compare_domains, create_abbreviation,
+    check_words_in_url, check_abbreviation_in_url
 )
+from Library.domain_parsing import DomainParser, load_tld_stripper
+from Library.profiling import NO_PROFILER
 from difflib import SequenceMatcher
 import Levenshtein
 from sklearn.feature_extraction.text import CountVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
-from sklearn.preprocessing import MultiLabelBinarizer
+from sklearn.preprocessing import MultiLabelBinarizer, normalize
 
 # Extract top-level domain (TLD) for each URL
 def extract_tld(url):
@@ -64,6 +69,33 @@ def cosine_similarity_score(a, b):
     similarity = cosine_similarity(vectors)
     return similarity[0, 1]
 
+def batch_cosine_similarity(left, right):
+    """
+    Cosine similarity of character 2-3-gram counts for aligned arrays of strings; the batched
+    equivalent of calling cosine_similarity_score on every (left[i], right[i]) pair.
+
+    One CountVectorizer is fitted on the distinct strings of the batch, so every pair is scored
+    with a row-wise sparse dot product of L2-normalized count vectors instead of a vectorizer fit.
+    Pairs with an empty string or a string shorter than 3 characters score 0.0, as before.
+    """
+    left = np.asarray(left, dtype=object)
+    right = np.asarray(right, dtype=object)
+    scores = np.zeros(len(left), dtype=np.float64)
+    valid = np.array([
+        isinstance(a, str) and isinstance(b, str) and len(a) >= 3 and len(b) >= 3
+        for a, b in zip(left, right)
+    ], dtype=bool)
+    if not valid.any():
+        return scores
+
+    strings = pd.Index(pd.unique(np.concatenate([left[valid], right[valid]])))
+    # The vocabulary is sorted like the per-pair vectorizer's, so sums are taken in the same order
+    vectors = normalize(CountVectorizer(analyzer='char', ngram_range=(2, 3)).fit_transform(strings).astype(np.float64))
+    left_vectors = vectors[strings.get_indexer(left[valid])]
+    right_vectors = vectors[strings.get_indexer(right[valid])]
+    # A product with a ones vector adds the terms of every row in column order, like the per-pair dot product
+    scores[valid] = left_vectors.multiply(right_vectors) @ np.ones(vectors.shape[1])
+    return scores
 
 def hamming_distance_score(a, b):
     """ Calculate the Hamming distance between two strings. """
@@ -82,12 +114,313 @@ def ngram_overlap_score(a, b):
     overlap = len(a_ngrams.intersection(b_ngrams))
     return overlap / min(len(a_ngrams), len(b_ngrams))
     
-def process_url_data(dataset_query_path, search_results_paths):
+SIMILARITY_METRICS = [
+    'official_jaccard', 'abbrev_jaccard',
+    'official_is_subsequence', 'abbrev_is_subsequence',
+    'official_seq_match', 'abbrev_seq_match',
+    'official_levenshtein', 'abbrev_levenshtein',
+    'official_cosine_similarity', 'abbrev_cosine_similarity',
+    'hamming_distance', 'ngram_overlap'
+]
+INTEGER_METRICS = {'official_is_subsequence', 'abbrev_is_subsequence', 'official_levenshtein', 'abbrev_levenshtein', 'hamming_distance'}
+
+def trigram_set(text):
+    return set([text[i:i+3] for i in range(len(text)-3+1)])
+
+# Metrics of the (OfficialName, candidate) and (Abbreviation, candidate) pairs; cosine is scored in a batch
+OFFICIAL_PAIR_METRICS = ['official_jaccard', 'official_is_subsequence', 'official_seq_match', 'official_levenshtein',
+                         'hamming_distance', 'ngram_overlap']
+ABBREV_PAIR_METRICS = ['abbrev_jaccard', 'abbrev_is_subsequence', 'abbrev_seq_match', 'abbrev_levenshtein']
+
+def factorize_pairs(left, right):
+    """
+    Finds the distinct (left[i], right[i]) pairs of two aligned arrays of strings.
+
+    Returns:
+    - codes: for every pair the position of its distinct pair.
+    - The left and right strings of the distinct pairs, ordered by the right string so pairs with the
+      same candidate are scored one after another.
+    """
+    left_codes, left_uniques = pd.factorize(left, use_na_sentinel=False)
+    right_codes, right_uniques = pd.factorize(right, use_na_sentinel=False)
+    keys = right_codes.astype(np.int64) * len(left_uniques) + left_codes
+    distinct, codes = np.unique(keys, return_inverse=True)
+    left_uniques = np.asarray(left_uniques, dtype=object)
+    right_uniques = np.asarray(right_uniques, dtype=object)
+    return codes.ravel(), left_uniques[distinct % len(left_uniques)], right_uniques[distinct // len(left_uniques)]
+
+def score_pairs(names, candidates, official=True, metric_seconds=None):
+    """
+    Scores (name, candidate) pairs for OFFICIAL_PAIR_METRICS (official=True) or ABBREV_PAIR_METRICS.
+    With a `metric_seconds` dict the seconds per metric are added to it.
+
+    Returns:
+    - A dict of metric to array of scores, aligned with the pairs.
+    """
+    metrics = OFFICIAL_PAIR_METRICS if official else ABBREV_PAIR_METRICS
+    n = len(names)
+    scores = {metric: np.empty(n, dtype=np.int64 if metric in INTEGER_METRICS else np.float64) for metric in metrics}
+    jaccard, subsequence, seq_match, levenshtein = (scores[metric] for metric in metrics[:4])
+    hamming, ngram_overlap = (scores['hamming_distance'], scores['ngram_overlap']) if official else (None, None)
+    clock = time.perf_counter if metric_seconds is not None else None
+    matcher = SequenceMatcher(None, '', '')
+    for i in range(n):
+        if clock: t0 = clock()
+        o, u = names[i], candidates[i]
+        jaccard[i] = jaccard_similarity(safe_set_conversion(o), safe_set_conversion(u))
+        if clock: t1 = clock(); metric_seconds['jaccard'] += t1 - t0; t0 = t1
+        subsequence[i] = check_subsequence(o, u)
+        if clock: t1 = clock(); metric_seconds['is_subsequence'] += t1 - t0; t0 = t1
+        # The pairs are ordered by candidate, so the matcher keeps its analysis of it while the candidate repeats
+        matcher.set_seq2(u)
+        matcher.set_seq1(o)
+        seq_match[i] = matcher.ratio()
+        if clock: t1 = clock(); metric_seconds['seq_match'] += t1 - t0; t0 = t1
+        levenshtein[i] = Levenshtein.distance(o, u)
+        if clock: t1 = clock(); metric_seconds['levenshtein'] += t1 - t0; t0 = t1
+        if not official:
+            continue
+        hamming[i] = hamming_distance_score(o, u)
+        if clock: t1 = clock(); metric_seconds['hamming_distance'] += t1 - t0; t0 = t1
+        o_ngrams, u_ngrams = trigram_set(o), trigram_set(u)
+        if len(o_ngrams) == 0 or len(u_ngrams) == 0:
+            ngram_overlap[i] = 0.0
+        else:
+            ngram_overlap[i] = len(o_ngrams.intersection(u_ngrams)) / min(len(o_ngrams), len(u_ngrams))
+        if clock: metric_seconds['ngram_overlap'] += clock() - t0
+    return scores
+
+def distinct_similarity_pairs(official_names, abbreviations, candidates):
+    """
+    The dedup stage of the similarity features: factorizes the (OfficialName, candidate) and
+    (Abbreviation, candidate) pairs of all candidate columns (stacked column after column).
+
+    Returns:
+    - A dict with 'official' and 'abbrev', each (codes, names, candidates) of factorize_pairs, and the pair_stats.
+    """
+    candidate_arrays = [values.to_numpy(dtype=object) for values in candidates.values()]
+    stacked = np.concatenate(candidate_arrays) if candidate_arrays else np.empty(0, dtype=object)
+    repeat = len(candidate_arrays)
+    pairs = {
+        'official': factorize_pairs(np.tile(official_names.to_numpy(dtype=object), repeat), stacked),
+        'abbrev': factorize_pairs(np.tile(abbreviations.to_numpy(dtype=object), repeat), stacked),
+    }
+    stats = {'pairs': len(stacked), 'official_distinct': len(pairs['official'][1]), 'abbrev_distinct': len(pairs['abbrev'][1])}
+    return pairs, stats
+
+def pair_hit_rates(pair_stats):
+    """ Share of the official and abbreviation pairs that were copies of a pair scored before. """
+    pairs = pair_stats['pairs']
+    return {kind: 1 - pair_stats[f'{kind}_distinct'] / pairs if pairs else 0.0 for kind in ('official', 'abbrev')}
+
+def scatter_pair_scores(pairs, scores, candidate_columns, n, index):
+    """ Builds the feature block from the scores of the distinct pairs: every pair gets the scores of its distinct pair. """
+    features = {}
+    views = {}
+    for kind, metrics in (('official', OFFICIAL_PAIR_METRICS + ['official_cosine_similarity']),
+                          ('abbrev', ABBREV_PAIR_METRICS + ['abbrev_cosine_similarity'])):
+        codes = pairs[kind][0]
+        for metric in metrics:
+            views[metric] = scores[kind][metric][codes].reshape(len(candidate_columns), n)
+    for k, col in enumerate(candidate_columns):
+        for metric in SIMILARITY_METRICS:
+            features[f'{col}_{metric}'] = views[metric][k]
+    return pd.DataFrame(features, index=index)
+
+def compute_similarity_features(official_names, abbreviations, candidates, profiler=None, pair_stats=None):
+    """
+    Computes all similarity metrics between the names and every candidate column.
+
+    The same name and candidate domain come back many times (establishments of one company, directory
+    sites, empty candidates), so the pairs are first factorized into the distinct (name, candidate) pairs
+    (distinct_similarity_pairs). Every metric is computed once per distinct pair and the scores are
+    scattered back to all rows. The cosine metric of all distinct pairs is computed in one
+    batch_cosine_similarity call per name kind. The values are identical to applying the individual
+    metric functions row by row.
+
+    Parameters:
+    - official_names, abbreviations: Series with the (lowercased) OfficialName and Abbreviation.
+    - candidates: Dict of column name to Series with candidate domains (without TLD).
+    - profiler: An enabled Profiler gets the seconds spent per metric (official and abbreviation variants together).
+    - pair_stats: A dict that is updated with the number of pairs and of distinct official and abbreviation pairs.
+
+    Returns:
+    - A DataFrame with a '{column}_{metric}' column for every candidate column and metric in SIMILARITY_METRICS.
+    """
+    profiler = profiler or NO_PROFILER
+    with profiler.span('similarity.pair_memo', len(official_names) * len(candidates)):
+        pairs, stats = distinct_similarity_pairs(official_names, abbreviations, candidates)
+    if pair_stats is not None:
+        for key, value in stats.items():
+            pair_stats[key] = pair_stats.get(key, 0) + value
+    # Per-metric clocks only run when profiling; otherwise each checkpoint is one falsy test
+    metric_seconds = None
+    if profiler.enabled:
+        metric_seconds = dict.fromkeys(['jaccard', 'is_subsequence', 'seq_match', 'levenshtein', 'hamming_distance', 'ngram_overlap'], 0.0)
+    scores = {kind: score_pairs(names, values, kind == 'official', metric_seconds) for kind, (_, names, values) in pairs.items()}
+    if metric_seconds is not None:
+        for metric, seconds in metric_seconds.items():
+            # Rows are the distinct pairs the metric was computed for
+            scored = stats['official_distinct'] + (stats['abbrev_distinct'] if f'abbrev_{metric}' in ABBREV_PAIR_METRICS else 0)
+            profiler.add(f'similarity.{metric}', seconds, scored)
+
+    with profiler.span('similarity.cosine_similarity', stats['official_distinct'] + stats['abbrev_distinct']):
+        for kind, (_, names, values) in pairs.items():
+            scores[kind][f'{kind}_cosine_similarity'] = batch_cosine_similarity(names, values)
+    return scatter_pair_scores(pairs, scores, list(candidates), len(official_names), official_names.index)
+
+def write_shared_table(columns):
+    """
+    Writes string columns as one Arrow IPC stream into a new shared memory block.
+
+    Returns:
+    - The SharedMemory block (the caller closes and unlinks it) and the size of the stream in bytes.
+    """
+    table = pa.table({name: pa.array(values, type=pa.large_string()) for name, values in columns.items()})
+    mock = pa.MockOutputStream()
+    with pa.ipc.new_stream(mock, table.schema) as writer:
+        writer.write_table(table)
+    block = shared_memory.SharedMemory(create=True, size=max(mock.size(), 1))
+    sink = pa.FixedSizeBufferWriter(pa.py_buffer(block.buf))
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    sink.close()
+    return block, mock.size()
+
+def similarity_pairs_chunk(block_name, size, official, start, stop):
+    """ Process pool task: scores the distinct pairs [start, stop) of a shared table, cosine included. """
+    block = shared_memory.SharedMemory(name=block_name)
+    try:
+        # The Arrow buffers point into the shared block; only this chunk's strings are copied out
+        table = pa.ipc.open_stream(pa.py_buffer(block.buf)[:size]).read_all().slice(start, stop - start)
+        names = table.column('name').to_numpy(zero_copy_only=False).astype(object)
+        candidates = table.column('candidate').to_numpy(zero_copy_only=False).astype(object)
+        del table
+        scores = score_pairs(names, candidates, official)
+        scores[f"{'official' if official else 'abbrev'}_cosine_similarity"] = batch_cosine_similarity(names, candidates)
+        return scores
+    finally:
+        block.close()
+
+def compute_similarity_features_parallel(official_names, abbreviations, candidates, workers, chunk_size=None, pair_stats=None):
+    """
+    compute_similarity_features on a pool of `workers` processes.
+
+    The pairs are factorized in this process, so every distinct pair is scored once over all workers.
+    The distinct pairs are shared with the workers as Arrow buffers in shared memory (official pairs,
+    then abbreviation pairs), so every task only receives a range of them. The result is identical to
+    compute_similarity_features.
+    """
+    pairs, stats = distinct_similarity_pairs(official_names, abbreviations, candidates)
+    if pair_stats is not None:
+        for key, value in stats.items():
+            pair_stats[key] = pair_stats.get(key, 0) + value
+    n_official, n_abbrev = stats['official_distinct'], stats['abbrev_distinct']
+    # A few chunks per worker keeps the pool busy when some chunks are slower than others
+    chunk_size = chunk_size or max(1, -(-(n_official + n_abbrev) // (workers * 4)))
+    columns = {'name': np.concatenate([pairs['official'][1], pairs['abbrev'][1]]),
+               'candidate': np.concatenate([pairs['official'][2], pairs['abbrev'][2]])}
+    # Chunks do not cross from the official to the abbreviation pairs
+    tasks = [(True, start, min(start + chunk_size, n_official)) for start in range(0, n_official, chunk_size)]
+    tasks += [(False, start, min(start + chunk_size, n_official + n_abbrev)) for start in range(n_official, n_official + n_abbrev, chunk_size)]
+    block, size = write_shared_table(columns)
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            chunks = list(executor.map(
+                similarity_pairs_chunk, [block.name] * len(tasks), [size] * len(tasks),
+                *(list(column) for column in zip(*tasks))
+            ))
+    finally:
+        block.close()
+        block.unlink()
+    if not chunks:
+        return compute_similarity_features(official_names, abbreviations, candidates)
+    scores = {}
+    for kind, official in (('official', True), ('abbrev', False)):
+        kind_chunks = [chunk for (is_official, _, _), chunk in zip(tasks, chunks) if is_official == official]
+        scores[kind] = {metric: np.concatenate([chunk[metric] for chunk in kind_chunks]) for metric in kind_chunks[0]}
+    return scatter_pair_scores(pairs, scores, list(candidates), len(official_names), official_names.index)
+
+def process_url_data(dataset_query_path, search_results_paths, workers=1, domain_parser=None, tld_stripper=None,
+                     compact=False, memory_report=None, profiler=None, pair_stats=None, labels=True):
+    """
+    Loads the query dataset and search results and computes the domain and similarity features.
+
+    URLs are parsed with `domain_parser` (a DomainParser, by default a new one with an empty cache);
+    pass one with a cache_path to reuse parsed domains across runs. The TLD is removed from the clean
+    domains with `tld_stripper` (a TldStripper, by default the one of the bundled public suffix list).
+
+    With workers > 1 the similarity features, the bulk of the work, are computed on a process pool;
+    the result is the same as with a single worker.
+
+    compact=True keeps the frame small (Arrow strings, int8/float32 features, missing values as NaN,
+    intermediate columns dropped); `memory_report` collects the bytes per entity of every stage.
+    See build_url_features.
+
+    An enabled `profiler` (see profiling.Profiler) records the time, rows and peak RSS of every stage.
+    Every distinct (name, candidate domain) pair is scored once; `pair_stats` collects how many there were
+    (see pair_hit_rates). With labels=False the training label 'domain_matches' is not computed.
+    """
+    profiler = profiler or NO_PROFILER
     # Load data
-    merged_dataset = load_data(dataset_query_path, search_results_paths)
-    # Lowercase all URL columns before processing
+    with profiler.span('features.load_data') as span:
+        merged_dataset = load_data(dataset_query_path, search_results_paths)
+        span.set_rows(len(merged_dataset))
     #merged_dataset = merged_dataset.head(100) --> only for testing
-    print(f'shape of the dataset: {merged_dataset.shape}')
+    return build_url_features(merged_dataset, workers=workers, domain_parser=domain_parser, tld_stripper=tld_stripper,
+                              compact=compact, memory_report=memory_report, profiler=profiler, pair_stats=pair_stats,
+                              labels=labels)
+
+def memory_per_entity(df):
+    """ Bytes of memory per row of a DataFrame, including the contents of string and object columns. """
+    return df.memory_usage(deep=True).sum() / max(len(df), 1)
+
+def mask_missing_pairs(similarity_features, official_missing, abbrev_missing, candidates_missing):
+    """
+    Sets the similarity features of pairs with a missing name or candidate domain to NaN and stores
+    them as float32. `candidates_missing` maps each candidate column to its missing mask.
+    """
+    masked = {}
+    for col, candidate_missing in candidates_missing.items():
+        for metric in SIMILARITY_METRICS:
+            missing = candidate_missing | (abbrev_missing if metric.startswith('abbrev_') else official_missing)
+            values = similarity_features[f'{col}_{metric}'].to_numpy(dtype=np.float32)
+            values[missing] = np.nan
+            masked[f'{col}_{metric}'] = values
+    return pd.DataFrame(masked, index=similarity_features.index)
+
+def build_url_features(merged_dataset, workers=1, domain_parser=None, tld_stripper=None, verbose=True,
+                       compact=False, memory_report=None, profiler=None, pair_stats=None, labels=True):
+    """
+    Computes the domain and similarity features of process_url_data for a DataFrame that is already
+    loaded: the query dataset columns (EntityNumber, OfficialName, Abbreviation, URL) and URL1..URL5.
+    With verbose=False the progress messages are not printed.
+
+    With compact=True the frame is kept small: strings are Arrow-backed, missing values stay missing
+    instead of becoming the string 'NaN', the has_* flags are int8 and the lengths and similarity
+    features float32, with NaN where the name or candidate domain is missing. The intermediate domain
+    columns are dropped once the next step has used them. Models for this mode have to be trained on
+    its features.
+
+    When `memory_report` is a list, a dict with the bytes per entity after every stage is appended to it.
+    An enabled `profiler` records every stage and, with a single worker, every similarity metric.
+    When `pair_stats` is a dict, the number of pairs and of distinct pairs that were scored is added to it.
+    The training label 'domain_matches' (which candidates have the entity's known domain) is only computed
+    with labels=True; predictions do not need it.
+    """
+    log = print if verbose else (lambda *args: None)
+    profiler = profiler or NO_PROFILER
+    stage_clock = profiler.stage_clock()
+    def report(stage):
+        if memory_report is not None:
+            memory_report.append({'stage': stage, 'bytes_per_entity': round(memory_per_entity(merged_dataset), 1),
+                                  'columns': merged_dataset.shape[1]})
+    report('loaded')
+    if compact:
+        strings = merged_dataset.select_dtypes(include='object').columns
+        merged_dataset = merged_dataset.astype({col: 'string[pyarrow]' for col in strings})
+    # Lowercase all URL columns before processing
+    log(f'shape of the dataset: {merged_dataset.shape}')
     url_columns = ['URL'] + [f'URL{i}' for i in range(1, 6)]
     for col in url_columns:
         merged_dataset[col] = merged_dataset[col].str.lower()
@@ -97,147 +430,147 @@ def process_url_data(dataset_query_path, search_results_paths):
     merged_dataset['OfficialName_cleaned'] = merged_dataset['OfficialName_cleaned'].str.replace(r"\[.*?\]", "", regex=True) # Remove text within brackets (including the brackets)
     merged_dataset['OfficialName_cleaned'] = merged_dataset['OfficialName_cleaned'].str.replace(r"\(.*?\)", "", regex=True)
     merged_dataset['OfficialName_cleaned'] = merged_dataset['OfficialName_cleaned'].str.replace('-', '', regex=True) # Remove hyphens from 'OfficialName'
-    merged_dataset['Abbreviation'] = merged_dataset.apply(
-        lambda row: create_abbreviation(row['OfficialName_cleaned']) if pd.isna(row['Abbreviation']) else row['Abbreviation'],
-        axis=1
-        ) # Abbreviation creation if none is given
+    merged_dataset['Abbreviation'] = [
+        create_abbreviation(name) if pd.isna(abbreviation) else abbreviation
+        for name, abbreviation in zip(merged_dataset['OfficialName_cleaned'], merged_dataset['Abbreviation'])
+        ] # Abbreviation creation if none is given
+    if compact:
+        merged_dataset['Abbreviation'] = merged_dataset['Abbreviation'].astype('string[pyarrow]')
     
     # Define the URL columns you are working with
     url_columns = ['URL'] + [f'URL{i}' for i in range(1, 6)]
     url_columns_without_official =[f'URL{i}' for i in range(1, 6)]
-    # Preprocess the domains to extract the core domain
-    preprocess_domains(merged_dataset, url_columns)
+    # Parse every distinct URL once into its core domain, clean domain and domain without TLD
+    domain_parser = domain_parser or DomainParser()
+    parsed_domains = {col: domain_parser.parse_column(merged_dataset[col]) for col in url_columns}
+    for col in url_columns:
+        merged_dataset[f'{col}_domain'] = parsed_domains[col]['core_domain']
     # Extract and append domain features for each URL column with a suffix indicating the column
     for col in url_columns:
-        # Extract clean domain first
-        merged_dataset[f'{col}_clean_domain'] = merged_dataset[col].apply(clean_extract_domain)
+        merged_dataset[f'{col}_clean_domain'] = parsed_domains[col]['clean_domain']
     # Compare domains and add the comparison results to the DataFrame
-    comparison_domain_cols = [f'{col}_clean_domain' for col in url_columns if col != 'URL']
-    merged_dataset['domain_matches'] = merged_dataset.apply(
-        lambda row: compare_domains(row, 'URL_clean_domain', comparison_domain_cols), axis=1
-    )
-    print('domains are cleaned')
+    if labels:
+        comparison_domain_cols = [f'{col}_clean_domain' for col in url_columns if col != 'URL']
+        merged_dataset['domain_matches'] = merged_dataset.apply(
+            lambda row: compare_domains(row, 'URL_clean_domain', comparison_domain_cols), axis=1
+        )
+    log('domains are cleaned')
+    report('domains parsed')
+    stage_clock.mark('features.parse_domains', len(merged_dataset))
     # Calculate the length of each 'URL(i)_domain'
     for col in url_columns_without_official:
         domain_col = f'{col}_domain'
         if domain_col in merged_dataset.columns:
-            # Apply the extraction of domain without TLD
-            merged_dataset[f'{col}_core_domain'] = merged_dataset[domain_col].apply(get_domain_without_tld)
+            # The domain without TLD comes from the same parse as the core domain
+            merged_dataset[f'{col}_core_domain'] = parsed_domains[col]['domain_without_tld']
             # Calculate the length of the domain without TLD
             merged_dataset[f'{col}_domain_length'] = merged_dataset[f'{col}_core_domain'].str.len()
+    del parsed_domains
+    if compact:
+        merged_dataset = merged_dataset.drop(columns=[f'{col}_domain' for col in url_columns] +
+                                             [f'{col}_core_domain' for col in url_columns_without_official])
     merged_dataset['Abbreviation'] = merged_dataset['Abbreviation'].str.lower() # Lowercase the 'OfficialName' column
     
+    official_names_cleaned = merged_dataset['OfficialName_cleaned'].to_numpy(dtype=object)
+    abbreviations = merged_dataset['Abbreviation'].to_numpy(dtype=object)
+    flag_dtype = np.int8 if compact else int
     for col in url_columns:
         if f'{col}_clean_domain' in merged_dataset.columns:
+            urls = merged_dataset[col].to_numpy(dtype=object)
             # Check if any word from 'OfficialName' is in the URL
-            merged_dataset[f'{col}_has_official_word'] = merged_dataset.apply(
-                lambda row: check_words_in_url(row['OfficialName_cleaned'], row[col]), axis=1).astype(int)
+            merged_dataset[f'{col}_has_official_word'] = np.array(
+                [check_words_in_url(words, url) for words, url in zip(official_names_cleaned, urls)], dtype=bool).astype(flag_dtype)
             # Check if 'Abbreviation' is in the URL
-            merged_dataset[f'{col}_has_abbreviation'] = merged_dataset.apply(
-                lambda row: check_abbreviation_in_url(row['Abbreviation'], row[col]), axis=1).astype(int)
+            merged_dataset[f'{col}_has_abbreviation'] = np.array(
+                [check_abbreviation_in_url(abbreviation, url) for abbreviation, url in zip(abbreviations, urls)], dtype=bool).astype(flag_dtype)
     merged_dataset['OfficialName_cleaned'] = merged_dataset['OfficialName_cleaned'].str.replace(' ', '', regex=True) # Remove spaces
     # Calculate the length of 'OfficialName_cleaned'
     merged_dataset['OfficialName_cleaned_length'] = merged_dataset['OfficialName_cleaned'].str.len()
     # Calculate the length of 'Abbreviation'
     
     merged_dataset['Abbreviation_length'] = merged_dataset['Abbreviation'].str.len()
+    report('url and name features')
+    stage_clock.mark('features.url_and_name_features', len(merged_dataset))
     
-    # Find all tlds
-    all_tlds = set()
-    # Columns to check
-    url_columns = [f'URL{i}_clean_domain' for i in range(1, 6)]
-    # Loop through each column, apply the function, and update the set of TLDs
-    for col in url_columns:
-        # Apply the extract_tlds function to the column
-        current_tlds = merged_dataset[col].apply(extract_tlds)
-        # Drop None values and update all_tlds set
-        all_tlds.update(tld for tld in current_tlds if tld is not None)
-    
-    merged_dataset = merged_dataset.fillna('NaN')
+    if compact:
+        length_columns = ['OfficialName_cleaned_length', 'Abbreviation_length'] + [f'{col}_domain_length' for col in url_columns_without_official]
+        merged_dataset = merged_dataset.astype({col: np.float32 for col in length_columns})
+    else:
+        merged_dataset = merged_dataset.fillna('NaN')
     
-    # List of TLDs to exclude
-    tlds = all_tlds
-    # Compile regex pattern outside the function for efficiency
-    tld_pattern = r'\.(' + '|'.join([re.escape(tld.strip('.')) for tld in tlds]) + ')$'
+    # Remove the public suffix with the fixed, versioned suffix table of the bundled public suffix list
+    tld_stripper = tld_stripper or load_tld_stripper()
     url_columns = [f'URL{i}_clean_domain' for i in range(1, 6)]
-    def extract_until_tld(url):
-        """Removes the last TLD from the URL if it matches the predefined list."""
-        if pd.isna(url):
-            return ""  # Handle NaN values
-        # Replace the last occurrence of TLD
-        url = re.sub(tld_pattern, "", url)
-        return url
+    candidates_missing = {}
     for col in url_columns:
-        merged_dataset[f'{col}_before_tld'] = merged_dataset[col].apply(extract_until_tld)
-    print('Domains are cleaned and NaN has been filled')
+        merged_dataset[f'{col}_before_tld'] = tld_stripper.strip_column(merged_dataset[col])
+        candidates_missing[f'{col}_before_tld'] = merged_dataset[col].isna().to_numpy()
+    if compact:
+        merged_dataset = merged_dataset.drop(columns=[f'{col}_clean_domain' for col in ['URL'] + url_columns_without_official])
+    log('Domains are cleaned and NaN has been filled')
+    report('tlds removed')
+    stage_clock.mark('features.strip_tlds', len(merged_dataset))
     
     url_columns_without_tld = [f'URL{i}_clean_domain_before_tld' for i in range(1, 6)]
-    print('These calculations will loop 4 times:')
-    for col in url_columns_without_tld:
-        merged_dataset[f'{col}_official_jaccard'] = merged_dataset.apply(
-            lambda row: jaccard_similarity(safe_set_conversion(row['OfficialName']), safe_set_conversion(row[col])), axis=1)
-        print('official jaccard done')
-        merged_dataset[f'{col}_abbrev_jaccard'] = merged_dataset.apply(
-            lambda row: jaccard_similarity(safe_set_conversion(row['Abbreviation']), safe_set_conversion(row[col])), axis=1)
-        print('abbrev jaccard done')
-        merged_dataset[f'{col}_official_is_subsequence'] = merged_dataset.apply(
-            lambda row: check_subsequence(row['OfficialName'], row[col]), axis=1).astype(int)
-        print('official is subsequence done')
-        merged_dataset[f'{col}_abbrev_is_subsequence'] = merged_dataset.apply(
-            lambda row: check_subsequence(row['Abbreviation'], row[col]), axis=1).astype(int)
-        print('abbrev is subsequence done')
-        merged_dataset[f'{col}_official_seq_match'] = merged_dataset.apply(
-            lambda row: sequence_match_score(row['OfficialName'], row[col]), axis=1)
-        print('official seq match done')
-        merged_dataset[f'{col}_abbrev_seq_match'] = merged_dataset.apply(
-            lambda row: sequence_match_score(row['Abbreviation'], row[col]), axis=1)
-        print('abbrev seq match done')
-        # Applying Levenshtein distance calculations
-        merged_dataset[f'{col}_official_levenshtein'] = merged_dataset.apply(
-            lambda row: levenshtein_distance_score(row['OfficialName'], row[col]), axis=1)
-        print('official levenshtein done')
-        merged_dataset[f'{col}_abbrev_levenshtein'] = merged_dataset.apply(
-            lambda row: levenshtein_distance_score(row['Abbreviation'], row[col]), axis=1)
-        print('abbrev levenshtein done')
-        merged_dataset[f'{col}_official_cosine_similarity'] = merged_dataset.apply(
-            lambda row: cosine_similarity_score(row['OfficialName'], row[col]), axis=1)
-        print('official cosine similarity done')
-        merged_dataset[f'{col}_abbrev_cosine_similarity'] = merged_dataset.apply(
-            lambda row: cosine_similarity_score(row['Abbreviation'], row[col]), axis=1)
-        print('abbrev cosine similarity done')
-        merged_dataset[f'{col}_hamming_distance'] = merged_dataset.apply(
-            lambda row: hamming_distance_score(row['OfficialName'], row[col]), axis=1)
-        print('hamming distance done')
-        merged_dataset[f'{col}_ngram_overlap'] = merged_dataset.apply(
-            lambda row: ngram_overlap_score(row['OfficialName'], row[col]), axis=1)
-        print('ngram overlap done')
-    print('Loop is finished')
+    log('Computing similarity features...')
+    official_names, abbreviations = merged_dataset['OfficialName'], merged_dataset['Abbreviation']
+    candidates = {col: merged_dataset[col] for col in url_columns_without_tld}
+    if compact:
+        # Missing values are scored like before and their features are set to NaN afterwards
+        official_names, abbreviations = official_names.astype(object).fillna('NaN'), abbreviations.astype(object).fillna('NaN')
+        candidates = {col: values.where(~candidates_missing[col], 'NaN') for col, values in candidates.items()}
+    pair_stats = {} if pair_stats is None else pair_stats
+    if workers > 1:
+        similarity_features = compute_similarity_features_parallel(official_names, abbreviations, candidates, workers,
+                                                                   pair_stats=pair_stats)
+    else:
+        similarity_features = compute_similarity_features(official_names, abbreviations, candidates, profiler, pair_stats)
+    hit_rates = pair_hit_rates(pair_stats)
+    log(f"Similarity pairs: {pair_stats['pairs']}, distinct official {pair_stats['official_distinct']} "
+        f"(hit rate {hit_rates['official']:.1%}), distinct abbreviation {pair_stats['abbrev_distinct']} "
+        f"(hit rate {hit_rates['abbrev']:.1%})")
+    if compact:
+        similarity_features = mask_missing_pairs(
+            similarity_features, merged_dataset['OfficialName'].isna().to_numpy(),
+            merged_dataset['Abbreviation'].isna().to_numpy(), candidates_missing
+        )
+        merged_dataset = merged_dataset.drop(columns=url_columns_without_tld)
+    merged_dataset = pd.concat([merged_dataset, similarity_features], axis=1)
+    log('Similarity features are computed')
+    report('similarity features')
+    stage_clock.mark('features.similarity', len(merged_dataset))
     return merged_dataset
 
+# Feature matrix columns, in the order the models are trained on
+FEATURE_COLUMNS = [
+    'URL1_has_official_word', 'URL1_has_abbreviation',
+    'URL2_has_official_word', 'URL2_has_abbreviation',
+    'URL3_has_official_word', 'URL3_has_abbreviation',
+    'URL4_has_official_word', 'URL4_has_abbreviation',
+    'URL5_has_official_word', 'URL5_has_abbreviation',
+    'OfficialName_cleaned_length', 'Abbreviation_length'
+] + [
+    f'{col}_{metric}' for col in [f'URL{i}_clean_domain_before_tld' for i in range(1, 6)]
+    for metric in SIMILARITY_METRICS
+]
+
+def prepare_features(merged_dataset, feature_columns=FEATURE_COLUMNS):
+    """ Returns the feature matrix X; unlike prepare_features_and_targets it needs no labels. """
+    return merged_dataset[list(feature_columns)]
+
+def encode_targets(merged_dataset, classes=None):
+    """
+    Encodes 'domain_matches' as a multilabel target; returns the encoded targets and the label classes.
+    Without `classes` they are the labels that occur in the data.
+    """
+    mlb = MultiLabelBinarizer(classes=classes)
+    y_encoded = mlb.fit_transform(merged_dataset['domain_matches'])
+    return y_encoded, mlb.classes_
+
 def prepare_features_and_targets(merged_dataset):
     # Prepare feature matrix X
-    feature_columns = [
-        'URL1_has_official_word', 'URL1_has_abbreviation',
-        'URL2_has_official_word', 'URL2_has_abbreviation',
-        'URL3_has_official_word', 'URL3_has_abbreviation',
-        'URL4_has_official_word', 'URL4_has_abbreviation',
-        'URL5_has_official_word', 'URL5_has_abbreviation',
-        'OfficialName_cleaned_length', 'Abbreviation_length'
-    ] + [
-        f'{col}_{metric}' for col in [f'URL{i}_clean_domain_before_tld' for i in range(1, 6)]
-        for metric in [
-            'official_jaccard', 'abbrev_jaccard',
-            'official_is_subsequence', 'abbrev_is_subsequence',
-            'official_seq_match', 'abbrev_seq_match',
-            'official_levenshtein', 'abbrev_levenshtein',
-            'official_cosine_similarity', 'abbrev_cosine_similarity',
-            'hamming_distance', 'ngram_overlap'
-        ]
-    ]
-    X = merged_dataset[feature_columns]
+    X = prepare_features(merged_dataset)
 
     # Encode multilabel target
-    mlb = MultiLabelBinarizer()
-    y_encoded = mlb.fit_transform(merged_dataset['domain_matches'])
+    y_encoded, _ = encode_targets(merged_dataset)
     return X, y_encoded
-
@@ -1,16 +1,25 @@
 import os
+import shutil
+import numpy as np
 import pandas as pd
-import time
-from sklearn.preprocessing import StandardScaler
-import joblib
 from urllib.parse import urlparse
-from duckduckgo_search import DDGS
-from sklearn.model_selection import train_test_split
-from Library.data_processing import extract_and_convert_to_parquet
-from Library.file_management import find_latest_zip_file, get_last_processed_file, update_last_processed_file
+from Library.data_processing import stream_zip_to_parquet
+from Library.file_management import find_latest_zip_file, find_pending_update_files, get_last_processed_file, update_last_processed_file
+from Library.data_update import apply_update_zip, build_partitioned_dataset
 from Library.web_driver import setup_driver
 from Library.download_utils import wait_for_download_completion
 from Library.navigation_utils import login, navigate_and_download
+from Library.homepage_crawler import HomepageCrawler, add_homepage_features, homepage_url
+from Library.http_transport import HttpTransport
+from Library.search_engine import MultiProvider, ProviderQuota, search_all
+from Library.search_providers import DDGProvider, GoogleCSEProvider, StubProvider
+from Library.scrape_journal import ScrapeJournal
+from Library.search_cache import CachedProvider, SearchCache
+from Library.url_blocklist import load_blocklist
+from Library.streaming_pipeline import ChunkedParquetOutput, iter_parquet_chunks, prefetch
+from Library.domain_parsing import DomainParser, load_tld_stripper
+from Library.prediction_model import create_predicted_url_df, load_model_bundle, predict_in_batches
+from Library.profiling import NO_PROFILER, Profiler
 import Library.data_filter_prediction_pipeline as data_filter
 import Library.data_loader as data_loader
 import Library.data_saver_prediction_pipeline as data_saver_prediction_pipeline
@@ -23,12 +32,12 @@ warnings.filterwarnings('ignore', category=PerformanceWarning)
 
 
 
-def main_web_interaction():
+def main_web_interaction(kind='Full'):
     driver, download_dir = setup_driver()
     try:
         initial_files = set(os.listdir(download_dir))
         login(driver, "your_username", "your_password")
-        if navigate_and_download(driver, download_dir):
+        if navigate_and_download(driver, download_dir, kind=kind):
             if not wait_for_download_completion(download_dir, initial_files):
                 print("Download did not complete within the timeout period.")
     finally:
@@ -39,158 +48,317 @@ def manage_zip_files():
     extracted_files_directory = 'ExtractedFiles'
     if not os.path.exists(extracted_files_directory):
         os.makedirs(extracted_files_directory)
-    latest_zip = find_latest_zip_file(zip_directory)
+    latest_zip = find_latest_zip_file(zip_directory, suffix='_Full.zip')
     last_processed = get_last_processed_file(extracted_files_directory)
     if latest_zip and latest_zip != last_processed:
         print(f"Processing new ZIP file: {latest_zip}")
         full_zip_path = os.path.join(zip_directory, latest_zip)
-        extract_and_convert_to_parquet(full_zip_path, extracted_files_directory)
+        stream_zip_to_parquet(full_zip_path, extracted_files_directory)
         update_last_processed_file(latest_zip, extracted_files_directory)
         print("Update complete.")
     else:
         print("No new ZIP file needs processing.")
 
+def manage_update_zip_files(dataset_directory='KboDataset'):
+    """
+    Applies all unprocessed KBO Update archives to the partitioned dataset.
+    The dataset is seeded from the Full archive the first time; without one, FileNotFoundError is raised.
+    Returns the set of EntityNumbers that changed.
+    """
+    zip_directory = 'Zip'
+    state_file = 'last_processed_update.txt'
+    if not os.path.exists(dataset_directory):
+        manage_zip_files()
+        full_zip = get_last_processed_file('ExtractedFiles')
+        if full_zip is None:
+            # Update archives only hold changes; applied to an empty or stale extract they are not a dataset
+            raise FileNotFoundError(f"No Full ZIP file has been processed, so {dataset_directory} cannot be built: "
+                                    f"download a *_Full.zip into {zip_directory} first")
+        print(f"Building partitioned dataset in {dataset_directory}...")
+        build_partitioned_dataset('ExtractedFiles', dataset_directory)
+        # Updates up to the month of the Full archive are already included in it
+        covered = [f for f in find_pending_update_files(zip_directory, None)
+                   if f.replace('_Update.zip', '') <= full_zip.replace('_Full.zip', '')]
+        if covered:
+            update_last_processed_file(covered[-1], dataset_directory, state_file)
+
+    changed_entities = set()
+    last_processed = get_last_processed_file(dataset_directory, state_file)
+    for update_zip in find_pending_update_files(zip_directory, last_processed):
+        print(f"Applying update ZIP file: {update_zip}")
+        changed_entities |= apply_update_zip(os.path.join(zip_directory, update_zip), dataset_directory)
+        update_last_processed_file(update_zip, dataset_directory, state_file)
+    print(f"{len(changed_entities)} entities changed.")
+    return changed_entities
+
 def main_data_processing(parquet_directory):
-    dataframes = data_loader.load_data(parquet_directory)
+    # Only the columns and rows filter_data uses are read from the Parquet files
+    dataframes = data_loader.load_data_lazy(parquet_directory, data_loader.FILTER_DATA_SPEC)
     combined_df = data_filter.filter_data(dataframes)
     data_saver_prediction_pipeline.save_data(combined_df)
 
-def scrape_top_urls_ddg(search_query, skip_domains, max_results=10):
-    top_urls = []
-    ddgs = DDGS()
-    try:
-        results = ddgs.text(keywords=search_query, max_results=max_results + len(skip_domains))
-        for result in results:
-            url = result.get('href')
-            if url and not any(skip_domain in url for skip_domain in skip_domains):
-                top_urls.append(url)
-                if len(top_urls) == max_results:
-                    break
-    except Exception as e:
-        print(f"Encountered an error: {e}")
-        raise
-    return top_urls
-
-def process_and_scrape_data():
-    try:
-        result_df = pd.read_csv('search_results_DDG.csv')
-        collected_data = result_df.to_dict('records')
-    except FileNotFoundError:
-        collected_data = []
+# Default limits per provider: DDG as the single-provider default of process_and_scrape_data (applied when
+# several are combined), Google CSE within the paid API's 10,000 requests per day (always applied, per API request)
+DEFAULT_PROVIDER_QUOTAS = {
+    'DDG': {'rate': 1.0, 'burst': 1},
+    'Google': {'rate': 10.0, 'burst': 10, 'max_queries': 10000},
+}
+
+def make_search_provider(names=('DDG',), hedge_delay=None, config_path='config_search.json', stub_url='http://127.0.0.1:8765',
+                         quotas=None, transport=None, skip_domains=None, profiler=None):
+    """
+    Builds the search provider for process_and_scrape_data and run_streaming_prediction.
+
+    Parameters:
+    - names: Providers to use, out of 'DDG', 'Google' (credentials in `config_path`) and 'Stub' (the local stub server).
+    - hedge_delay: With several providers, try them in order and only ask the next one when the earlier ones
+      have not answered within this many seconds; None queries all of them and merges the results.
+    - quotas: Dict of provider name to ProviderQuota keyword arguments, overriding DEFAULT_PROVIDER_QUOTAS.
+    - transport: HttpTransport the providers send their requests through; by default they share a new one.
+    - skip_domains: DomainBlocklist (by default load_blocklist()); Google stops paging once it has 5 results
+      that are not blocked.
+
+    With several providers the per-provider quotas do the rate limiting, so pass a `rate` to
+    process_and_scrape_data that does not hold them back. The Google quota counts API requests (a query
+    can take several pages) and applies with Google alone as well.
+    """
+    transport = transport or HttpTransport()
+    skip_domains = skip_domains or load_blocklist()
+    limits = {**DEFAULT_PROVIDER_QUOTAS, **(quotas or {})}
+    constructors = {
+        'DDG': lambda: DDGProvider(transport=transport),
+        'Google': lambda: GoogleCSEProvider.from_config(
+            config_path, transport=transport, keep=lambda url: not skip_domains.is_blocked(url),
+            quota=ProviderQuota(**limits['Google'])),
+        'Stub': lambda: StubProvider(stub_url, transport=transport),
+    }
+    providers = [constructors[name]() for name in names]
+    if len(providers) == 1:
+        return providers[0]
+    # The Google provider acquires its quota per API request itself
+    provider_quotas = {name: ProviderQuota(**limits[name]) for name in names if name in limits and name != 'Google'}
+    return MultiProvider(providers, provider_quotas, hedge_delay=hedge_delay, profiler=profiler)
+
+def collect_search_results(entity_numbers, results, skip_domains):
+    """ Turns search results into EntityNumber/URL1..URL5 rows without blocked URLs; failed queries (None) are left out. """
+    collected_data = []
+    for entity_number, urls in zip(entity_numbers, results):
+        if urls is None:
+            continue
+        filtered_urls = skip_domains.filter_urls(urls, max_results=5)
+        collected_data.append({
+            "EntityNumber": entity_number,
+            "URL1": filtered_urls[0] if len(filtered_urls) > 0 else "",
+            "URL2": filtered_urls[1] if len(filtered_urls) > 1 else "",
+            "URL3": filtered_urls[2] if len(filtered_urls) > 2 else "",
+            "URL4": filtered_urls[3] if len(filtered_urls) > 3 else "",
+            "URL5": filtered_urls[4] if len(filtered_urls) > 4 else ""
+        })
+    return collected_data
+
+def process_and_scrape_data(provider=None, concurrency=4, rate=1.0, batch_size=100, cache_path='search_cache.sqlite', retries=2,
+                            profiler=None):
+    """
+    Searches the web for every entity that has no search results yet.
+    Up to `concurrency` queries are in flight at once, limited to `rate` queries per second.
+    A failed query is retried up to `retries` times later in its batch (see run_searches); entities whose
+    query still fails are left out of the journal and searched again on the next run.
+    Results are cached in `cache_path` (None disables the cache), so unchanged queries are not sent again next month.
+    """
+    profiler = profiler or NO_PROFILER
+    # Results are journaled per batch; search_results_DDG.csv is written from the journal at the end
+    journal = ScrapeJournal('search_results_DDG.journal.sqlite', import_csv_path='search_results_DDG.csv')
 
     df = pd.read_parquet("combined_filtered_dataset.parquet")
     print(df.head())
     df['SearchQuery'] = df.apply(lambda row: f"{row['OfficialName']} {row['ZipCode']} {row['Municipality']}", axis=1)
     df.to_csv('dataset_incl_query.csv', index=True)
     total_rows = len(df)
-    skip_domains = set(
-        ['trendstop.knack.be', 'fincheck.be', 'bizzy.org'
-                , 'trendstop.levif.be', 'companyweb.be', 'linkedin.com'
-                , 'en.wikipedia.org', 'facebook.com', 'be.linkedin.com'
-                , 'instagram.com', 'werkenbijdeoverheid.be', 'dnb.com', 'nl.wikipedia.org'
-                , 'youtube.com', 'staatsbladmonitor.be', 'werkenvoor.be'
-                , 'twitter.com', 'vlaanderen.be/organisaties', 'jobat.be'
-                , 'vdab.be', 'opencorporates.com','www.goldenpages.be',
-                'www.immoweb.be', 'be.kompass.com','www.infobel.com',
-                'www.bsearch.be', 'www.creditsafe.com','openthebox.be',
-                'bedrijvengids.cybo.com','data.be','www.yelp.com',
-                'www.goudengids.be','gb.kompass.com','www.cylex-belgie.be',
-                'local.infobel.be','www.cybo.com','www.viamichelin.com','lokaal.infobel.be',
-                'www.northdata.com','www.tripadvisor.com','www.zoominfo.com',
-                'fr.kompass.com','www.openingsuren.vlaanderen','www.info-clipper.com',
-                'www.northdata.de','b2bhint.com','www.realo.be',
-                'www.pagesdor.be','www.worldpostalcodes.org','www.openingsurengids.be',
-                'open-winkel.be','opencorpdata.com','lemariagedelouise.be',
-                'www.signalhire.com','www.faillissementsdossier.be','www.bizique.be',
-                'www.booking.com','www.hours.be','www.handelsgids.be',
-                'foursquare.com','zaubee.com','be.top10place.com',
-                'restaurantguru.com','www.zimmo.be','guide.michelin.com',
-                'selfcity.be','belgium.worldplaces.me','www.boekhoudkantoren.be',
-                'jaarrekening.be'
-    ])
-
-    for index, row in df.iterrows():
-        if any(d['EntityNumber'] == row['EntityNumber'] for d in collected_data):
-            continue  # Skip already processed
-        
-        search_query = row['SearchQuery']
-        entity_number = row['EntityNumber']
-        try:
-            filtered_urls = scrape_top_urls_ddg(search_query, skip_domains, max_results=5)
-            time.sleep(1)  # Simple rate limit
-
-            collected_data.append({
-                "EntityNumber": entity_number, 
-                "URL1": filtered_urls[0] if len(filtered_urls) > 0 else "",
-                "URL2": filtered_urls[1] if len(filtered_urls) > 1 else "",
-                "URL3": filtered_urls[2] if len(filtered_urls) > 2 else "",
-                "URL4": filtered_urls[3] if len(filtered_urls) > 3 else "",
-                "URL5": filtered_urls[4] if len(filtered_urls) > 4 else ""
-            })
-        except Exception as e:
-            print(f"Error encountered: {e}. Waiting before retrying...")
-            time.sleep(20)
-            continue
-
-        result_df = pd.DataFrame(collected_data)
-        result_df.to_csv('search_results_DDG.csv', index=False)
-        processed_entries = index + 1 # type: ignore
+    skip_domains = load_blocklist()
+
+    pending = df[~df['EntityNumber'].isin(journal.completed)]
+    provider = provider or DDGProvider()
+    cache = SearchCache(cache_path) if cache_path else None
+    if cache is not None:
+        provider = CachedProvider(provider, cache)
+    # Queries are sent in batches; every batch is committed to the journal in one transaction
+    for batch_start in range(0, len(pending), batch_size):
+        batch = pending.iloc[batch_start:batch_start + batch_size]
+        with profiler.span('search.batch', len(batch)):
+            results, stats = search_all(
+                batch['SearchQuery'].tolist(), provider, max_results=5 + len(skip_domains),
+                concurrency=concurrency, rate=rate, burst=concurrency, retries=retries, profiler=profiler
+            )
+        # Failed queries are retried on the next run
+        collected_data = collect_search_results(batch['EntityNumber'], results, skip_domains)
+        journal.append(collected_data)
+        processed_entries = total_rows - len(pending) + batch_start + len(batch)
         percentage_completed = (processed_entries / total_rows) * 100
-        print(f"Processed EntityNumber {entity_number}")
-
+        print(f"Processed {processed_entries}/{total_rows} entities ({percentage_completed:.1f}%), "
+              f"{stats['queries_per_second']} queries/s, {stats['errors']} errors")
+
+    journal.compact('search_results_DDG.csv')
+    journal.close()
+    if cache is not None:
+        print(f"Search cache: {cache.stats}, hit rate {cache.hit_rate():.1%}")
+        cache.close()
     print("All data has been processed and saved.")
     
-def load_and_predict():
-    X, y_encoded, processed_data = prepare_data()
-
-    X_train, X_test, y_train, y_test = train_test_split(X, y_encoded, test_size=0.2, random_state=42, stratify=y_encoded)
-    
-    scaler = StandardScaler()
-    X_train_scaled = scaler.fit_transform(X_train)
-    X_test_scaled = scaler.transform(X_test)
-
-    model = joblib.load('gradient_boosting_classifier.pkl')
-    predictions = model.predict(X_test_scaled)
-    
-    return predictions, processed_data  # Return processed_data instead of X_test
-
-
-def prepare_data():
+def load_and_predict(workers=1, bundle_path='url_model_bundle.joblib', batch_size=10000, pages_path=None, profiler=None):
+    """
+    Predicts the correct URLs for every entity with the persisted model bundle (model, fitted scaler,
+    feature order and label classes). The bundle is created when the model is trained (see Pipeline_ML.ipynb);
+    without it FileNotFoundError is raised before any features are computed.
+    """
+    profiler = profiler or NO_PROFILER
+    bundle = load_model_bundle(bundle_path)
+    processed_data = process_data(workers, profiler, pages_path, labels=False)
+    with profiler.span('predict', len(processed_data)):
+        predictions = predict_in_batches(bundle, processed_data, batch_size=batch_size)
+    return predictions, processed_data
+
+
+def process_data(workers=1, profiler=None, pages_path=None, labels=True):
+    """
+    Computes the URL features; with `pages_path` (see crawl_candidate_homepages) the homepage signals are added as well.
+    labels=False skips the training label 'domain_matches', which predictions do not need.
+    """
     dataset_query_path = 'dataset_incl_query.csv'
     search_results_paths = ['search_results_DDG.csv']
+    # Parsed domains are kept between runs; popular domains come back in every batch
+    domain_parser = DomainParser(cache_path='domain_cache.parquet')
+    pair_stats = {}
+    processed_data = url_preprocessing_prediction_pipeline.process_url_data(
+        dataset_query_path, search_results_paths, workers=workers, domain_parser=domain_parser, profiler=profiler,
+        pair_stats=pair_stats, labels=labels
+    )
+    domain_parser.save()
+    print(f"Domain cache hit rate: {domain_parser.hit_rate():.1%}")
+    hit_rates = url_preprocessing_prediction_pipeline.pair_hit_rates(pair_stats)
+    print(f"Similarity pair hit rate: official {hit_rates['official']:.1%}, abbreviation {hit_rates['abbrev']:.1%}")
+    if pages_path and os.path.exists(pages_path):
+        processed_data = add_homepage_features(processed_data, pd.read_parquet(pages_path))
+    return processed_data
+
+
+def prepare_data(workers=1):
     # Process data
-    processed_data = url_preprocessing_prediction_pipeline.process_url_data(dataset_query_path, search_results_paths)
+    processed_data = process_data(workers)
     # Prepare features and targets
     X, y_encoded = url_preprocessing_prediction_pipeline.prepare_features_and_targets(processed_data)
     return X, y_encoded, processed_data  # Include processed_data in the return
 
 
-def create_predicted_url_df(processed_data, predictions):
-    data = []
-    
-    for idx, (prediction, entry) in enumerate(zip(predictions, processed_data.itertuples(index=False))):
-        predicted_urls = []
-        
-        if prediction[0] == 1:
-            predicted_urls.append('No scraped URL has been found correct')
-        if prediction[1] == 1:
-            predicted_urls.append(entry.URL1)
-        if prediction[2] == 1:
-            predicted_urls.append(entry.URL2)
-        if prediction[3] == 1:
-            predicted_urls.append(entry.URL3)
-        if prediction[4] == 1:
-            predicted_urls.append(entry.URL4)
-        if prediction[5] == 1:
-            predicted_urls.append(entry.URL5)
-
-        if not predicted_urls:
-            predicted_urls.append('No valid prediction')
-
-        data.append({'Entity Number': entry.EntityNumber, 'Predicted URL': '; '.join(predicted_urls)})
-
-    results_df = pd.DataFrame(data)
-    return results_df
+def crawl_candidate_homepages(search_results_path='search_results_DDG.csv', pages_path='homepage_pages.parquet', transport=None,
+                              batch_size=5000, profiler=None, **crawler_options):
+    """
+    Fetches the homepage of every candidate URL in the search results and stores its signals (title, meta
+    tags, enterprise numbers) in `pages_path`. Homepages already stored are not fetched again. Every batch
+    is written to its own part file in `{pages_path}.parts`, so an interrupted crawl continues where it
+    stopped; the parts are merged into `pages_path` once at the end.
+    `crawler_options` are passed to HomepageCrawler (concurrency, host_delay, max_bytes, ...).
+    """
+    profiler = profiler or NO_PROFILER
+    parts_directory = pages_path + '.parts'
+    os.makedirs(parts_directory, exist_ok=True)
+    # Parts left by an interrupted crawl come after the pages file, in the order they were written
+    stored = ([pages_path] if os.path.exists(pages_path) else []) + [
+        os.path.join(parts_directory, name) for name in sorted(os.listdir(parts_directory))
+        if name.startswith('part-') and name.endswith('.parquet')
+    ]
+    search_results = pd.read_csv(search_results_path, dtype=str)
+    urls = pd.concat([search_results[f'URL{i}'] for i in range(1, 6)]).dropna()
+    homepages = pd.Series(urls.map(homepage_url).dropna().unique())
+    if stored:
+        stored_homepages = pd.concat([pd.read_parquet(path, columns=['homepage'])['homepage'] for path in stored])
+        homepages = homepages[~homepages.isin(stored_homepages)]
+    print(f"{len(homepages)} candidate homepages to fetch")
+    crawler = HomepageCrawler(transport, **crawler_options)
+    part_number = len(stored)
+    for batch_start in range(0, len(homepages), batch_size):
+        batch = homepages.iloc[batch_start:batch_start + batch_size].tolist()
+        with profiler.span('crawl.batch', len(batch)):
+            batch_pages = crawler.crawl_all(batch)
+        part_path = os.path.join(parts_directory, f'part-{part_number:06d}.parquet')
+        batch_pages.to_parquet(part_path + '.tmp', index=False)
+        os.replace(part_path + '.tmp', part_path)
+        stored.append(part_path)
+        part_number += 1
+        print(f"Fetched {batch_start + len(batch)}/{len(homepages)} homepages: {crawler.stats}")
+    pages = pd.concat([pd.read_parquet(path) for path in stored], ignore_index=True) if stored else None
+    if pages is not None:
+        pages.to_parquet(pages_path + '.tmp', index=False)
+        os.replace(pages_path + '.tmp', pages_path)
+    shutil.rmtree(parts_directory)
+    return pages
+
+def search_chunks(chunks, provider=None, concurrency=4, rate=1.0, cache_path='search_cache.sqlite', retries=2, profiler=None):
+    """
+    Streaming search stage: adds SearchQuery and URL1..URL5 to every (chunk number, DataFrame) of entities.
+    Queries that fail are retried up to `retries` times; entities whose query keeps failing get no URLs.
+    """
+    profiler = profiler or NO_PROFILER
+    skip_domains = load_blocklist()
+    provider = provider or DDGProvider()
+    cache = SearchCache(cache_path) if cache_path else None
+    if cache is not None:
+        provider = CachedProvider(provider, cache)
+    try:
+        for chunk_number, df in chunks:
+            df['SearchQuery'] = df.apply(lambda row: f"{row['OfficialName']} {row['ZipCode']} {row['Municipality']}", axis=1)
+            queries = df['SearchQuery'].tolist()
+            with profiler.span('search.chunk', len(df)):
+                results, _ = search_all(queries, provider, max_results=5 + len(skip_domains), concurrency=concurrency,
+                                        rate=rate, burst=concurrency, retries=retries, profiler=profiler)
+            search_results = pd.DataFrame(collect_search_results(df['EntityNumber'], results, skip_domains),
+                                          columns=['EntityNumber', 'URL1', 'URL2', 'URL3', 'URL4', 'URL5'])
+            # Empty results are missing values, like when search_results_DDG.csv is read back
+            search_results = search_results.replace('', np.nan)
+            yield chunk_number, df.merge(search_results, on='EntityNumber', how='left')
+    finally:
+        if cache is not None:
+            print(f"Search cache: {cache.stats}, hit rate {cache.hit_rate():.1%}")
+            cache.close()
+
+def predict_chunks(chunks, bundle, domain_parser, tld_stripper, profiler=None):
+    """ Streaming feature and prediction stage: yields (chunk number, predicted URL DataFrame) per chunk of searched entities. """
+    profiler = profiler or NO_PROFILER
+    for chunk_number, df in chunks:
+        processed_data = url_preprocessing_prediction_pipeline.build_url_features(
+            df, domain_parser=domain_parser, tld_stripper=tld_stripper, verbose=False, profiler=profiler, labels=False
+        )
+        with profiler.span('predict', len(processed_data)):
+            predictions = predict_in_batches(bundle, processed_data)
+        yield chunk_number, extract_domain_from_urls(create_predicted_url_df(processed_data, predictions))
+
+def run_streaming_prediction(input_path='combined_filtered_dataset.parquet', output_path='predicted_urls.parquet',
+                             chunk_size=10000, bundle_path='url_model_bundle.joblib', provider=None,
+                             concurrency=4, rate=1.0, cache_path='search_cache.sqlite', profiler=None):
+    """
+    Searches, computes features and predicts `chunk_size` entities at a time, so memory does not grow
+    with the size of the register. The search of the next chunk runs while the current one is being
+    predicted, but never more than one chunk ahead. Every predicted chunk is written right away; a
+    rerun with the same input and chunk size continues after the last written chunk.
+    """
+    run_key = {'input': os.path.abspath(input_path), 'input_size': os.path.getsize(input_path),
+               'input_mtime': os.path.getmtime(input_path), 'chunk_size': chunk_size}
+    output = ChunkedParquetOutput(output_path, run_key)
+    if output.completed:
+        print(f"Resuming: {len(output.completed)} chunks already predicted")
+    bundle = load_model_bundle(bundle_path)
+    domain_parser = DomainParser(cache_path='domain_cache.parquet')
+    tld_stripper = load_tld_stripper()
+
+    pending = ((chunk_number, df) for chunk_number, df in iter_parquet_chunks(input_path, chunk_size)
+               if chunk_number not in output.completed)
+    searched = prefetch(search_chunks(pending, provider, concurrency, rate, cache_path, profiler=profiler), max_pending=1)
+    for chunk_number, predicted_df in predict_chunks(searched, bundle, domain_parser, tld_stripper, profiler):
+        output.write(chunk_number, predicted_df)
+        print(f"Chunk {chunk_number}: {len(predicted_df)} entities predicted")
+
+    output.finish()
+    domain_parser.save()
+    print(f"Predictions saved to {output_path}")
 
 def extract_domain_from_urls(df):
     def get_domain(url):
@@ -221,42 +389,93 @@ def save_to_parquet(df, file_path):
     except Exception as e:
         print(f"An error occurred while saving to Parquet: {str(e)}")
 
-def main():
+def main(incremental=False, streaming=False, report_path=None, search_providers=('DDG',), hedge_delay=None, crawl_homepages=False):
+    """
+    Runs the whole pipeline. With a `report_path`, every stage is profiled and a JSON run report is
+    written to it, next to a Prometheus textfile with the same name and the extension .prom.
+    `search_providers` and `hedge_delay` select the search providers (see make_search_provider).
+    With `crawl_homepages`, the homepages of the candidate URLs are fetched after the search and their
+    signals are added to the features (batch run only).
+    """
+    profiler = Profiler() if report_path else NO_PROFILER
+    # Searches and homepage fetches share one pool of connections
+    transport = HttpTransport()
+    provider = make_search_provider(search_providers, hedge_delay, transport=transport, profiler=profiler)
+    # Several providers are limited by their own quotas instead of the shared rate
+    search_options = {'provider': provider} if len(search_providers) == 1 else {'provider': provider, 'rate': 1000.0}
+    try:
+        run_stages(incremental, streaming, profiler, search_options, transport if crawl_homepages else None)
+    finally:
+        if report_path:
+            profiler.write_json(report_path)
+            profiler.write_prometheus(os.path.splitext(report_path)[0] + '.prom')
+            print(f"Run report written to {report_path}")
+
+def run_stages(incremental, streaming, profiler, search_options, crawl_transport=None):
     # Step 1: Setup web driver and manage downloads
     print("Starting web interactions and downloads...")
-    main_web_interaction()
+    with profiler.span('main.web_interaction'):
+        if incremental and not os.path.exists('KboDataset'):
+            # The first incremental run seeds the partitioned dataset from the Full archive
+            main_web_interaction(kind='Full')
+        main_web_interaction(kind='Update' if incremental else 'Full')
 
     # Step 2: Manage and process ZIP files
     print("Processing ZIP files...")
-    manage_zip_files()
+    with profiler.span('main.zip_files'):
+        if incremental:
+            # Only the partitions touched by the monthly update files are rewritten
+            manage_update_zip_files()
+            parquet_directory = 'KboDataset'
+        else:
+            manage_zip_files()
+            parquet_directory = 'ExtractedFiles'
 
     # Step 3: Load, filter, analyze, and save data
     print("Loading and processing data...")
-    parquet_directory = 'ExtractedFiles'
-    main_data_processing(parquet_directory)
+    with profiler.span('main.data_processing'):
+        main_data_processing(parquet_directory)
+
+    if streaming:
+        # Steps 4 to 6 chunk by chunk, with a model bundle created by an earlier batch run
+        print("Searching, predicting and saving in chunks...")
+        with profiler.span('main.streaming_prediction'):
+            run_streaming_prediction(profiler=profiler, **search_options)
+        return
 
     # Step 4: Scrape additional data from the web
     print("Scraping additional data...")
-    process_and_scrape_data()
+    with profiler.span('main.search'):
+        process_and_scrape_data(profiler=profiler, **search_options)
+
+    pages_path = None
+    if crawl_transport is not None:
+        print("Fetching the homepages of the candidate URLs...")
+        pages_path = 'homepage_pages.parquet'
+        with profiler.span('main.crawl'):
+            crawl_candidate_homepages(pages_path=pages_path, transport=crawl_transport, profiler=profiler)
 
     # Step 5: Perform machine learning preprocessing + prediction
     print("Preprocessing data for machine learning and starting the prediction process..")
 
-    # Load data and make predictions
-    predictions, processed_data = load_and_predict()  # Updated to receive processed_data
+    with profiler.span('main.features_and_prediction') as span:
+        # Load data and make predictions
+        predictions, processed_data = load_and_predict(pages_path=pages_path, profiler=profiler)  # Updated to receive processed_data
 
-    # Create the predicted URL DataFrame using processed_data
-    predicted_df = create_predicted_url_df(processed_data, predictions)
-    
-    # Extract domains from the predicted URLs
-    predicted_df = extract_domain_from_urls(predicted_df)
+        # Create the predicted URL DataFrame using processed_data
+        predicted_df = create_predicted_url_df(processed_data, predictions)
+
+        # Extract domains from the predicted URLs
+        predicted_df = extract_domain_from_urls(predicted_df)
+        span.set_rows(len(predicted_df))
     print(predicted_df.head(10))
     print("Model predictions completed.")
     
     # Step 6: Save the predictions to a Parquet file
     
     # Save the DataFrame to a Parquet file
-    save_to_parquet(predicted_df, 'predicted_urls.parquet')
+    with profiler.span('main.save', len(predicted_df)):
+        save_to_parquet(predicted_df, 'predicted_urls.parquet')
 
 if __name__ == "__main__":
     print("Script execution started.")
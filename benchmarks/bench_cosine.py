@@ -0,0 +1,50 @@
+import json
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+import Library.url_preprocessing_prediction_pipeline as upp
+from synthetic_kbo import WORDS, LEGAL_FORMS
+
+def name_domain_pairs(n_pairs, seed=42):
+    """ Official names and candidate domains (without TLD) like the ones process_url_data compares. """
+    rng = np.random.default_rng(seed)
+    first, second, form = rng.choice(WORDS, n_pairs), rng.choice(WORDS, n_pairs), rng.choice(LEGAL_FORMS, n_pairs)
+    names = [f'{a} {b} {f}'.strip() for a, b, f in zip(first, second, form)]
+    domains = []
+    for name, r in zip(names, rng.random(n_pairs)):
+        if r < 0.05:
+            domains.append('')
+        elif r < 0.4:
+            domains.append(''.join(name.split()[:2]))
+        else:
+            domains.append(WORDS[rng.integers(len(WORDS))] + WORDS[rng.integers(len(WORDS))])
+    return names, domains
+
+def run(n_pairs):
+    left, right = name_domain_pairs(n_pairs)
+
+    start = time.perf_counter()
+    per_pair = np.array([upp.cosine_similarity_score(a, b) for a, b in zip(left, right)])
+    per_pair_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    batch = upp.batch_cosine_similarity(left, right)
+    batch_seconds = time.perf_counter() - start
+
+    # Same vocabulary order and summation order as the per-pair vectorizer, so no tolerance is needed
+    assert np.array_equal(per_pair, batch)
+    return {
+        'pairs': n_pairs,
+        'identical_to_per_pair': True,
+        'per_pair_seconds': round(per_pair_seconds, 3),
+        'batch_seconds': round(batch_seconds, 3),
+        'per_pair_microseconds_per_pair': round(per_pair_seconds / n_pairs * 1e6, 2),
+        'batch_microseconds_per_pair': round(batch_seconds / n_pairs * 1e6, 2),
+        'speedup': round(per_pair_seconds / batch_seconds, 1),
+    }
+
+if __name__ == '__main__':
+    n_pairs = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    print(json.dumps(run(n_pairs), indent=2))
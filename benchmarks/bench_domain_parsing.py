@@ -0,0 +1,88 @@
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from Library.data_preprocessing_ML import clean_extract_domain, extract_tlds, get_core_domain, get_domain_without_tld
+from Library.domain_parsing import DomainParser, load_tld_stripper
+from synthetic_kbo import generate_register, generate_search_results
+from Library.data_filter import filter_data
+
+def legacy_domain_forms(urls):
+    """ The previous per-cell parsing: tldextract twice and the clean-domain regexes for every cell. """
+    core = urls.apply(get_core_domain)
+    return pd.DataFrame({
+        'core_domain': core,
+        'clean_domain': urls.apply(clean_extract_domain),
+        'domain_without_tld': core.apply(get_domain_without_tld),
+    })
+
+def legacy_strip_tlds(hosts_columns):
+    """ The previous TLD removal: an alternation of every TLD seen in the data, applied with re.sub per cell. """
+    all_tlds = set()
+    for hosts in hosts_columns:
+        all_tlds.update(tld for tld in hosts.apply(extract_tlds) if tld is not None)
+    tld_pattern = r'\.(' + '|'.join([re.escape(tld.strip('.')) for tld in all_tlds]) + ')$'
+    return [hosts.apply(lambda host: re.sub(tld_pattern, '', host)) for hosts in hosts_columns]
+
+def run(n_entities):
+    dataset = filter_data(generate_register(int(n_entities * 5.5) + 10)).head(n_entities)
+    results = generate_search_results(dataset)
+    # The same six columns process_url_data parses, lowercased like there
+    columns = [dataset['URL'].str.lower().reset_index(drop=True)] + [results[f'URL{i}'].str.lower() for i in range(1, 6)]
+
+    start = time.perf_counter()
+    legacy = [legacy_domain_forms(urls) for urls in columns]
+    legacy_seconds = time.perf_counter() - start
+
+    parser = DomainParser()
+    start = time.perf_counter()
+    parsed = [parser.parse_column(urls) for urls in columns]
+    cold_seconds = time.perf_counter() - start
+    for expected, actual in zip(legacy, parsed):
+        pd.testing.assert_frame_equal(expected, actual[expected.columns], check_exact=True)
+
+    # A later run that loads the cache written by this one
+    cache_path = os.path.join(tempfile.mkdtemp(), 'domain_cache.parquet')
+    parser.save(cache_path)
+    start = time.perf_counter()
+    warm_parser = DomainParser(cache_path=cache_path)
+    [warm_parser.parse_column(urls) for urls in columns]
+    warm_seconds = time.perf_counter() - start
+
+    # TLD removal on the clean domains of URL1..URL5, after fillna('NaN') like in process_url_data
+    hosts_columns = [forms['clean_domain'].fillna('NaN') for forms in parsed[1:]]
+    start = time.perf_counter()
+    legacy_stripped = legacy_strip_tlds(hosts_columns)
+    legacy_strip_seconds = time.perf_counter() - start
+    stripper = load_tld_stripper()
+    start = time.perf_counter()
+    stripped = [stripper.strip_column(hosts) for hosts in hosts_columns]
+    strip_seconds = time.perf_counter() - start
+    # Hosts differ only where the public suffix has more than one label, e.g. 'co.uk'
+    strip_differences = sum(int((old != new).sum()) for old, new in zip(legacy_stripped, stripped))
+
+    cells = sum(len(urls) for urls in columns)
+    return {
+        'cells': cells,
+        'distinct_urls': len(parser.cache),
+        'identical_to_legacy': True,
+        'legacy_seconds': round(legacy_seconds, 3),
+        'parser_cold_seconds': round(cold_seconds, 3),
+        'parser_warm_seconds': round(warm_seconds, 3),
+        'speedup_cold': round(legacy_seconds / cold_seconds, 1),
+        'speedup_warm': round(legacy_seconds / warm_seconds, 1),
+        'warm_hit_rate': round(warm_parser.hit_rate(), 3),
+        'suffix_list_version': parser.version,
+        'legacy_tld_strip_seconds': round(legacy_strip_seconds, 3),
+        'tld_stripper_seconds': round(strip_seconds, 3),
+        'tld_strip_differences': strip_differences,
+    }
+
+if __name__ == '__main__':
+    n_entities = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    print(json.dumps(run(n_entities), indent=2))
@@ -0,0 +1,68 @@
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from Library.embedding_store import EmbeddingStore
+from synthetic_kbo import generate_register, generate_search_results
+from Library.data_filter import filter_data
+
+class HashEmbedder:
+    """ Stands in for UrlEmbedder: a deterministic pseudo-random vector per URL, and a count of the URLs it was asked to encode. """
+    def __init__(self, embedding_dim=768):
+        self.embedding_dim = embedding_dim
+        self.stats = {'encoded': 0}
+
+    def vector(self, url):
+        seed = int.from_bytes(hashlib.sha256(url.encode('utf-8')).digest()[:8], 'little')
+        return np.random.default_rng(seed).standard_normal(self.embedding_dim).astype(np.float32)
+
+    def embed(self, urls):
+        urls = pd.Series(urls, dtype=object).fillna('NaN')
+        self.stats['encoded'] += urls.nunique()
+        return np.stack([self.vector(url) for url in urls])
+
+def search_results_for(n_entities, seed):
+    dataset = filter_data(generate_register(int(n_entities * 5.5) + 10, seed)).head(n_entities).reset_index(drop=True)
+    return generate_search_results(dataset, seed).replace('', np.nan)
+
+def run(n_entities, new_share=0.1):
+    # Month 2 keeps most entities and their results, and adds entities with new search results
+    month_1 = search_results_for(n_entities, seed=1)
+    month_2 = pd.concat([month_1.iloc[int(n_entities * new_share):], search_results_for(int(n_entities * new_share), seed=2)],
+                        ignore_index=True)
+    url_columns = [f'URL{i}' for i in range(1, 6)]
+    directory = tempfile.mkdtemp()
+    result = {'entities': n_entities}
+
+    for month, search_results in [('month_1', month_1), ('month_2', month_2)]:
+        # A fresh store object, as in a new run, reading what the previous run wrote
+        store = EmbeddingStore(directory, 'hash-embedder-v1')
+        embedder = HashEmbedder()
+        urls = np.concatenate([search_results[col].to_numpy(dtype=object) for col in url_columns])
+        start = time.perf_counter()
+        embeddings = store.embed(urls, embedder)
+        result[f'{month}_seconds'] = round(time.perf_counter() - start, 3)
+        result[f'{month}_distinct_urls'] = int(pd.Series(urls, dtype=object).fillna('NaN').nunique())
+        result[f'{month}_encoded'] = embedder.stats['encoded']
+        result[f'{month}_hit_rate'] = round(store.hit_rate(), 3)
+
+        expected = HashEmbedder().embed(urls)
+        np.testing.assert_array_equal(embeddings, expected.astype(np.float16).astype(np.float32))
+    result['stored_rows'] = len(store)
+    result['vectors_mb'] = round(os.path.getsize(store.vectors_path) / 1e6, 1)
+    result['gathered_equal_to_float16_embeddings'] = True
+
+    # Another model version shares the files but none of the rows
+    other = EmbeddingStore(directory, 'hash-embedder-v2')
+    result['other_version_hits'] = int((other.lookup(urls[:1000]) != -1).sum())
+    return result
+
+if __name__ == '__main__':
+    n_entities = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    print(json.dumps(run(n_entities), indent=2))
@@ -0,0 +1,100 @@
+import json
+import os
+import sys
+import tempfile
+import time
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+import Library.url_preprocessing_prediction_pipeline as upp
+from synthetic_kbo import write_prediction_inputs
+
+def legacy_similarity_features(merged_dataset):
+    """ The previous implementation: one row-wise apply per metric and candidate column. """
+    merged_dataset = merged_dataset.copy()
+    for col in [f'URL{i}_clean_domain_before_tld' for i in range(1, 6)]:
+        merged_dataset[f'{col}_official_jaccard'] = merged_dataset.apply(
+            lambda row: upp.jaccard_similarity(upp.safe_set_conversion(row['OfficialName']), upp.safe_set_conversion(row[col])), axis=1)
+        merged_dataset[f'{col}_abbrev_jaccard'] = merged_dataset.apply(
+            lambda row: upp.jaccard_similarity(upp.safe_set_conversion(row['Abbreviation']), upp.safe_set_conversion(row[col])), axis=1)
+        merged_dataset[f'{col}_official_is_subsequence'] = merged_dataset.apply(
+            lambda row: upp.check_subsequence(row['OfficialName'], row[col]), axis=1).astype(int)
+        merged_dataset[f'{col}_abbrev_is_subsequence'] = merged_dataset.apply(
+            lambda row: upp.check_subsequence(row['Abbreviation'], row[col]), axis=1).astype(int)
+        merged_dataset[f'{col}_official_seq_match'] = merged_dataset.apply(
+            lambda row: upp.sequence_match_score(row['OfficialName'], row[col]), axis=1)
+        merged_dataset[f'{col}_abbrev_seq_match'] = merged_dataset.apply(
+            lambda row: upp.sequence_match_score(row['Abbreviation'], row[col]), axis=1)
+        merged_dataset[f'{col}_official_levenshtein'] = merged_dataset.apply(
+            lambda row: upp.levenshtein_distance_score(row['OfficialName'], row[col]), axis=1)
+        merged_dataset[f'{col}_abbrev_levenshtein'] = merged_dataset.apply(
+            lambda row: upp.levenshtein_distance_score(row['Abbreviation'], row[col]), axis=1)
+        merged_dataset[f'{col}_official_cosine_similarity'] = merged_dataset.apply(
+            lambda row: upp.cosine_similarity_score(row['OfficialName'], row[col]), axis=1)
+        merged_dataset[f'{col}_abbrev_cosine_similarity'] = merged_dataset.apply(
+            lambda row: upp.cosine_similarity_score(row['Abbreviation'], row[col]), axis=1)
+        merged_dataset[f'{col}_hamming_distance'] = merged_dataset.apply(
+            lambda row: upp.hamming_distance_score(row['OfficialName'], row[col]), axis=1)
+        merged_dataset[f'{col}_ngram_overlap'] = merged_dataset.apply(
+            lambda row: upp.ngram_overlap_score(row['OfficialName'], row[col]), axis=1)
+    return merged_dataset
+
+def similarity_columns():
+    return [f'URL{i}_clean_domain_before_tld_{metric}' for i in range(1, 6) for metric in upp.SIMILARITY_METRICS]
+
+def run(n_entities, workers=1):
+    directory = tempfile.mkdtemp()
+    dataset_query_path, search_results_path = write_prediction_inputs(directory, n_entities)
+
+    start = time.perf_counter()
+    processed = upp.process_url_data(dataset_query_path, [search_results_path])
+    process_seconds = time.perf_counter() - start
+
+    # Score the same prepared rows with the previous row-wise implementation
+    prepared = processed.drop(columns=similarity_columns())
+    start = time.perf_counter()
+    legacy = legacy_similarity_features(prepared)
+    legacy_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    block = upp.compute_similarity_features(
+        prepared['OfficialName'], prepared['Abbreviation'],
+        {f'URL{i}_clean_domain_before_tld': prepared[f'URL{i}_clean_domain_before_tld'] for i in range(1, 6)}
+    )
+    engine_seconds = time.perf_counter() - start
+
+    # Bit-for-bit: same values and dtypes, no tolerance
+    pd.testing.assert_frame_equal(legacy[similarity_columns()], block, check_exact=True)
+    pd.testing.assert_frame_equal(legacy[similarity_columns()], processed[similarity_columns()], check_exact=True)
+
+    if workers > 1:
+        start = time.perf_counter()
+        parallel = upp.compute_similarity_features_parallel(
+            prepared['OfficialName'], prepared['Abbreviation'],
+            {f'URL{i}_clean_domain_before_tld': prepared[f'URL{i}_clean_domain_before_tld'] for i in range(1, 6)}, workers
+        )
+        parallel_seconds = time.perf_counter() - start
+        pd.testing.assert_frame_equal(block, parallel, check_exact=True)
+
+    rows = len(processed)
+    result = {
+        'rows': rows,
+        'identical_to_legacy': True,
+        'legacy_similarity_seconds': round(legacy_seconds, 3),
+        'engine_similarity_seconds': round(engine_seconds, 3),
+        'legacy_rows_per_second': round(rows / legacy_seconds, 1),
+        'engine_rows_per_second': round(rows / engine_seconds, 1),
+        'speedup': round(legacy_seconds / engine_seconds, 2),
+        'process_url_data_seconds': round(process_seconds, 3),
+    }
+    if workers > 1:
+        result.update({
+            'workers': workers,
+            'parallel_similarity_seconds': round(parallel_seconds, 3),
+            'parallel_speedup': round(engine_seconds / parallel_seconds, 2),
+        })
+    return result
+
+if __name__ == '__main__':
+    n_entities = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    print(json.dumps(run(n_entities, workers), indent=2))
@@ -0,0 +1,62 @@
+import json
+import os
+import sys
+import time
+from functools import reduce
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from Library import data_filter
+from synthetic_kbo import generate_register
+
+def legacy_filter_data(dataframes, require_url=True):
+    """ The previous implementation: eight filtered copies chained through seven left merges. """
+    official_name_df = dataframes['denomination'][
+        (dataframes['denomination']['TypeOfDenomination'] == 1) & (dataframes['denomination']['Language'] == 2)
+    ][['Denomination', 'EntityNumber']].copy().rename(columns={'Denomination': 'OfficialName'})
+    abbreviation_df = dataframes['denomination'][
+        (dataframes['denomination']['TypeOfDenomination'] == 2) & (dataframes['denomination']['Language'] == 2)
+    ][['Denomination', 'EntityNumber']].copy().rename(columns={'Denomination': 'Abbreviation'})
+    address_dfs = [
+        dataframes['address'][dataframes['address']['TypeOfAddress'] == "REGO"][[column, 'EntityNumber']].copy().rename(columns={column: name})
+        for column, name in [('Zipcode', 'ZipCode'), ('MunicipalityNL', 'Municipality'), ('StreetNL', 'Street'), ('HouseNumber', 'HouseNumber')]
+    ]
+    URL_df = dataframes['contact'][
+        (dataframes['contact']['EntityContact'].isin(['ENT', 'EST'])) &
+        (dataframes['contact']['ContactType'] == 'WEB') &
+        (dataframes['contact']['Value'].notna())
+    ][['Value', 'EntityNumber']].copy().rename(columns={'Value': 'URL'})
+    Activity_df = dataframes['activity'][
+        (dataframes['activity']['Classification'] == 'MAIN')
+    ][['NaceCode', 'EntityNumber']].copy()
+    df_list = [official_name_df, abbreviation_df] + address_dfs + [URL_df, Activity_df]
+    combined_df = reduce(lambda left, right: pd.merge(left, right, on='EntityNumber', how='left'), df_list)
+    combined_df.drop_duplicates(subset='EntityNumber', keep='first', inplace=True)
+    if require_url:
+        combined_df = combined_df[combined_df['URL'].notna()]
+    return combined_df[data_filter.OUTPUT_COLUMNS]
+
+def best_of(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+def run(n_entities, repeat=3):
+    dataframes = generate_register(n_entities)
+    results = {'n_entities': n_entities, 'source_rows': {k: len(v) for k, v in dataframes.items()}}
+    for require_url in (True, False):
+        legacy_time, legacy = best_of(lambda: legacy_filter_data(dataframes, require_url), repeat)
+        new_time, new = best_of(lambda: data_filter.filter_data(dataframes, require_url), repeat)
+        pd.testing.assert_frame_equal(legacy.reset_index(drop=True), new)
+        results[f'require_url={require_url}'] = {
+            'rows': len(new), 'legacy_seconds': round(legacy_time, 3),
+            'single_pass_seconds': round(new_time, 3), 'speedup': round(legacy_time / new_time, 2)
+        }
+    return results
+
+if __name__ == '__main__':
+    n_entities = int(sys.argv[1]) if len(sys.argv) > 1 else 2000000
+    print(json.dumps(run(n_entities), indent=2))
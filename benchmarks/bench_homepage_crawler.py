@@ -0,0 +1,93 @@
+import json
+import os
+import sys
+import time
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from Library.homepage_crawler import HomepageCrawler, add_homepage_features, homepage_url
+from Library.http_transport import HttpTransport
+from fixture_site_server import StaticResolver, enterprise_number, site_kind, site_title, start_fixture_server
+
+def candidate_frame(n_sites, port):
+    """ Entities with five candidates each: their own site (as a deeper URL) and four other sites. """
+    rows = []
+    for n in range(n_sites):
+        own = f'http://site-{n}.test:{port}/contact'
+        others = [f'http://site-{(n + k * 97) % n_sites}.test:{port}/' for k in range(1, 5)]
+        rows.append([enterprise_number(n), f'Bakkerij Peeters {n}', own] + others)
+    return pd.DataFrame(rows, columns=['EntityNumber', 'OfficialName', 'URL1', 'URL2', 'URL3', 'URL4', 'URL5'])
+
+def check_politeness(log, host_delay):
+    """
+    Most requests a host had in flight at once, and the shortest gap between two requests to one host.
+    Slow sites are left out of the first: the server is still busy with a request the crawler gave up on
+    when the retry comes in.
+    """
+    max_in_flight = max(hits['max_in_flight'] for host, hits in log['hosts'].items()
+                        if site_kind(int(host[len('site-'):-len('.test')])) != 'slow')
+    gaps = []
+    for hits in log['hosts'].values():
+        times = sorted(t for t, _ in hits['requests'])
+        gaps += [b - a for a, b in zip(times, times[1:])]
+    robots_per_host = max(sum(path == '/robots.txt' for _, path in hits['requests']) for hits in log['hosts'].values())
+    homepage_per_host = max(sum(path == '/' for _, path in hits['requests']) for hits in log['hosts'].values())
+    return {'max_in_flight_per_host': max_in_flight, 'min_seconds_between_requests': round(min(gaps), 3) if gaps else None,
+            'host_delay': host_delay, 'max_robots_requests_per_host': robots_per_host,
+            'max_homepage_requests_per_host': homepage_per_host}
+
+def outcomes(pages):
+    """ Per kind of site, how many homepages were fetched or failed, and why. """
+    counts = {}
+    outcome = pages['error'].fillna('ok').str.replace(r' for http.*', '', regex=True)
+    for (kind, outcome), count in pages.groupby(['kind', outcome]).size().items():
+        counts.setdefault(kind, {})[outcome] = int(count)
+    return counts
+
+def run(n_sites=2000, concurrency=200, host_delay=0.2):
+    server, port = start_fixture_server(slow_seconds=3.0)
+    transport = HttpTransport(timeout=2, limit=concurrency, max_retries=1, user_agent='URLfinder-bench', resolver=StaticResolver())
+    crawler = HomepageCrawler(transport, concurrency=concurrency, host_delay=host_delay, max_bytes=200000,
+                              user_agent='URLfinder-bench')
+    candidates = candidate_frame(n_sites, port)
+    urls = pd.concat([candidates[f'URL{i}'] for i in range(1, 6)]).tolist()
+    try:
+        start = time.perf_counter()
+        pages = crawler.crawl_all(urls)
+        seconds = time.perf_counter() - start
+        politeness = check_politeness(server.log, host_delay)
+        # A second batch with the same hosts does not fetch robots.txt again
+        robots_before = crawler.stats['robots_fetched'] + crawler.stats['robots_missing']
+        crawler.crawl_all(urls[:100])
+        robots_refetched = crawler.stats['robots_fetched'] + crawler.stats['robots_missing'] - robots_before
+    finally:
+        server.shutdown()
+
+    pages['n'] = pages['homepage'].str.extract(r'site-(\d+)\.test')[0].astype(int)
+    pages['kind'] = pages['n'].map(site_kind)
+    normal = pages[pages['kind'].isin(['normal', 'no_robots', 'crawl_delay'])]
+    features = add_homepage_features(candidates.copy(), pages)
+    own_fetched = features['URL1'].map(homepage_url).map(pages.set_index('homepage')['status']).eq(200)
+    return {
+        'sites': n_sites,
+        'candidate_urls': len(urls),
+        'distinct_homepages': len(pages),
+        'seconds': round(seconds, 2),
+        'homepages_per_second': round(len(pages) / seconds, 1),
+        'crawler': crawler.stats,
+        'outcome_per_kind': outcomes(pages),
+        'titles_as_expected': bool((normal['title'] == normal['n'].map(site_title)).all()),
+        'numbers_as_expected': bool((normal['enterprise_numbers'] == normal['n'].map(enterprise_number)).all()),
+        'huge_pages_truncated': bool(pages.loc[pages['kind'] == 'huge', 'truncated'].all()),
+        'own_site_number_matches': int(features.loc[own_fetched, 'URL1_enterprise_number_match'].sum()),
+        'own_sites_fetched': int(own_fetched.sum()),
+        'other_site_number_matches': int(features[[f'URL{i}_enterprise_number_match' for i in range(2, 6)]].to_numpy().sum()),
+        'robots_refetched_in_second_batch': robots_refetched,
+        'politeness': politeness,
+        'user_agents': sorted(a for a in server.log['user_agents'] if a),
+        'transport': transport.stats,
+    }
+
+if __name__ == '__main__':
+    n_sites = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    print(json.dumps(run(n_sites), indent=2))
@@ -0,0 +1,92 @@
+import json
+import os
+import socket
+import sys
+import aiohttp
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from Library.http_transport import HttpTransport
+from Library.search_engine import search_all
+from Library.search_providers import StubProvider
+from stub_search_server import start_stub_server
+
+class SessionPerQueryProvider(StubProvider):
+    """ Opens a new session, and so a new connection, for every query, like a bare requests.get in Web_Scraper.ipynb. """
+    async def open_client(self):
+        return None
+
+    async def close_client(self, client):
+        pass
+
+    async def search(self, client, query, max_results):
+        async with aiohttp.ClientSession() as session:
+            async with session.get(f'{self.base_url}/search', params={'q': query, 'n': max_results}) as response:
+                response.raise_for_status()
+                data = await response.json()
+        return [result['href'] for result in data.get('results', []) if result.get('href')]
+
+def free_port():
+    """ A port nothing listens on, to stand in for a provider that is down. """
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def run_case(name, provider, queries, server=None, **kwargs):
+    options = dict(max_results=5, concurrency=8, rate=10000, burst=8)
+    options.update(kwargs)
+    results, stats = search_all(queries, provider, **options)
+    case = {'case': name, 'answered': sum(r is not None for r in results), 'errors': stats['errors'],
+            'queue_retries': stats['retries'], 'seconds': stats['seconds'], 'queries_per_second': stats['queries_per_second']}
+    if getattr(provider, 'transport', None) is not None and not isinstance(provider, SessionPerQueryProvider):
+        case['transport'] = dict(provider.transport.stats)
+    if server is not None:
+        case['server'] = dict(server.counter)
+    return case
+
+def run(n_queries=200):
+    queries = [f'bakkerij janssens {i} {1000 + i} Gent' for i in range(n_queries)]
+    report = []
+
+    # Connection reuse; best of three runs, each against a fresh server
+    for name, provider_class in [('new session per query', SessionPerQueryProvider), ('shared keep-alive transport', StubProvider)]:
+        runs = []
+        for _ in range(3):
+            server, base_url = start_stub_server(latency=0.005)
+            try:
+                runs.append(run_case(name, provider_class(base_url), queries, server))
+            finally:
+                server.shutdown()
+        report.append(min(runs, key=lambda case: case['seconds']))
+
+    # Every 5th request fails with 503, every 7th gets a 429 with Retry-After: 1
+    server, base_url = start_stub_server(latency=0.005, error_every=5, throttle_every=7, retry_after=1)
+    try:
+        report.append(run_case('503s and 429s, no retries', StubProvider(base_url, transport=HttpTransport(max_retries=0)),
+                               queries, server))
+        server.counter.update(requests=0, connections=0)
+        report.append(run_case('503s and 429s, retries and Retry-After', StubProvider(base_url), queries, server,
+                               retries=2, retry_delay=0.1))
+    finally:
+        server.shutdown()
+
+    # Nothing listens on the port: without a breaker every query spends its retries on it
+    down_url = f'http://127.0.0.1:{free_port()}'
+    report.append(run_case('provider down, no circuit breaker',
+                           StubProvider(down_url, transport=HttpTransport(backoff_base=0.01, breaker_threshold=10 ** 9)), queries))
+    report.append(run_case('provider down, circuit breaker',
+                           StubProvider(down_url, transport=HttpTransport(backoff_base=0.01)), queries))
+
+    # A provider that is down for the first 2 seconds: the retry queue gets the entities answered once it is back
+    for retries in (0, 5):
+        server, base_url = start_stub_server(latency=0.005, outage=2.0)
+        transport = HttpTransport(max_retries=1, backoff_base=0.05, breaker_threshold=5, breaker_cooldown=0.5)
+        try:
+            report.append(run_case(f'2 s outage, retry queue of {retries}', StubProvider(base_url, transport=transport),
+                                   queries, server, retries=retries, retry_delay=0.5))
+        finally:
+            server.shutdown()
+    return report
+
+if __name__ == '__main__':
+    n_queries = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    print(json.dumps(run(n_queries), indent=2))
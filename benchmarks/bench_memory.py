@@ -0,0 +1,44 @@
+import json
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+import Library.url_preprocessing_prediction_pipeline as upp
+from synthetic_kbo import write_prediction_inputs
+
+def compare_features(default, compact):
+    """ Checks that the compact features equal the default ones wherever they are defined. """
+    for col in upp.FEATURE_COLUMNS:
+        defined = compact[col].notna().to_numpy()
+        expected = pd.to_numeric(default[col], errors='coerce').to_numpy(dtype=np.float64)[defined]
+        actual = compact[col].to_numpy(dtype=np.float64)[defined]
+        np.testing.assert_allclose(actual, expected, rtol=1e-6, atol=1e-6, err_msg=col)
+
+def run(n_entities):
+    directory = tempfile.mkdtemp()
+    dataset_query_path, search_results_path = write_prediction_inputs(directory, n_entities)
+
+    result = {}
+    frames = {}
+    for mode, compact in [('default', False), ('compact', True)]:
+        memory_report = []
+        start = time.perf_counter()
+        frames[mode] = upp.process_url_data(dataset_query_path, [search_results_path], compact=compact, memory_report=memory_report)
+        result[f'{mode}_seconds'] = round(time.perf_counter() - start, 3)
+        result[f'{mode}_stages'] = memory_report
+    compare_features(frames['default'], frames['compact'])
+
+    result['rows'] = len(frames['default'])
+    result['compact_matches_default'] = True
+    result['missing_feature_share'] = round(float(frames['compact'][upp.FEATURE_COLUMNS].isna().mean().mean()), 4)
+    result['final_reduction'] = round(
+        result['default_stages'][-1]['bytes_per_entity'] / result['compact_stages'][-1]['bytes_per_entity'], 2)
+    return result
+
+if __name__ == '__main__':
+    n_entities = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    print(json.dumps(run(n_entities), indent=2))
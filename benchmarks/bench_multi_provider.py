@@ -0,0 +1,80 @@
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from Library.http_transport import HttpTransport
+from Library.profiling import Profiler
+from Library.search_engine import MultiProvider, ProviderQuota, merge_ranked_results, search_all
+from Library.search_providers import StubProvider
+from stub_search_server import start_stub_server, stub_results
+
+def mean_latency_ms(profiler, name):
+    histogram = profiler.histograms[name]
+    return round(histogram['sum'] / histogram['count'] * 1000, 1)
+
+def run_case(name, provider, queries, concurrency):
+    profiler = Profiler()
+    results, stats = search_all(queries, provider, max_results=5, concurrency=concurrency, rate=10000,
+                                burst=concurrency, profiler=profiler)
+    case = {'case': name, 'errors': stats['errors'], 'queries_per_second': stats['queries_per_second'],
+            'mean_latency_ms': mean_latency_ms(profiler, provider.name)}
+    if isinstance(provider, MultiProvider):
+        case['providers'] = provider.stats
+    return case, results
+
+def run(n_queries=200, concurrency=16):
+    """ Two stub servers stand in for a fast and a slow search engine with different rankings. """
+    fast_server, fast_url = start_stub_server(latency=0.02, salt='fast')
+    slow_server, slow_url = start_stub_server(latency=0.2, salt='slow')
+    flaky_server, flaky_url = start_stub_server(latency=0.02, salt='fast', error_every=5)
+    queries = [f'bakkerij janssens {i} {1000 + i} Gent' for i in range(n_queries)]
+    fast_results = [[r['href'] for r in stub_results(q, 5, 'fast')] for q in queries]
+    slow_results = [[r['href'] for r in stub_results(q, 5, 'slow')] for q in queries]
+    report = []
+    try:
+        case, _ = run_case('fast only', StubProvider(fast_url, name='Fast'), queries, concurrency)
+        report.append(case)
+        case, _ = run_case('slow only', StubProvider(slow_url, name='Slow'), queries, concurrency)
+        report.append(case)
+
+        provider = MultiProvider([StubProvider(fast_url, name='Fast'), StubProvider(slow_url, name='Slow')])
+        case, results = run_case('fan-out, merged', provider, queries, concurrency)
+        case['merged_as_expected'] = results == [merge_ranked_results([f, s], 5) for f, s in zip(fast_results, slow_results)]
+        case['distinct_urls_per_query'] = round(sum(len(r) for r in results) / len(results), 2)
+        report.append(case)
+
+        # The slow provider is asked first; the fast one is only asked when the slow one takes over 50 ms
+        provider = MultiProvider([StubProvider(slow_url, name='Slow'), StubProvider(fast_url, name='Fast')], hedge_delay=0.05)
+        case, results = run_case('hedged, slow first', provider, queries, concurrency)
+        case['answered_by_fast'] = sum(r == fast_results[i] for i, r in enumerate(results))
+        report.append(case)
+
+        provider = MultiProvider([StubProvider(fast_url, name='Fast'), StubProvider(slow_url, name='Slow')],
+                                 quotas={'Fast': ProviderQuota(rate=10000, burst=16, max_queries=50)})
+        case, _ = run_case('fan-out, fast quota of 50', provider, queries, concurrency)
+        report.append(case)
+
+        # The quotas are built once and used by a search_all (an event loop) per batch, like process_and_scrape_data.
+        # With bursts of 1 queries wait for the bucket's lock, which used to be bound to the loop of the first batch.
+        provider = MultiProvider([StubProvider(fast_url, name='Fast'), StubProvider(slow_url, name='Slow')],
+                                 quotas={'Fast': ProviderQuota(rate=200, burst=1), 'Slow': ProviderQuota(rate=200, burst=1)})
+        half = len(queries) // 2
+        first, _ = run_case('fan-out with quotas, batch 1', provider, queries[:half], concurrency)
+        second, _ = run_case('fan-out with quotas, batch 2', provider, queries[half:], concurrency)
+        report += [first, second]
+
+        # Without retries in the transport, so the failures reach MultiProvider
+        flaky = StubProvider(flaky_url, name='Flaky', transport=HttpTransport(max_retries=0))
+        provider = MultiProvider([flaky, StubProvider(slow_url, name='Slow')])
+        case, _ = run_case('fan-out, every 5th fast request fails', provider, queries, concurrency)
+        report.append(case)
+    finally:
+        fast_server.shutdown()
+        slow_server.shutdown()
+        flaky_server.shutdown()
+    return report
+
+if __name__ == '__main__':
+    n_queries = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    print(json.dumps(run(n_queries), indent=2))
@@ -0,0 +1,92 @@
+import json
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+import Library.url_preprocessing_prediction_pipeline as upp
+from synthetic_kbo import write_prediction_inputs
+
+CANDIDATE_COLUMNS = [f'URL{i}_clean_domain_before_tld' for i in range(1, 6)]
+
+def with_establishments(prepared, establishments, seed=42):
+    """
+    Repeats every company for its establishments (on average `establishments` rows): they have the same
+    name and, searched by that name, mostly the same candidates. In the repeated rows one candidate in
+    five is replaced by a candidate of another company.
+    """
+    rng = np.random.default_rng(seed)
+    company = np.repeat(np.arange(len(prepared)), rng.geometric(1 / establishments, len(prepared)))
+    frame = prepared.iloc[company].reset_index(drop=True)
+    repeated = np.r_[False, company[1:] == company[:-1]]
+    for col in CANDIDATE_COLUMNS:
+        replace = repeated & (rng.random(len(frame)) < 0.2)
+        frame.loc[replace, col] = frame[col].to_numpy()[rng.integers(len(frame), size=int(replace.sum()))]
+    return frame
+
+def score_every_pair(official_names, abbreviations, candidates):
+    """ The same metric kernels without the dedup stage: every (name, candidate) pair is scored. """
+    stacked = np.concatenate([values.to_numpy(dtype=object) for values in candidates.values()])
+    scores = {}
+    for kind, names in (('official', official_names), ('abbrev', abbreviations)):
+        names = np.tile(names.to_numpy(dtype=object), len(candidates))
+        scores[kind] = upp.score_pairs(names, stacked, kind == 'official')
+        scores[kind][f'{kind}_cosine_similarity'] = upp.batch_cosine_similarity(names, stacked)
+    return scores
+
+def as_features(scores, candidate_columns, index):
+    """ The feature block of scores that are aligned with the stacked pairs. """
+    n = len(index)
+    metrics = {metric: values for kind_scores in scores.values() for metric, values in kind_scores.items()}
+    return pd.DataFrame({f'{col}_{metric}': metrics[metric][k * n:(k + 1) * n]
+                         for k, col in enumerate(candidate_columns) for metric in upp.SIMILARITY_METRICS}, index=index)
+
+def run(n_entities=20000, establishments=(1, 2, 4), workers=2):
+    directory = tempfile.mkdtemp()
+    dataset_query_path, search_results_path = write_prediction_inputs(directory, n_entities)
+    # The names and candidate domains as process_url_data scores them
+    prepared = upp.process_url_data(dataset_query_path, [search_results_path])
+    report = []
+    for mean in establishments:
+        frame = with_establishments(prepared, mean)
+        official_names, abbreviations = frame['OfficialName'], frame['Abbreviation']
+        candidates = {col: frame[col] for col in CANDIDATE_COLUMNS}
+
+        start = time.perf_counter()
+        every_pair = score_every_pair(official_names, abbreviations, candidates)
+        every_pair_seconds = time.perf_counter() - start
+        pair_stats = {}
+        start = time.perf_counter()
+        features = upp.compute_similarity_features(official_names, abbreviations, candidates, pair_stats=pair_stats)
+        memo_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        parallel = upp.compute_similarity_features_parallel(official_names, abbreviations, candidates, workers)
+        parallel_seconds = time.perf_counter() - start
+
+        # Bit-for-bit: same values and dtypes as scoring every pair, no tolerance
+        pd.testing.assert_frame_equal(as_features(every_pair, CANDIDATE_COLUMNS, frame.index), features, check_exact=True)
+        pd.testing.assert_frame_equal(features, parallel, check_exact=True)
+        hit_rates = upp.pair_hit_rates(pair_stats)
+        report.append({
+            'mean_establishments': mean,
+            'rows': len(frame),
+            'pairs': pair_stats['pairs'],
+            'official_distinct': pair_stats['official_distinct'],
+            'abbrev_distinct': pair_stats['abbrev_distinct'],
+            'official_hit_rate': round(hit_rates['official'], 3),
+            'abbrev_hit_rate': round(hit_rates['abbrev'], 3),
+            'identical': True,
+            'every_pair_seconds': round(every_pair_seconds, 3),
+            'memo_seconds': round(memo_seconds, 3),
+            'speedup': round(every_pair_seconds / memo_seconds, 2),
+            'parallel_workers': workers,
+            'parallel_memo_seconds': round(parallel_seconds, 3),
+        })
+    return report
+
+if __name__ == '__main__':
+    n_entities = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    print(json.dumps(run(n_entities), indent=2))
@@ -0,0 +1,81 @@
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+import aiohttp
+from aiohttp import web
+from sklearn.ensemble import GradientBoostingClassifier
+from sklearn.multioutput import MultiOutputClassifier
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+import Library.url_preprocessing_prediction_pipeline as upp
+from Library.data_preprocessing_ML import load_data
+from Library.prediction_model import create_predicted_url_df, fit_model_bundle, predict_in_batches
+from Library.prediction_service import RECORD_COLUMNS, PredictionService
+from synthetic_kbo import write_prediction_inputs
+
+def train_synthetic_bundle(processed):
+    """ A small model on the synthetic labels; label combinations seen once cannot be stratified and are left out. """
+    combinations = processed['domain_matches'].astype(str)
+    train = processed[combinations.map(combinations.value_counts()) > 1]
+    y_encoded, label_classes = upp.encode_targets(train)
+    model = MultiOutputClassifier(GradientBoostingClassifier(n_estimators=20, random_state=42))
+    return fit_model_bundle(model, upp.prepare_features(train), y_encoded, label_classes)
+
+async def send_requests(base_url, records, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    async with aiohttp.ClientSession() as session:
+        async def predict(record):
+            async with semaphore:
+                async with session.post(base_url + '/predict', json=record) as response:
+                    response.raise_for_status()
+                    return (await response.json())['predictions'][0]
+        start = time.perf_counter()
+        predictions = await asyncio.gather(*(predict(record) for record in records))
+        seconds = time.perf_counter() - start
+        async with session.get(base_url + '/stats') as response:
+            stats = await response.json()
+    return predictions, seconds, stats
+
+async def serve_and_measure(bundle, records, concurrency, max_wait):
+    service = PredictionService(bundle, max_wait=max_wait)
+    runner = web.AppRunner(service.make_app())
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    try:
+        return await send_requests(f'http://127.0.0.1:{port}', records, concurrency)
+    finally:
+        await runner.cleanup()
+
+def run(n_entities=500, concurrencies=(1, 16, 64), max_wait=0.005):
+    directory = tempfile.mkdtemp()
+    dataset_query_path, search_results_path = write_prediction_inputs(directory, max(n_entities, 1500))
+    processed = upp.process_url_data(dataset_query_path, [search_results_path])
+    bundle = train_synthetic_bundle(processed)
+
+    # One single-entity request per row, with the fields a downstream caller would send
+    merged = load_data(dataset_query_path, [search_results_path]).head(n_entities)
+    records = [{col: value for col, value in row.items() if isinstance(value, str)}
+               for row in merged[RECORD_COLUMNS].to_dict('records')]
+    expected = create_predicted_url_df(processed.head(n_entities), predict_in_batches(bundle, processed.head(n_entities))).to_dict('records')
+
+    report = {'requests': n_entities, 'max_wait_ms': max_wait * 1000, 'runs': []}
+    for concurrency in concurrencies:
+        predictions, seconds, stats = asyncio.run(serve_and_measure(bundle, records, concurrency, max_wait))
+        report['runs'].append({
+            'concurrency': concurrency,
+            'identical_to_offline': predictions == expected,
+            'requests_per_second': round(n_entities / seconds, 1),
+            'batches': stats['batches'],
+            'mean_batch_size': stats['mean_batch_size'],
+            'latency': stats['latency'],
+        })
+    return report
+
+if __name__ == '__main__':
+    n_entities = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    print(json.dumps(run(n_entities), indent=2))
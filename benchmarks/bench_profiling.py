@@ -0,0 +1,59 @@
+import json
+import os
+import sys
+import tempfile
+import time
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+import Library.url_preprocessing_prediction_pipeline as upp
+from Library.profiling import Profiler
+from Library.http_transport import HttpTransport
+from Library.search_engine import search_all
+from Library.search_providers import StubProvider
+from stub_search_server import start_stub_server
+from synthetic_kbo import write_prediction_inputs
+
+def best_of(repeats, function):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - start)
+    return result, min(times)
+
+def run(n_entities=2000, repeats=3, n_queries=200):
+    directory = tempfile.mkdtemp()
+    dataset_query_path, search_results_path = write_prediction_inputs(directory, n_entities)
+    profiler = Profiler()
+
+    off, off_seconds = best_of(repeats, lambda: upp.process_url_data(dataset_query_path, [search_results_path]))
+    on, on_seconds = best_of(repeats, lambda: upp.process_url_data(dataset_query_path, [search_results_path], profiler=profiler))
+    pd.testing.assert_frame_equal(off, on)
+
+    # Every 20th request fails and is not retried, so the histogram has errors as well
+    server, base_url = start_stub_server(latency=0.02, error_every=20)
+    try:
+        queries = [f'bakkerij janssens {i} {1000 + i} Gent' for i in range(n_queries)]
+        provider = StubProvider(base_url, transport=HttpTransport(max_retries=0))
+        search_all(queries, provider, concurrency=8, rate=10000, burst=8, profiler=profiler)
+    finally:
+        server.shutdown()
+
+    report_path = os.path.join(directory, 'run_report.json')
+    profiler.write_json(report_path)
+    profiler.write_prometheus(os.path.join(directory, 'run_report.prom'))
+    with open(report_path) as f:
+        report = json.load(f)
+    return {
+        'rows': len(off),
+        'profiler_off_seconds': round(off_seconds, 3),
+        'profiler_on_seconds': round(on_seconds, 3),
+        'profiler_on_overhead': round(on_seconds / off_seconds - 1, 4),
+        'report_files': [report_path, os.path.join(directory, 'run_report.prom')],
+        'report': report,
+    }
+
+if __name__ == '__main__':
+    n_entities = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    print(json.dumps(run(n_entities), indent=2))
@@ -0,0 +1,51 @@
+import json
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from Library.search_cache import CachedProvider, SearchCache
+from Library.search_engine import search_all
+from Library.search_providers import StubProvider
+from stub_search_server import start_stub_server, stub_results
+
+def run(n_queries=400, latency=0.05, concurrencies=(1, 8, 32)):
+    """ Queries the local stub server at several concurrency levels and checks that results come back in input order. """
+    server, base_url = start_stub_server(latency=latency)
+    queries = [f'bakkerij janssens {i} {1000 + i} Gent' for i in range(n_queries)]
+    report = {'n_queries': n_queries, 'server_latency_seconds': latency, 'runs': []}
+    try:
+        for concurrency in concurrencies:
+            results, stats = search_all(queries, StubProvider(base_url), max_results=5,
+                                        concurrency=concurrency, rate=10000, burst=concurrency)
+            expected = [[r['href'] for r in stub_results(q, 5)] for q in queries]
+            stats['in_order'] = results == expected
+            stats['concurrency'] = concurrency
+            report['runs'].append(stats)
+        # The token bucket, not the server, should be the bottleneck here
+        results, stats = search_all(queries[:100], StubProvider(base_url), concurrency=32, rate=50, burst=1)
+        stats['concurrency'] = 32
+        stats['rate_limit'] = 50
+        report['runs'].append(stats)
+        # Cache hits and duplicates take no token: with a rate of 1 query/s, a rerun of 100 cached queries
+        # (and the duplicates among the misses) should not take 100 s
+        cache = SearchCache(os.path.join(tempfile.mkdtemp(), 'search_cache.sqlite'))
+        provider = CachedProvider(StubProvider(base_url), cache)
+        search_all(queries[:100], provider, concurrency=32, rate=10000, burst=32)
+        for name, batch in (('cached rerun', queries[:100]), ('cached rerun with 2 new queries, 10x each', queries[:100] + queries[100:102] * 10)):
+            sent = server.counter['requests']
+            results, stats = search_all(batch, provider, concurrency=8, rate=1.0, burst=1)
+            stats['run'] = name
+            stats['rate_limit'] = 1.0
+            stats['requests_sent'] = server.counter['requests'] - sent
+            stats['in_order'] = results == [[r['href'] for r in stub_results(q, 5)] for q in batch]
+            report['runs'].append(stats)
+        stats['cache'] = dict(cache.stats, hit_rate=round(cache.hit_rate(), 3))
+        cache.close()
+    finally:
+        server.shutdown()
+    return report
+
+if __name__ == '__main__':
+    n_queries = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+    print(json.dumps(run(n_queries), indent=2))
@@ -0,0 +1,66 @@
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARKS, '..'))
+
+def prepare(directory, n_entities):
+    """ Writes combined_filtered_dataset.parquet for a synthetic register and a small model bundle into `directory`. """
+    import Library.url_preprocessing_prediction_pipeline as upp
+    from bench_prediction_service import train_synthetic_bundle
+    from Library import data_filter_prediction_pipeline
+    from Library.prediction_model import save_model_bundle
+    from synthetic_kbo import generate_register, write_prediction_inputs
+    training_directory = tempfile.mkdtemp()
+    dataset_query_path, search_results_path = write_prediction_inputs(training_directory, 1500)
+    bundle = train_synthetic_bundle(upp.process_url_data(dataset_query_path, [search_results_path]))
+    save_model_bundle(bundle, os.path.join(directory, 'url_model_bundle.joblib'))
+    dataset = data_filter_prediction_pipeline.filter_data(generate_register(n_entities, seed=7))
+    dataset.to_parquet(os.path.join(directory, 'combined_filtered_dataset.parquet'), row_group_size=100000)
+    return len(dataset)
+
+def run_mode(directory, mode, chunk_size):
+    """ Runs one mode in a fresh process (so peak RSS is its own) against a local stub search server. """
+    import Prediction_pipeline as pp
+    from Library.search_providers import StubProvider
+    from stub_search_server import start_stub_server
+    os.chdir(directory)
+    server, base_url = start_stub_server(latency=0.0)
+    start = time.perf_counter()
+    try:
+        if mode == 'streaming':
+            pp.run_streaming_prediction(provider=StubProvider(base_url), chunk_size=chunk_size, concurrency=8, rate=10000)
+        else:
+            pp.process_and_scrape_data(provider=StubProvider(base_url), batch_size=chunk_size, concurrency=8, rate=10000)
+            predictions, processed_data = pp.load_and_predict()
+            pp.save_to_parquet(pp.extract_domain_from_urls(pp.create_predicted_url_df(processed_data, predictions)), 'predicted_urls.parquet')
+    finally:
+        server.shutdown()
+    return {'seconds': round(time.perf_counter() - start, 2),
+            'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)}
+
+def run(sizes=(5000, 20000), chunk_size=2000):
+    report = []
+    for n_entities in sizes:
+        directory = tempfile.mkdtemp()
+        os.makedirs(os.path.join(directory, 'PredictionDataset'))
+        rows = prepare(directory, n_entities)
+        for mode in ('batch', 'streaming'):
+            output = subprocess.run([sys.executable, __file__, '--child', directory, mode, str(chunk_size)],
+                                    capture_output=True, text=True, check=True).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            report.append({'entities': rows, 'mode': mode, 'chunk_size': chunk_size, **result})
+    return report
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--child']:
+        sys.path.insert(0, BENCHMARKS)
+        print(json.dumps(run_mode(sys.argv[2], sys.argv[3], int(sys.argv[4]))))
+    else:
+        sizes = tuple(int(size) for size in sys.argv[1:]) or (5000, 20000)
+        print(json.dumps(run(sizes), indent=2))
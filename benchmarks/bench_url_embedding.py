@@ -0,0 +1,86 @@
+import json
+import os
+import string
+import sys
+import tempfile
+import time
+import numpy as np
+import torch
+from transformers import AutoModelForMaskedLM, BertConfig
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from Library import url_embedding
+from synthetic_kbo import generate_register, generate_search_results
+from Library.data_filter import filter_data
+
+def random_urlbert(directory):
+    """
+    Writes a randomly initialized model with the URLBERT layout (BERT-base, 5000 tokens) to `directory`.
+    Throughput does not depend on the weights, so this stands in when the URLBERT files are not downloaded.
+    """
+    os.makedirs(os.path.join(directory, 'bert_tokenizer'))
+    os.makedirs(os.path.join(directory, 'bert_model'))
+    tokens = ['[PAD]', '[UNK]', '[CLS]', '[SEP]', '[MASK]'] + list(string.ascii_lowercase + string.digits + string.punctuation)
+    tokens += ['##' + c for c in string.ascii_lowercase + string.digits + string.punctuation]
+    with open(os.path.join(directory, 'bert_tokenizer', 'vocab.txt'), 'w') as f:
+        f.write('\n'.join(tokens) + '\n')
+    config = BertConfig(vocab_size=url_embedding.URLBERT_CONFIG_KWARGS['vocab_size'])
+    config.save_pretrained(os.path.join(directory, 'bert_config'))
+    torch.manual_seed(0)
+    torch.save(AutoModelForMaskedLM.from_config(config).state_dict(), os.path.join(directory, 'bert_model', 'urlBERT.pt'))
+    return directory
+
+def legacy_embed(tokenizer, bert_model, texts, batch_size=10):
+    """ embed_text_in_batches of Pipeline_ML_with_Embedding.ipynb: MLM model, all hidden states, fixed batches. """
+    all_embeddings = []
+    for i in range(0, len(texts), batch_size):
+        inputs = tokenizer(texts[i:i + batch_size], padding=True, truncation=True, return_tensors='pt', max_length=512)
+        with torch.no_grad():
+            outputs = bert_model(**inputs, output_hidden_states=True)
+            all_embeddings.append(outputs.hidden_states[-1][:, 0, :].cpu().numpy())
+    return np.concatenate(all_embeddings, axis=0)
+
+def search_result_urls(n_entities):
+    dataset = filter_data(generate_register(int(n_entities * 5.5) + 10)).head(n_entities).reset_index(drop=True)
+    search_results = generate_search_results(dataset).replace('', np.nan)
+    return search_results
+
+def run(n_entities, threads, urlbert_path=None):
+    urlbert_path = urlbert_path or random_urlbert(os.path.join(tempfile.mkdtemp(), 'URLBERT'))
+    search_results = search_result_urls(n_entities)
+    urls = np.concatenate([search_results[f'URL{i}'].to_numpy(dtype=object) for i in range(1, 6)])
+    texts = [url if isinstance(url, str) else 'NaN' for url in urls]
+    result = {'urls': len(texts), 'distinct_urls': len(set(texts)), 'threads': threads}
+
+    # The notebook's path: the MLM model loaded as in URLBERT-master/bert_model/README.md
+    tokenizer, encoder = url_embedding.load_urlbert(urlbert_path, threads=threads)
+    bert_model = AutoModelForMaskedLM.from_config(encoder.config)
+    bert_model.load_state_dict(torch.load(os.path.join(urlbert_path, 'bert_model', 'urlBERT.pt'), map_location='cpu'))
+    bert_model.eval()
+    start = time.perf_counter()
+    legacy = legacy_embed(tokenizer, bert_model, texts)
+    result['legacy_urls_per_second'] = round(len(texts) / (time.perf_counter() - start), 1)
+
+    for name, quantize in [('engine', False), ('engine_int8', True)]:
+        tokenizer, encoder = url_embedding.load_urlbert(urlbert_path, threads=threads, quantize=quantize)
+        embedder = url_embedding.UrlEmbedder(tokenizer, encoder)
+        start = time.perf_counter()
+        embeddings = url_embedding.embed_url_columns(search_results, embedder)
+        result[f'{name}_urls_per_second'] = round(len(texts) / (time.perf_counter() - start), 1)
+        result[f'{name}_padding_share'] = round(embedder.padding_share(), 3)
+        # Back to the notebook's layout (all URL1, then all URL2, ...) to compare per URL
+        per_url = embeddings.reshape(len(search_results), 5, -1).transpose(1, 0, 2).reshape(len(texts), -1)
+        if quantize:
+            cosine = (per_url * legacy).sum(axis=1) / (np.linalg.norm(per_url, axis=1) * np.linalg.norm(legacy, axis=1))
+            result['int8_min_cosine_to_fp32'] = round(float(cosine.min()), 4)
+        else:
+            result['engine_max_abs_difference'] = float(np.abs(per_url - legacy).max())
+    result['speedup'] = round(result['engine_urls_per_second'] / result['legacy_urls_per_second'], 2)
+    result['int8_speedup'] = round(result['engine_int8_urls_per_second'] / result['legacy_urls_per_second'], 2)
+    return result
+
+if __name__ == '__main__':
+    n_entities = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count()
+    urlbert_path = sys.argv[3] if len(sys.argv) > 3 else None
+    print(json.dumps(run(n_entities, threads, urlbert_path), indent=2))
@@ -0,0 +1,136 @@
+import socket
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Every host name site-<n>.test is a company website; what it does depends on n (see site_kind)
+SITE_KINDS = ['normal'] * 14 + ['disallowed', 'no_robots', 'server_error', 'huge', 'slow', 'crawl_delay']
+
+def enterprise_number(n):
+    """ A valid enterprise number (mod-97 check digits) for site n, as ten digits. """
+    base = 2000000 + n
+    return f'{base:08d}{97 - base % 97:02d}'
+
+def formatted(number):
+    return f'{number[:4]}.{number[4:7]}.{number[7:]}'
+
+def site_kind(n):
+    return SITE_KINDS[n % len(SITE_KINDS)]
+
+def site_title(n):
+    return f'Bakkerij Peeters {n} | Ambachtelijk brood'
+
+def homepage_html(n, padding=0):
+    # The enterprise number is in the footer, after the padding, as the law asks for it on company websites
+    return (f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>{site_title(n)}</title>'
+            f'<meta name="description" content="Bakkerij Peeters {n} in Gent">'
+            f'<meta property="og:site_name" content="Peeters {n}">'
+            f'<script>var tracking = "0000.000.097";</script></head><body><h1>Welkom</h1>'
+            f'<p>{"Lekker brood. " * padding}</p>'
+            f'<footer>Bakkerij Peeters BV - BTW BE {formatted(enterprise_number(n))} - tel 09 123 45 67</footer>'
+            f'</body></html>')
+
+def robots_txt(n):
+    kind = site_kind(n)
+    if kind == 'disallowed':
+        return 'User-agent: *\nDisallow: /\n'
+    if kind == 'crawl_delay':
+        return 'User-agent: *\nCrawl-delay: 0.5\nDisallow: /admin/\n'
+    return 'User-agent: *\nDisallow: /admin/\n'
+
+def make_handler(slow_seconds, huge_padding, log):
+    lock = threading.Lock()
+
+    class FixtureSiteHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True
+
+        def send_body(self, status, body, content_type='text/html; charset=utf-8'):
+            body = body.encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            try:
+                self.wfile.write(body)
+            except (BrokenPipeError, ConnectionResetError):
+                # The crawler stopped reading, e.g. at its size cap
+                pass
+
+        def do_GET(self):
+            host = (self.headers.get('Host') or '').split(':')[0]
+            now = time.monotonic()
+            with lock:
+                hits = log['hosts'].setdefault(host, {'requests': [], 'in_flight': 0, 'max_in_flight': 0})
+                hits['requests'].append((now, self.path))
+                hits['in_flight'] += 1
+                hits['max_in_flight'] = max(hits['max_in_flight'], hits['in_flight'])
+                log['user_agents'].add(self.headers.get('User-Agent'))
+            try:
+                self.answer(host)
+            finally:
+                with lock:
+                    hits['in_flight'] -= 1
+
+        def answer(self, host):
+            if not (host.startswith('site-') and host.endswith('.test')):
+                self.send_body(404, 'unknown site')
+                return
+            n = int(host[len('site-'):-len('.test')])
+            kind = site_kind(n)
+            if self.path == '/robots.txt':
+                if kind == 'no_robots':
+                    self.send_body(404, 'not found')
+                else:
+                    self.send_body(200, robots_txt(n), 'text/plain')
+            elif self.path == '/':
+                if kind == 'server_error':
+                    self.send_body(500, 'internal error')
+                    return
+                if kind == 'slow':
+                    time.sleep(slow_seconds)
+                self.send_body(200, homepage_html(n, huge_padding if kind == 'huge' else 0))
+            else:
+                self.send_body(404, 'not found')
+
+        def log_message(self, format, *args):
+            pass
+
+    return FixtureSiteHandler
+
+class FixtureServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Hundreds of crawler connections arrive at once
+    request_queue_size = 1024
+
+    def handle_error(self, request, client_address):
+        # The crawler closes connections it no longer needs, e.g. after a truncated page
+        if not isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            super().handle_error(request, client_address)
+
+def start_fixture_server(port=0, slow_seconds=3.0, huge_padding=200000):
+    """
+    Starts a server in a background thread that plays thousands of company websites at once: it answers
+    for every host name site-<n>.test (point those at 127.0.0.1, see StaticResolver) with a homepage and
+    a robots.txt. Depending on n a site disallows crawling, has no robots.txt, fails, has a huge page,
+    answers after `slow_seconds` or asks for a Crawl-delay.
+
+    Returns:
+    - The server (call shutdown() to stop it) and its port. `server.log` has, per host, the requests
+      (time and path) and the most requests it had in flight at once.
+    """
+    log = {'hosts': {}, 'user_agents': set()}
+    server = FixtureServer(('127.0.0.1', port), make_handler(slow_seconds, huge_padding, log))
+    server.log = log
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, server.server_address[1]
+
+class StaticResolver:
+    """ aiohttp resolver that resolves every host name to 127.0.0.1, so the crawler reaches the fixture server. """
+    async def resolve(self, host, port=0, family=socket.AF_INET):
+        return [{'hostname': host, 'host': '127.0.0.1', 'port': port, 'family': socket.AF_INET, 'proto': 0,
+                 'flags': socket.AI_NUMERICHOST}]
+
+    async def close(self):
+        pass
@@ -0,0 +1,194 @@
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCHMARKS, '..'))
+import Library.url_preprocessing_prediction_pipeline as upp
+from Library import data_filter, data_loader
+from Library.prediction_model import predict_in_batches
+from Library.search_engine import search_all
+from Library.search_providers import StubProvider
+from bench_prediction_service import train_synthetic_bundle
+from stub_search_server import start_stub_server
+from synthetic_kbo import generate_register, generate_search_results
+
+SUITE_VERSION = 1
+
+def jaccard_pair(name, candidate):
+    return upp.jaccard_similarity(upp.safe_set_conversion(name), upp.safe_set_conversion(candidate))
+
+# Per metric: the name column it compares with the candidate and the function that scores one pair.
+# compute_similarity_features scores all metrics in one loop; timing them one by one shows where that loop spends its time.
+METRIC_FUNCTIONS = {
+    'official_jaccard': ('OfficialName', jaccard_pair),
+    'abbrev_jaccard': ('Abbreviation', jaccard_pair),
+    'official_is_subsequence': ('OfficialName', upp.check_subsequence),
+    'abbrev_is_subsequence': ('Abbreviation', upp.check_subsequence),
+    'official_seq_match': ('OfficialName', upp.sequence_match_score),
+    'abbrev_seq_match': ('Abbreviation', upp.sequence_match_score),
+    'official_levenshtein': ('OfficialName', upp.levenshtein_distance_score),
+    'abbrev_levenshtein': ('Abbreviation', upp.levenshtein_distance_score),
+    'official_cosine_similarity': ('OfficialName', None),
+    'abbrev_cosine_similarity': ('Abbreviation', None),
+    'hamming_distance': ('OfficialName', upp.hamming_distance_score),
+    'ngram_overlap': ('OfficialName', upp.ngram_overlap_score),
+}
+
+def timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+def stage(seconds, rows):
+    return {'seconds': round(seconds, 4), 'rows': rows, 'rows_per_second': round(rows / seconds, 1) if seconds > 0 else None}
+
+def time_metrics(processed):
+    """ Times every similarity metric on its own over all (name, candidate) pairs of the processed frame. """
+    candidates = np.concatenate([processed[f'URL{i}_clean_domain_before_tld'].to_numpy(dtype=object) for i in range(1, 6)])
+    metrics = {}
+    for metric, (name_column, function) in METRIC_FUNCTIONS.items():
+        names = np.tile(processed[name_column].to_numpy(dtype=object), 5)
+        if function is None:
+            _, seconds = timed(upp.batch_cosine_similarity, names, candidates)
+        else:
+            _, seconds = timed(lambda: [function(name, candidate) for name, candidate in zip(names, candidates)])
+        metrics[metric] = stage(seconds, len(candidates))
+    return metrics
+
+def bench_scale(n_entities, directory, seed=42, search_queries=2000, search_latency=0.0, max_feature_rows=None, workers=1):
+    """
+    Generates a synthetic register of `n_entities` entities in `directory` and times the pipeline stages on it.
+
+    Returns:
+    - A dict with the sizes of the generated data and, per stage, seconds, rows and rows per second.
+    """
+    stages = {}
+    tables = generate_register(n_entities, seed)
+    kbo_directory = os.path.join(directory, 'KboDataset')
+    os.makedirs(kbo_directory)
+    for name, table in tables.items():
+        table.to_parquet(os.path.join(kbo_directory, f'{name}.parquet'), index=False)
+    table_rows = {name: len(table) for name, table in tables.items()}
+    del tables
+
+    tables, seconds = timed(data_loader.load_data, kbo_directory)
+    stages['data_loader.load_data'] = stage(seconds, sum(table_rows.values()))
+    dataset, seconds = timed(data_filter.filter_data, tables)
+    stages['data_filter.filter_data'] = stage(seconds, len(dataset))
+    del tables
+
+    # The prediction inputs, as process_and_scrape_data leaves them: the query dataset and the search results
+    if max_feature_rows:
+        dataset = dataset.head(max_feature_rows).reset_index(drop=True)
+    dataset['SearchQuery'] = dataset['OfficialName'] + ' ' + dataset['ZipCode'] + ' ' + dataset['Municipality']
+    dataset_query_path = os.path.join(directory, 'dataset_incl_query.csv')
+    search_results_path = os.path.join(directory, 'search_results_synthetic.csv')
+    dataset.to_csv(dataset_query_path, index=True)
+    generate_search_results(dataset, seed).to_csv(search_results_path, index=False)
+
+    processed, seconds = timed(upp.process_url_data, dataset_query_path, [search_results_path], workers=workers)
+    stages['process_url_data'] = stage(seconds, len(processed))
+    metrics = time_metrics(processed)
+    (X, y_encoded), seconds = timed(upp.prepare_features_and_targets, processed)
+    stages['prepare_features_and_targets'] = stage(seconds, len(X))
+
+    # Model quality is not the point; a small model of the production type stands in for the trained one
+    bundle = train_synthetic_bundle(processed)
+    _, seconds = timed(predict_in_batches, bundle, processed)
+    stages['predict_in_batches'] = stage(seconds, len(processed))
+
+    queries = dataset['SearchQuery'].dropna().head(search_queries).tolist()
+    server, base_url = start_stub_server(latency=search_latency)
+    try:
+        (_, search_stats), seconds = timed(search_all, queries, StubProvider(base_url), max_results=10,
+                                           concurrency=8, rate=100000, burst=8)
+    finally:
+        server.shutdown()
+    stages['search_all_stub'] = stage(seconds, len(queries))
+    stages['search_all_stub']['errors'] = search_stats['errors']
+
+    return {
+        'entities': n_entities,
+        'table_rows': table_rows,
+        'filtered_rows': int(len(dataset)),
+        'stages': stages,
+        'similarity_metrics': metrics,
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=BENCHMARKS, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        'git_commit': commit or None,
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+def compare(report, baseline, tolerance, min_seconds=0.05):
+    """
+    Lists the stages and metrics that are more than `tolerance` (a fraction) slower than in the baseline report.
+    Slowdowns of less than `min_seconds` are timing noise and are not reported.
+    """
+    regressions = []
+    baseline_scales = {scale['entities']: scale for scale in baseline['scales']}
+    for scale in report['scales']:
+        previous = baseline_scales.get(scale['entities'])
+        if previous is None:
+            continue
+        for section in ('stages', 'similarity_metrics'):
+            for name, result in scale[section].items():
+                before = previous.get(section, {}).get(name)
+                if (before and before['seconds'] > 0 and result['seconds'] > before['seconds'] * (1 + tolerance)
+                        and result['seconds'] - before['seconds'] >= min_seconds):
+                    regressions.append({'entities': scale['entities'], 'stage': name, 'baseline_seconds': before['seconds'],
+                                        'seconds': result['seconds'], 'ratio': round(result['seconds'] / before['seconds'], 2)})
+    return regressions
+
+def run(sizes, seed=42, search_queries=2000, search_latency=0.0, max_feature_rows=None, workers=1):
+    report = {'suite_version': SUITE_VERSION, 'created': time.strftime('%Y-%m-%dT%H:%M:%S'), 'seed': seed,
+              'environment': environment(), 'scales': []}
+    for n_entities in sizes:
+        print(f'Benchmarking {n_entities} entities...', file=sys.stderr)
+        report['scales'].append(bench_scale(n_entities, tempfile.mkdtemp(), seed, search_queries, search_latency,
+                                            max_feature_rows, workers))
+    return report
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Times the pipeline stages on synthetic KBO data')
+    parser.add_argument('sizes', nargs='*', type=int, default=[10000], help='Numbers of entities in the synthetic register')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--search-queries', type=int, default=2000)
+    parser.add_argument('--search-latency', type=float, default=0.0, help='Seconds per request of the stub search server')
+    parser.add_argument('--max-feature-rows', type=int, default=None, help='Limit the filtered rows the feature stages run on')
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--output', default=None, help='Write the JSON report to this file')
+    parser.add_argument('--baseline', default=None, help='JSON report of an earlier run to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed slowdown against the baseline, as a fraction')
+    parser.add_argument('--min-seconds', type=float, default=0.05, help='Smallest slowdown in seconds that counts as a regression')
+    args = parser.parse_args()
+
+    report = run(args.sizes, args.seed, args.search_queries, args.search_latency, args.max_feature_rows, args.workers)
+    if args.baseline:
+        with open(args.baseline) as f:
+            report['regressions'] = compare(report, json.load(f), args.tolerance, args.min_seconds)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+    if report.get('regressions'):
+        sys.exit(1)
@@ -0,0 +1,114 @@
+import json
+import sys
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# Directory sites that show up for most queries, like the skip_domains in Prediction_pipeline
+DIRECTORY_SITES = ['https://www.companyweb.be/nl/', 'https://www.goudengids.be/', 'https://be.linkedin.com/company/',
+                   'https://trendstop.knack.be/nl/detail/', 'https://www.facebook.com/']
+
+def stub_results(query, n, salt=''):
+    """
+    Deterministic search results for a query: a mix of directory pages and sites named after the query words.
+    Servers with a different `salt` rank and mix them differently, like two search engines would.
+    """
+    words = [w.lower() for w in query.split() if w.isalpha()] or ['empty']
+    seed = zlib.crc32((salt + query).encode('utf-8'))
+    results = []
+    for i in range(n):
+        if (seed >> i) & 1:
+            results.append({'href': DIRECTORY_SITES[(seed + i) % len(DIRECTORY_SITES)] + '-'.join(words)})
+        else:
+            results.append({'href': f'https://www.{"".join(words[i % len(words):][:2])}{i}.be/'})
+    return results
+
+def make_handler(latency, error_every, salt='', throttle_every=0, retry_after=1, outage=0.0, counter=None):
+    counter = counter if counter is not None else {}
+    counter.update(requests=0, connections=0)
+    lock = threading.Lock()
+    started = time.monotonic()
+
+    class StubSearchHandler(BaseHTTPRequestHandler):
+        # Keeps connections open between requests, like a real search API; without Nagle's algorithm
+        # the body does not wait for the ACK of the headers
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True
+
+        def setup(self):
+            super().setup()
+            with lock:
+                counter['connections'] += 1
+
+        def do_GET(self):
+            with lock:
+                counter['requests'] += 1
+                request_number = counter['requests']
+            url = urlparse(self.path)
+            params = parse_qs(url.query)
+            if url.path != '/search':
+                self.send_error(404)
+                return
+            if latency:
+                time.sleep(latency)
+            if (error_every and request_number % error_every == 0) or time.monotonic() - started < outage:
+                self.send_error(503)
+                return
+            if throttle_every and request_number % throttle_every == 0:
+                self.send_response(429)
+                self.send_header('Retry-After', str(retry_after))
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            query = params.get('q', [''])[0]
+            n = int(params.get('n', ['10'])[0])
+            body = json.dumps({'query': query, 'results': stub_results(query, n, salt)}).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            try:
+                self.wfile.write(body)
+            except (BrokenPipeError, ConnectionResetError):
+                # The client gave up on the request, e.g. a hedged request that was cancelled
+                pass
+
+        def log_message(self, format, *args):
+            pass
+
+    return StubSearchHandler
+
+def start_stub_server(port=0, latency=0.05, error_every=0, salt='', throttle_every=0, retry_after=1, outage=0.0):
+    """
+    Starts the stub search server in a background thread.
+
+    Parameters:
+    - port: Port to listen on; 0 picks a free port.
+    - latency: Seconds every request takes, to mimic a remote provider.
+    - error_every: Answer every n-th request with HTTP 503 (0 disables errors).
+    - salt: Varies the results (see stub_results), to stand in for another provider.
+    - throttle_every, retry_after: Answer every n-th request with HTTP 429 and a Retry-After of `retry_after` seconds.
+    - outage: Answer every request with HTTP 503 for this many seconds after starting.
+
+    Returns:
+    - The server (call shutdown() to stop it) and its base URL. `server.counter` counts requests and connections.
+    """
+    counter = {}
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(latency, error_every, salt, throttle_every, retry_after,
+                                                                   outage, counter))
+    server.counter = counter
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}'
+
+if __name__ == '__main__':
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8765
+    server, base_url = start_stub_server(port)
+    print(f'Stub search server listening on {base_url}')
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,149 @@
+import os
+import numpy as np
+import pandas as pd
+from Library.data_filter import filter_data
+
+# Rough shape of the real register: most entities have one Dutch official name, some an abbreviation
+# or French name, one registered address, a few activities, and about a fifth publish a website.
+WORDS = ['bakkerij', 'garage', 'bouw', 'consult', 'immo', 'vastgoed', 'advocaten', 'apotheek', 'taverne',
+         'kapsalon', 'transport', 'invest', 'group', 'services', 'solutions', 'dakwerken', 'schrijnwerkerij',
+         'tandarts', 'architect', 'media', 'logistics', 'renovatie', 'elektro', 'verzekeringen', 'food']
+LEGAL_FORMS = ['BV', 'NV', 'VZW', 'CommV', 'VOF', '']
+MUNICIPALITIES = ['Antwerpen', 'Gent', 'Brugge', 'Leuven', 'Hasselt', 'Mechelen', 'Aalst', 'Kortrijk',
+                  'Oostende', 'Genk', 'Roeselare', 'Brussel', 'Sint-Niklaas', 'Turnhout', 'Lier']
+STREETS = ['Kerkstraat', 'Stationsstraat', 'Dorpsstraat', 'Nieuwstraat', 'Molenstraat', 'Schoolstraat']
+NACE_CODES = ['01110', '41201', '43320', '47110', '56101', '62010', '68201', '69101', '70220', '86230']
+
+def entity_numbers(n_entities):
+    digits = np.arange(n_entities) + 200000000
+    return pd.Series([f'0{d // 1000000:03d}.{d // 1000 % 1000:03d}.{d % 1000:03d}' for d in digits])
+
+def company_names(rng, n):
+    first = rng.choice(WORDS, n)
+    second = rng.choice(WORDS, n)
+    form = rng.choice(LEGAL_FORMS, n)
+    suffix = rng.integers(0, 1000, n).astype(str)
+    return pd.Series([f'{a} {b} {s} {f}'.strip() for a, b, s, f in zip(first, second, suffix, form)])
+
+def generate_register(n_entities, seed=42):
+    """
+    Generates synthetic denomination, address, contact and activity tables with the KBO column layout.
+
+    Returns:
+    - A dict of table name to DataFrame, like data_loader.load_data.
+    """
+    rng = np.random.default_rng(seed)
+    entities = entity_numbers(n_entities)
+    names = company_names(rng, n_entities)
+
+    # Denomination: Dutch official name for ~95%, French name for ~15%, abbreviation for ~20%
+    parts = []
+    for language, type_of_denomination, share in [(2, 1, 0.95), (1, 1, 0.15), (2, 2, 0.20), (2, 3, 0.10)]:
+        idx = np.flatnonzero(rng.random(n_entities) < share)
+        if type_of_denomination == 2:
+            values = [''.join(w[0] for w in names[i].split()).upper() for i in idx]
+        else:
+            values = names[idx].tolist()
+        parts.append(pd.DataFrame({
+            'EntityNumber': entities[idx].to_numpy(), 'Language': language,
+            'TypeOfDenomination': type_of_denomination, 'Denomination': values
+        }))
+    denomination = pd.concat(parts, ignore_index=True).sample(frac=1, random_state=seed).reset_index(drop=True)
+
+    # Address: one registered seat (REGO) per entity, a second address for ~30%
+    repeats = 1 + (rng.random(n_entities) < 0.3)
+    address_entities = np.repeat(entities.to_numpy(), repeats)
+    n_addresses = len(address_entities)
+    address = pd.DataFrame({
+        'EntityNumber': address_entities,
+        'TypeOfAddress': np.where(np.r_[True, address_entities[1:] != address_entities[:-1]], 'REGO', 'BAET'),
+        'CountryNL': None, 'CountryFR': None,
+        'Zipcode': rng.integers(1000, 9999, n_addresses).astype(str),
+        'MunicipalityNL': rng.choice(MUNICIPALITIES, n_addresses),
+        'MunicipalityFR': None,
+        'StreetNL': rng.choice(STREETS, n_addresses),
+        'StreetFR': None,
+        'HouseNumber': rng.integers(1, 300, n_addresses).astype(str),
+        'Box': None, 'ExtraAddressInfo': None, 'DateStrikingOff': None,
+    })
+
+    # Contact: ~20% have a website, some also a phone number or email
+    contact_parts = []
+    for contact_type, share in [('WEB', 0.20), ('TEL', 0.35), ('EMAIL', 0.25)]:
+        idx = np.flatnonzero(rng.random(n_entities) < share)
+        if contact_type == 'WEB':
+            values = ['www.' + names[i].split()[0] + names[i].split()[1] + '.be' for i in idx]
+        elif contact_type == 'TEL':
+            values = [f'0{v}' for v in rng.integers(10000000, 99999999, len(idx))]
+        else:
+            values = ['info@' + names[i].split()[0] + '.be' for i in idx]
+        contact_parts.append(pd.DataFrame({
+            'EntityNumber': entities[idx].to_numpy(),
+            'EntityContact': rng.choice(['ENT', 'EST'], len(idx), p=[0.8, 0.2]),
+            'ContactType': contact_type, 'Value': values
+        }))
+    contact = pd.concat(contact_parts, ignore_index=True)
+
+    # Activity: 1-5 NACE codes per entity, the first one is the main activity
+    activity_counts = rng.integers(1, 6, n_entities)
+    activity_entities = np.repeat(entities.to_numpy(), activity_counts)
+    first_activity = np.r_[True, activity_entities[1:] != activity_entities[:-1]]
+    activity = pd.DataFrame({
+        'EntityNumber': activity_entities,
+        'ActivityGroup': '001',
+        'NaceVersion': 2008,
+        'NaceCode': rng.choice(NACE_CODES, len(activity_entities)),
+        'Classification': np.where(first_activity, 'MAIN', 'SECO'),
+    })
+
+    return {'denomination': denomination, 'address': address, 'contact': contact, 'activity': activity}
+
+DIRECTORY_URLS = ['https://www.companyweb.be/nl/{}', 'https://www.goudengids.be/bedrijf/{}', 'https://be.linkedin.com/company/{}',
+                  'https://www.facebook.com/{}', 'https://www.trendstop.be/{}', 'https://www.cylex-belgie.be/{}']
+
+def generate_search_results(dataset, seed=42, empty_share=0.05):
+    """
+    Generates search results (EntityNumber, URL1..URL5) for a filtered dataset, as written by process_and_scrape_data.
+
+    The entity's own website shows up in a random position for about 60% of the entities with a URL; the other
+    positions hold directory pages, sites of similarly named companies, or are empty.
+    """
+    rng = np.random.default_rng(seed)
+    n = len(dataset)
+    names = dataset['OfficialName'].fillna('').str.lower().str.split().to_numpy()
+    own_urls = dataset['URL'].to_numpy() if 'URL' in dataset else np.array([None] * n)
+    rows = []
+    for i in range(n):
+        words = names[i] or ['onbekend']
+        slug = '-'.join(words)
+        urls = []
+        for position in range(5):
+            r = rng.random()
+            if r < 0.4:
+                urls.append(DIRECTORY_URLS[rng.integers(len(DIRECTORY_URLS))].format(slug))
+            elif r < 0.4 + empty_share:
+                urls.append('')
+            else:
+                other = words[rng.integers(len(words))] + WORDS[rng.integers(len(WORDS))]
+                urls.append(f'https://www.{other}.{rng.choice(["be", "com", "eu", "nl"])}/')
+        if isinstance(own_urls[i], str) and rng.random() < 0.6:
+            urls[rng.integers(5)] = 'https://' + own_urls[i] + '/'
+        rows.append([dataset['EntityNumber'].iat[i]] + urls)
+    return pd.DataFrame(rows, columns=['EntityNumber', 'URL1', 'URL2', 'URL3', 'URL4', 'URL5'])
+
+def write_prediction_inputs(directory, n_entities, seed=42):
+    """
+    Writes dataset_incl_query.csv and search_results_synthetic.csv for n_entities synthetic entities with a URL,
+    in the format process_url_data reads.
+
+    Returns:
+    - The paths of the query dataset and the search results file.
+    """
+    # About a fifth of the register has a URL, so generate enough entities
+    dataset = filter_data(generate_register(int(n_entities * 5.5) + 10, seed)).head(n_entities).reset_index(drop=True)
+    dataset['SearchQuery'] = dataset['OfficialName'] + ' ' + dataset['ZipCode'] + ' ' + dataset['Municipality']
+    dataset_query_path = os.path.join(directory, 'dataset_incl_query.csv')
+    search_results_path = os.path.join(directory, 'search_results_synthetic.csv')
+    dataset.to_csv(dataset_query_path, index=True)
+    generate_search_results(dataset, seed).to_csv(search_results_path, index=False)
+    return dataset_query_path, search_results_path